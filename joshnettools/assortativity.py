@@ -0,0 +1,181 @@
+import numpy as np
+import numpy.typing as npt
+
+from networkx import Graph
+from typing import Any
+from collections.abc import Sequence
+
+from csrgraph import CSRGraph, to_csr, edge_arrays, node_codes
+
+
+def pearson_assortativity(
+    values: npt.NDArray[np.floating],
+    u: npt.NDArray[np.int64],
+    v: npt.NDArray[np.int64],
+) -> float:
+    """Pearson correlation of a node value across the ends of every edge.
+
+    Each undirected edge counts once in each direction like NetworkX, so both
+    ends share one mean and variance.
+
+    Parameters
+    ----------
+    values: numpy.typing.NDArray[numpy.floating]
+        Value of each node.
+    u: numpy.typing.NDArray[numpy.int64]
+        First endpoint of each edge.
+    v: numpy.typing.NDArray[numpy.int64]
+        Second endpoint of each edge.
+
+    Returns
+    -------
+    float
+        Correlation coefficient. NaN if every end has the same value.
+    """
+    ends: int = 2 * len(u)
+    x: npt.NDArray[np.floating] = values[u]
+    y: npt.NDArray[np.floating] = values[v]
+    mean: float = (x.sum() + y.sum()) / ends
+    # Centering first keeps the sums accurate for large values.
+    x = x - mean
+    y = y - mean
+    variance: float = ((x**2).sum() + (y**2).sum()) / ends
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(2 * (x * y).sum() / ends / variance)
+
+
+def degree_assortativity(csr: CSRGraph) -> float:
+    """Weighted degree assortativity of csr.
+
+    Matches both nx.degree_pearson_correlation_coefficient(G, weight=...) and
+    nx.degree_assortativity_coefficient(G, weight=...). The latter's degree
+    mixing matrix formula is the same Pearson correlation of the (weighted)
+    degrees at either end of each edge.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to calculate assortativity for.
+
+    Returns
+    -------
+    float
+        Degree assortativity coefficient.
+    """
+    rows: npt.NDArray[np.int64] = np.repeat(
+        np.arange(csr.n, dtype=np.int64), np.diff(csr.indptr)
+    )
+    strength: npt.NDArray[np.float64] = np.bincount(rows, csr.weights, minlength=csr.n)
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    u, v, _ = edge_arrays(csr)
+    return pearson_assortativity(strength, u, v)
+
+
+def mixing_coefficient(mixing: npt.NDArray[np.floating]) -> npt.NDArray[np.floating]:
+    """Attribute assortativity of normalized mixing matrices.
+
+    Same formula as nx.attribute_assortativity_coefficient:
+    (trace(e) - sum(a * b)) / (1 - sum(a * b)).
+
+    Parameters
+    ----------
+    mixing: numpy.typing.NDArray[numpy.floating]
+        One or more (..., k, k) mixing matrices that each sum to 1.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.floating]
+        Coefficient of each matrix.
+    """
+    ab: npt.NDArray[np.floating] = (mixing.sum(axis=-1) * mixing.sum(axis=-2)).sum(
+        axis=-1
+    )
+    trace: npt.NDArray[np.floating] = np.trace(mixing, axis1=-2, axis2=-1)
+    return (trace - ab) / (1 - ab)
+
+
+def attribute_assortativity(G: Graph, attributes: Sequence[str]) -> dict[str, float]:
+    """Attribute assortativity of G for several attributes at once.
+
+    Every attribute's mixing matrix gets its own slice of one bincount over
+    the edges, so the edge arrays are only walked once.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph with the attributes set on its nodes.
+    attributes: Sequence[str]
+        Node attributes such as "SysGamGen", "Systems", and "subreddit".
+
+    Returns
+    -------
+    dict[str, float]
+        Coefficient of each attribute like nx.attribute_assortativity_coefficient.
+    """
+    if not attributes:
+        return {}
+    csr: CSRGraph = to_csr(G)
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    u, v, _ = edge_arrays(csr)
+
+    codes: list[npt.NDArray[np.int64]] = []
+    sizes: list[int] = []
+    for attr in attributes:
+        code: npt.NDArray[np.int64]
+        uniques: npt.NDArray[Any]
+        code, uniques = node_codes(G, csr, attr)
+        codes.append(code)
+        sizes.append(len(uniques))
+
+    # Cells of attribute i start at offsets[i] and span sizes[i] ** 2.
+    squares: npt.NDArray[np.int64] = np.array(sizes, dtype=np.int64) ** 2
+    offsets: npt.NDArray[np.int64] = np.cumsum(squares) - squares
+    stacked: npt.NDArray[np.int64] = np.stack(codes)
+    k: npt.NDArray[np.int64] = np.array(sizes, dtype=np.int64)[:, np.newaxis]
+    cells: npt.NDArray[np.int64] = stacked[:, u] * k + stacked[:, v] + offsets[:, None]
+    counts: npt.NDArray[np.int64] = np.bincount(
+        cells.ravel(), minlength=int(squares.sum())
+    )
+
+    results: dict[str, float] = {}
+    for attr, size, offset in zip(attributes, sizes, offsets.tolist()):
+        mixing: npt.NDArray[np.float64] = (
+            counts[offset : offset + size**2].reshape(size, size).astype(np.float64)
+        )
+        # NetworkX counts each undirected edge in both directions.
+        mixing += mixing.T
+        mixing /= mixing.sum()
+        results[attr] = float(mixing_coefficient(mixing))
+    return results
+
+
+def label_assortativity(csr: CSRGraph, labels: npt.NDArray[np.int64], k: int) -> float:
+    """Attribute assortativity of csr for integer node labels 0 to k - 1.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to calculate assortativity for.
+    labels: numpy.typing.NDArray[numpy.int64]
+        Label of each node in CSR order.
+    k: int
+        Number of possible labels.
+
+    Returns
+    -------
+    float
+        Coefficient like nx.attribute_assortativity_coefficient.
+    """
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    u, v, _ = edge_arrays(csr)
+    mixing: npt.NDArray[np.float64] = (
+        np.bincount(labels[u] * k + labels[v], minlength=k * k)
+        .reshape(k, k)
+        .astype(np.float64)
+    )
+    mixing += mixing.T
+    mixing /= mixing.sum()
+    return float(mixing_coefficient(mixing))
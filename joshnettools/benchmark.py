@@ -0,0 +1,498 @@
+import networkx as nx
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import argparse
+import datetime
+import functools
+import json
+import logging
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+
+from networkx import Graph
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+from collections.abc import Callable, Sequence
+
+from gamenetloader import load_network, shrink_network_by
+from gamenetattrs import add_attributes
+from projections import project_auth_tops_bauth
+from components import largest_component
+from cores import graph_core_numbers
+from randomnet import (
+    CURVEBALL_REPLICATES,
+    dispatcher,
+    permutation_assort,
+    random_assort,
+    random_clust,
+    random_deg_assort,
+    random_deg_cent,
+    random_density,
+)
+from instrument import sizes
+from synthetic import write_synthetic
+
+# Synthetic data sets and recorded results.
+BENCH_DIR: Path = Path(__file__).parent.resolve().joinpath("benchmarks")
+RESULTS_PATH: Path = BENCH_DIR.joinpath("results.jsonl")
+
+# Row counts benchmarked by default.
+DEFAULT_ROWS: tuple[int, ...] = (10**4, 10**5)
+
+# Building the projection's attributes scans every row for every node and
+# edge, so larger data sets take hours. Cases needing the projection are
+# skipped above this many rows unless limits are lifted.
+PROJECTION_ROWS: int = 10**5
+
+# Every replicate function dispatcher accepts.
+REPLICATE_FUNCS: tuple[Callable[..., float], ...] = (
+    random_clust,
+    random_density,
+    random_deg_cent,
+    random_deg_assort,
+    random_assort,
+    *CURVEBALL_REPLICATES,
+)
+
+
+class Case(NamedTuple):
+    """One timed step of the benchmark.
+
+    Attributes
+    ----------
+    name: str
+        Name recorded with the results.
+    func: Callable[..., Any]
+        Function timed. It's called with the values of needs.
+    needs: tuple[str, ...]
+        Values func takes. Missing values are built untimed by PROVIDERS.
+    provides: Optional[str]
+        Value func's result is kept as for later cases.
+    max_rows: Optional[int]
+        Skip the case for larger data sets. None for no limit.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    needs: tuple[str, ...] = ("gamers",)
+    provides: Optional[str] = None
+    max_rows: Optional[int] = None
+
+
+def _read_raw(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path, engine="pyarrow")
+
+
+def _bare_projection(gamers: pd.DataFrame) -> Graph:
+    """Projection of threads onto authors without any attributes."""
+    G: Graph = nx.from_pandas_edgelist(gamers, "permalink", "author")
+    return nx.bipartite.weighted_projected_graph(G, set(gamers.author))
+
+
+def _replicates(
+    func: Callable[..., float],
+    gamers: pd.DataFrame,
+    replicates: int,
+    processes: int,
+    seed: int,
+) -> npt.NDArray[np.floating]:
+    assort: Optional[str] = "SysGamGen" if func is random_assort else None
+    return dispatcher(
+        gamers,
+        func,
+        replicates=replicates,
+        processes=processes,
+        assort=assort,
+        seed=seed,
+    )
+
+
+def _nulls(
+    gamers: pd.DataFrame, replicates: int, processes: int, seed: int
+) -> tuple[list[float], list[npt.NDArray[np.floating]]]:
+    """Observed values and replicates for p_value_plots.
+
+    The replicates' means stand in for observed values since only the
+    drawing is timed.
+    """
+    reps: list[npt.NDArray[np.floating]] = [
+        _replicates(func, gamers, replicates, processes, seed)
+        for func in (random_density, random_deg_assort)
+    ]
+    return [float(np.mean(rep)) for rep in reps], reps
+
+
+def _permutation_assort(
+    projection: Graph, replicates: int, seed: int
+) -> npt.NDArray[np.floating]:
+    return permutation_assort(projection, "SysGamGen", replicates=replicates, seed=seed)
+
+
+def _close(fig: Any) -> None:
+    import matplotlib.pyplot as plt
+
+    plt.close(fig)
+
+
+# Drawing modules are imported by each case so that a missing plotting
+# dependency fails the case rather than the benchmark.
+def _draw_gamers(projection: Graph) -> None:
+    from gamersdraw import draw_gamers
+
+    _close(draw_gamers(projection)[0])
+
+
+def _draw_degree_centrality(projection: Graph) -> None:
+    from gamersdraw import draw_degree_centrality
+
+    _close(draw_degree_centrality(projection)[0])
+
+
+def _draw_k_core_decompose(projection: Graph) -> None:
+    from gamersdraw import draw_k_core_decompose
+
+    # The four innermost cores, which are never empty.
+    top: int = int(graph_core_numbers(projection).max(initial=0))
+    _close(draw_k_core_decompose(projection, range(max(0, top - 3), top + 1))[0])
+
+
+def _draw_diameter_radius(lcc: Graph) -> None:
+    from gamersdraw import draw_diameter_radius
+
+    _close(draw_diameter_radius(lcc, barycenter=False)[0])
+
+
+def _p_value_plots(nulls: tuple[list[float], list[npt.NDArray[np.floating]]]) -> None:
+    from pvalueplots import p_value_plots
+
+    observed, reps = nulls
+    _close(p_value_plots(observed, reps, ["Density", "Degree assortativity"])[0])
+
+
+# Values cases need that another case didn't build. Built untimed.
+PROVIDERS: dict[str, tuple[Callable[..., Any], tuple[str, ...]]] = {
+    "raw": (_read_raw, ("path",)),
+    "gamers": (load_network, ("path",)),
+    "bare": (_bare_projection, ("gamers",)),
+    "projection": (project_auth_tops_bauth, ("gamers",)),
+    "lcc": (largest_component, ("projection",)),
+    "nulls": (_nulls, ("gamers", "replicates", "processes", "seed")),
+}
+
+CASES: list[Case] = [
+    Case("load_network", load_network, ("path",), "gamers"),
+    Case("shrink_network_by", shrink_network_by, ("raw",)),
+    Case(
+        "project_gamers",
+        project_auth_tops_bauth,
+        provides="projection",
+        max_rows=PROJECTION_ROWS,
+    ),
+    Case("add_attributes", add_attributes, ("bare", "gamers"), None, PROJECTION_ROWS),
+    *[
+        Case(
+            f"dispatcher.{func.__name__}",
+            functools.partial(_replicates, func),
+            ("gamers", "replicates", "processes", "seed"),
+        )
+        for func in REPLICATE_FUNCS
+    ],
+    Case(
+        "permutation_assort",
+        _permutation_assort,
+        ("projection", "replicates", "seed"),
+        max_rows=PROJECTION_ROWS,
+    ),
+    Case("draw_gamers", _draw_gamers, ("projection",), max_rows=PROJECTION_ROWS),
+    Case(
+        "draw_degree_centrality",
+        _draw_degree_centrality,
+        ("projection",),
+        max_rows=PROJECTION_ROWS,
+    ),
+    Case(
+        "draw_k_core_decompose",
+        _draw_k_core_decompose,
+        ("projection",),
+        max_rows=PROJECTION_ROWS,
+    ),
+    Case(
+        "draw_diameter_radius",
+        _draw_diameter_radius,
+        ("lcc",),
+        max_rows=PROJECTION_ROWS,
+    ),
+    Case("p_value_plots", _p_value_plots, ("nulls",)),
+]
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(func: Callable[..., Any], *args: Any) -> tuple[Any, dict[str, Any]]:
+    """Time func(*args) and trace its memory.
+
+    Wall and CPU time include tracemalloc's overhead, so compare runs with
+    each other rather than with untraced runs. Only this process's
+    allocations are traced; worker processes are counted by their CPU time.
+
+    Parameters
+    ----------
+    func: Callable[..., Any]
+        Function to measure.
+    *args: Any
+        Arguments of func.
+
+    Returns
+    -------
+    tuple[Any, dict[str, Any]]
+        func's result (None if it raised) and the measurements: seconds,
+        cpu_seconds, child_cpu_seconds, peak_bytes, max_rss_bytes, status,
+        and error.
+    """
+    children: resource.struct_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    value: Any = None
+    status: str = "ok"
+    error: Optional[str] = None
+    tracemalloc.start()
+    wall: float = time.perf_counter()
+    cpu: float = time.process_time()
+    try:
+        value = func(*args)
+    except Exception as err:
+        logging.exception(f"Benchmark case failed: {err}")
+        status, error = "error", f"{type(err).__name__}: {err}"
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        peak: int = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    after: resource.struct_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return value, {
+        "seconds": wall,
+        "cpu_seconds": cpu,
+        "child_cpu_seconds": (after.ru_utime + after.ru_stime)
+        - (children.ru_utime + children.ru_stime),
+        "peak_bytes": peak,
+        # Kilobytes on Linux.
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "status": status,
+        "error": error,
+    }
+
+
+def run_benchmarks(
+    rows: Sequence[int] = DEFAULT_ROWS,
+    cases: Optional[Sequence[str]] = None,
+    replicates: int = 200,
+    processes: int = 2,
+    seed: int = 0,
+    results: str | Path = RESULTS_PATH,
+    data_dir: str | Path = BENCH_DIR.joinpath("data"),
+    limits: bool = True,
+) -> pd.DataFrame:
+    """Benchmark the pipeline on synthetic data sets and record the results.
+
+    Each row count gets its own synthetic data set (see synthetic.py), which
+    is written once and reused by later runs with the same seed. Every case
+    is timed and memory traced by measure, and a case that fails is
+    recorded with its error instead of stopping the run.
+
+    Parameters
+    ----------
+    rows: Sequence[int], optional
+        Data set sizes. The default is DEFAULT_ROWS.
+    cases: Sequence[str], optional
+        Names of the cases to run. The default is None (all of CASES).
+    replicates: int, optional
+        Replicates per dispatcher case. The default is 200.
+    processes: int, optional
+        Worker processes per dispatcher case. The default is 2.
+    seed: int, optional
+        Seed of the data sets and replicates. The default is 0.
+    results: str | Path, optional
+        JSON lines file the records are appended to. The default is
+        RESULTS_PATH.
+    data_dir: str | Path, optional
+        Directory of the synthetic data sets.
+    limits: bool, optional
+        Skip cases above their max_rows. The default is True.
+
+    Returns
+    -------
+    pandas.DataFrame
+        This run's records.
+    """
+    unknown: set[str] = set(cases or ()) - {case.name for case in CASES}
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {unknown}")
+    selected: list[Case] = [case for case in CASES if not cases or case.name in cases]
+
+    run: dict[str, Any] = {
+        "run": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "seed": seed,
+        "replicates": replicates,
+        "processes": processes,
+    }
+    records: list[dict[str, Any]] = []
+    results = Path(results)
+    results.parent.mkdir(parents=True, exist_ok=True)
+
+    for n in rows:
+        path: Path = Path(data_dir).joinpath(f"synthetic_{n}_{seed}.csv")
+        if not path.exists():
+            write_synthetic(path, n, seed)
+        state: dict[str, Any] = {
+            "path": path,
+            "replicates": replicates,
+            "processes": processes,
+            "seed": seed,
+        }
+
+        def require(key: str) -> Any:
+            if key not in state:
+                func, needs = PROVIDERS[key]
+                logging.info(f"Benchmark: building {key} for {n} rows")
+                state[key] = func(*[require(need) for need in needs])
+            return state[key]
+
+        for case in selected:
+            record: dict[str, Any] = {**run, "rows": n, "case": case.name}
+            if limits and case.max_rows is not None and n > case.max_rows:
+                record.update(status="skipped", error=f"over {case.max_rows} rows")
+            else:
+                try:
+                    args: list[Any] = [require(need) for need in case.needs]
+                except Exception as err:
+                    logging.exception(f"Benchmark setup failed: {err}")
+                    record.update(status="skipped", error=f"setup: {err}")
+                else:
+                    logging.info(f"Benchmark: {case.name} on {n} rows")
+                    value, measured = measure(case.func, *args)
+                    # Cases that work in place are described by their input.
+                    record.update(
+                        measured,
+                        **(sizes(value, "result_") or sizes(args[0], "in_")),
+                    )
+                    if case.provides and measured["status"] == "ok":
+                        state[case.provides] = value
+            records.append(record)
+            with open(results, "a") as out:
+                out.write(json.dumps(record) + "\n")
+
+    return pd.DataFrame.from_records(records)
+
+
+def compare(
+    results: str | Path = RESULTS_PATH, against: Optional[str] = None
+) -> pd.DataFrame:
+    """Compare the latest run with an earlier one.
+
+    Parameters
+    ----------
+    results: str | Path, optional
+        Recorded results. The default is RESULTS_PATH.
+    against: str, optional
+        Commit or run timestamp to compare with. The default is None (the
+        run before the latest).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Seconds and peak memory of both runs for every case and row count
+        they share, with the latest over the earlier as ratios.
+    """
+    records: pd.DataFrame = pd.read_json(results, lines=True, dtype={"commit": str})
+    records = records[records.status == "ok"]
+    runs: list[str] = sorted(records.run.unique())
+    if len(runs) < 2:
+        raise ValueError(f"Need two runs to compare, {results} has {len(runs)}")
+    latest: str = runs[-1]
+    earlier: list[str] = (
+        runs[:-1]
+        if against is None
+        else [
+            run
+            for run in runs[:-1]
+            if against in (run, records.commit[records.run == run].iloc[0])
+        ]
+    )
+    if not earlier:
+        raise ValueError(f"No run of {against} in {results}")
+
+    columns: list[str] = ["case", "rows", "seconds", "peak_bytes"]
+    merged: pd.DataFrame = pd.merge(
+        records.loc[records.run == earlier[-1], columns],
+        records.loc[records.run == latest, columns],
+        on=["case", "rows"],
+        suffixes=("_before", "_after"),
+    )
+    merged["seconds_ratio"] = merged.seconds_after / merged.seconds_before
+    merged["peak_ratio"] = merged.peak_bytes_after / merged.peak_bytes_before
+    return merged.sort_values(["rows", "case"], ignore_index=True)
+
+
+if __name__ == "__main__":
+    import matplotlib
+
+    # Figures are only drawn and closed, never shown.
+    matplotlib.use("Agg")
+    logging.basicConfig(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Benchmark the gamers network code on synthetic data."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS))
+    parser.add_argument(
+        "--cases", nargs="+", choices=[case.name for case in CASES], default=None
+    )
+    parser.add_argument("--replicates", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", default=RESULTS_PATH)
+    parser.add_argument(
+        "--no-limits", action="store_true", help="run cases above their max_rows"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="RUN",
+        help="compare the latest run with RUN (commit or timestamp) or the one "
+        "before it and exit",
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    pd.set_option("display.width", 200)
+    if args.compare is not None:
+        print(compare(args.results, args.compare or None).to_string())
+    else:
+        summary: pd.DataFrame = run_benchmarks(
+            args.rows,
+            args.cases,
+            args.replicates,
+            args.processes,
+            args.seed,
+            args.results,
+            limits=not args.no_limits,
+        )
+        print(summary[["rows", "case", "status", "seconds", "peak_bytes"]].to_string())
@@ -0,0 +1,317 @@
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import logging
+import os
+
+from numpy.random import Generator
+from networkx import Graph
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Any, NamedTuple, Optional
+
+from csrgraph import CSRGraph, graph_cache, to_csr
+from instrument import traced
+
+# Sources searched per task sent to a worker process. Each task sends back a
+# few arrays of length n, so bigger batches mean less pickling.
+SOURCE_BATCH: int = 64
+
+# Graph the worker processes search, set once by _init_worker.
+_worker_csr: Optional[CSRGraph] = None
+
+
+class Centrality(NamedTuple):
+    """Sampled centrality of every node.
+
+    Attributes
+    ----------
+    nodes: numpy.typing.NDArray[Any]
+        Original node of each entry.
+    estimate: numpy.typing.NDArray[numpy.float64]
+        Estimated centrality, normalized like NetworkX.
+    bound: numpy.typing.NDArray[numpy.float64]
+        Half width of each estimate's confidence interval. 0 when every
+        node was a source.
+    sources: int
+        Number of sampled sources.
+    """
+
+    nodes: npt.NDArray[Any]
+    estimate: npt.NDArray[np.float64]
+    bound: npt.NDArray[np.float64]
+    sources: int
+
+
+def _source_paths(
+    csr: CSRGraph, source: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """Distances from source and its betweenness dependencies (Brandes).
+
+    The search goes one frontier at a time like bfs_distances, counting
+    shortest paths on the way out and accumulating dependencies level by
+    level on the way back.
+
+    Returns
+    -------
+    tuple[NDArray[int64], NDArray[float64]]
+        Hop distance of each node (-1 if unreachable) and the dependency of
+        source on each node.
+    """
+    n: int = csr.n
+    dist: npt.NDArray[np.int64] = np.full(n, -1, dtype=np.int64)
+    sigma: npt.NDArray[np.float64] = np.zeros(n)
+    dist[source] = 0
+    sigma[source] = 1.0
+    frontier: npt.NDArray[np.int64] = np.array([source], dtype=np.int64)
+    # Shortest path DAG edges (parent, child) between each pair of levels.
+    levels: list[tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]] = []
+    level: int = 0
+    while len(frontier):
+        level += 1
+        starts: npt.NDArray[np.int64] = csr.indptr[frontier]
+        lengths: npt.NDArray[np.int64] = csr.indptr[frontier + 1] - starts
+        positions: npt.NDArray[np.int64] = np.arange(lengths.sum()) + np.repeat(
+            starts - (np.cumsum(lengths) - lengths), lengths
+        )
+        parents: npt.NDArray[np.int64] = np.repeat(frontier, lengths)
+        children: npt.NDArray[np.int64] = csr.indices[positions]
+        frontier = np.unique(children[dist[children] < 0])
+        dist[frontier] = level
+        forward: npt.NDArray[np.bool_] = dist[children] == level
+        parents, children = parents[forward], children[forward]
+        sigma += np.bincount(children, sigma[parents], minlength=n)
+        levels.append((parents, children))
+
+    delta: npt.NDArray[np.float64] = np.zeros(n)
+    for parents, children in reversed(levels):
+        delta += np.bincount(
+            parents,
+            sigma[parents] / sigma[children] * (1 + delta[children]),
+            minlength=n,
+        )
+    delta[source] = 0.0
+    return dist, delta
+
+
+def _accumulate(
+    csr: CSRGraph, sources: npt.NDArray[np.int64]
+) -> tuple[npt.NDArray[np.float64], ...]:
+    """Sum what a batch of sources contributes to every node.
+
+    Returns
+    -------
+    tuple[NDArray[float64], ...]
+        Sums of dependencies, squared dependencies, distances, squared
+        distances, and the number of sources reaching each node.
+    """
+    sums: tuple[npt.NDArray[np.float64], ...] = tuple(np.zeros(csr.n) for _ in range(5))
+    dependency, dependency_sq, distance, distance_sq, reached = sums
+    for source in sources.tolist():
+        dist: npt.NDArray[np.int64]
+        delta: npt.NDArray[np.float64]
+        dist, delta = _source_paths(csr, source)
+        dependency += delta
+        dependency_sq += delta**2
+        # A node isn't its own source.
+        found: npt.NDArray[np.bool_] = dist > 0
+        distance[found] += dist[found]
+        distance_sq[found] += dist[found] ** 2
+        reached[found] += 1
+    return sums
+
+
+def _init_worker(csr: CSRGraph) -> None:
+    global _worker_csr
+    _worker_csr = csr
+
+
+def _worker_accumulate(
+    sources: npt.NDArray[np.int64],
+) -> tuple[npt.NDArray[np.float64], ...]:
+    assert _worker_csr is not None
+    return _accumulate(_worker_csr, sources)
+
+
+def sampled_centrality(
+    csr: CSRGraph,
+    samples: int,
+    rng: Optional[Generator] = None,
+    confidence: float = 0.95,
+    processes: Optional[int] = None,
+) -> tuple[Centrality, Centrality]:
+    """Betweenness and closeness centrality from a sample of sources.
+
+    Every sampled source runs one breadth first search that feeds both
+    measures. Sources are spread over a process pool in batches of
+    SOURCE_BATCH. Paths are counted in hops, ignoring weights like
+    nx.betweenness_centrality and nx.closeness_centrality do by default.
+
+    Betweenness is scaled up from the sources like
+    nx.betweenness_centrality(G, k=samples). Closeness estimates each node's
+    average distance from the sources that reach it and scales it like
+    nx.closeness_centrality with wf_improved. With samples equal to the
+    number of nodes both are exact.
+
+    Bounds are normal approximation confidence intervals over the sources
+    with a finite population correction. Dependencies are heavy tailed, so
+    with a few hundred sources the betweenness bounds of the most central
+    nodes hold closer to 80-90% of the time than 95%. Closeness bounds only
+    cover the average distance, so they're too narrow on disconnected graphs.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph.
+    samples: int
+        Sources to search. Capped at the number of nodes.
+    rng: numpy.random.Generator, optional
+        Source of randomness for the sample. A fresh generator is used if
+        None.
+    confidence: float, optional
+        Confidence of the bounds. The default is 0.95.
+    processes: int, optional
+        Worker processes. os.cpu_count() if None. 1 searches in this process.
+
+    Returns
+    -------
+    tuple[Centrality, Centrality]
+        Betweenness and closeness.
+    """
+    n: int = csr.n
+    k: int = min(samples, n)
+    rng = rng or np.random.default_rng()
+    sources: npt.NDArray[np.int64] = np.sort(rng.choice(n, k, replace=False))
+    batches: list[npt.NDArray[np.int64]] = np.array_split(
+        sources, max(1, -(-k // SOURCE_BATCH))
+    )
+    processes = processes or os.cpu_count() or 1
+
+    logging.info(f"Searching from {k} of {n} nodes on {processes} processes")
+    totals: list[npt.NDArray[np.float64]] = [np.zeros(n) for _ in range(5)]
+    if processes == 1 or len(batches) == 1:
+        for batch in batches:
+            for total, part in zip(totals, _accumulate(csr, batch)):
+                total += part
+    else:
+        with ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=(csr,)
+        ) as executor:
+            # map keeps the batch order, so the sums don't depend on timing.
+            for result in executor.map(_worker_accumulate, batches):
+                for total, part in zip(totals, result):
+                    total += part
+    dependency, dependency_sq, distance, distance_sq, reached = totals
+
+    z: float = NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Betweenness: the mean dependency over all n possible sources.
+        scale: float = 1 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+        mean: npt.NDArray[np.float64] = dependency / k
+        spread: npt.NDArray[np.float64] = np.sqrt(
+            np.maximum(dependency_sq / k - mean**2, 0)
+        )
+        correction: float = np.sqrt((n - k) / (n - 1)) if n > 1 else 0.0
+        betweenness: Centrality = Centrality(
+            csr.nodes,
+            mean * n * scale,
+            z * spread / np.sqrt(k) * correction * n * scale,
+            k,
+        )
+
+        # Closeness: the other sampled nodes each node could have been
+        # reached from.
+        others: npt.NDArray[np.float64] = k - np.isin(np.arange(n), sources)
+        average: npt.NDArray[np.float64] = distance / reached
+        deviation: npt.NDArray[np.float64] = np.sqrt(
+            np.maximum(distance_sq / reached - average**2, 0)
+        )
+        remaining: npt.NDArray[np.float64] = np.maximum(n - 1 - others, 0)
+        error: npt.NDArray[np.float64] = (
+            z * deviation / np.sqrt(reached) * np.sqrt(remaining / max(n - 2, 1))
+        )
+        estimate: npt.NDArray[np.float64] = np.where(
+            reached > 0, reached / others / average, 0.0
+        )
+        bound: npt.NDArray[np.float64] = np.where(
+            error < average, estimate * error / (average - error), np.inf
+        )
+        closeness: Centrality = Centrality(
+            csr.nodes, estimate, np.where(reached > 0, bound, 0.0), k
+        )
+    return betweenness, closeness
+
+
+@traced
+def graph_centrality(
+    G: Graph,
+    samples: int,
+    seed: int = 0,
+    confidence: float = 0.95,
+    processes: Optional[int] = None,
+) -> tuple[Centrality, Centrality]:
+    """Sampled betweenness and closeness of G. Cached on G.
+
+    See sampled_centrality.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph.
+    samples: int
+        Sources to search.
+    seed: int, optional
+        Seed of the source sample. The default is 0.
+    confidence: float, optional
+        Confidence of the bounds. The default is 0.95.
+    processes: int, optional
+        Worker processes. os.cpu_count() if None.
+
+    Returns
+    -------
+    tuple[Centrality, Centrality]
+        Betweenness and closeness.
+    """
+    return graph_cache(
+        G,
+        f"centrality_{samples}_{seed}_{confidence}",
+        lambda: sampled_centrality(
+            to_csr(G), samples, np.random.default_rng(seed), confidence, processes
+        ),
+    )
+
+
+def top_k(centrality: Centrality, k: int) -> pd.DataFrame:
+    """The k most central nodes.
+
+    Parameters
+    ----------
+    centrality: Centrality
+        Result of sampled_centrality.
+    k: int
+        Nodes to return.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns node, estimate, bound, and certain in descending order of
+        estimate. certain is True if the node's lower bound beats the upper
+        bound of every node outside the top k, so the sample can't have let
+        it in by chance.
+    """
+    order: npt.NDArray[np.intp] = np.argsort(-centrality.estimate, kind="stable")
+    top: npt.NDArray[np.intp] = order[:k]
+    rest: npt.NDArray[np.intp] = order[k:]
+    ceiling: float = (
+        float((centrality.estimate[rest] + centrality.bound[rest]).max())
+        if len(rest)
+        else -np.inf
+    )
+    return pd.DataFrame(
+        {
+            "node": centrality.nodes[top],
+            "estimate": centrality.estimate[top],
+            "bound": centrality.bound[top],
+            "certain": centrality.estimate[top] - centrality.bound[top] > ceiling,
+        }
+    )
@@ -0,0 +1,329 @@
+import numpy as np
+import numpy.typing as npt
+import math
+
+from numpy.random import Generator
+from networkx import Graph
+from typing import Optional
+
+from csrgraph import CSRGraph, row_pairs, to_csr
+
+# Wedges (paths of length two) checked for closure at once. Bounds the memory
+# of weighted_clustering to a few hundred MB.
+CLUSTERING_WEDGES: int = 2**22
+
+
+def _oriented(
+    csr: CSRGraph,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """Keep each edge once, pointing from the lower to the higher ranked node.
+
+    Nodes are ranked by degree so that high degree nodes have few out
+    neighbors. Every triangle is then one wedge at its lowest ranked node,
+    and no node has more than sqrt(2m) out neighbors.
+
+    Returns
+    -------
+    tuple[NDArray[int64], NDArray[int64], NDArray[float64]]
+        Out row offsets, out neighbors, and their weights.
+    """
+    degree: npt.NDArray[np.int64] = np.diff(csr.indptr)
+    rank: npt.NDArray[np.int64] = np.empty(csr.n, dtype=np.int64)
+    rank[np.lexsort((np.arange(csr.n), degree))] = np.arange(csr.n)
+
+    rows: npt.NDArray[np.int64] = np.repeat(np.arange(csr.n, dtype=np.int64), degree)
+    forward: npt.NDArray[np.bool_] = rank[rows] < rank[csr.indices]
+    indptr: npt.NDArray[np.int64] = np.zeros(csr.n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows[forward], minlength=csr.n), out=indptr[1:])
+    return indptr, csr.indices[forward], csr.weights[forward]
+
+
+def _chunks(pairs: npt.NDArray[np.int64]) -> list[tuple[int, int]]:
+    """Split rows into (lo, hi) runs of at most CLUSTERING_WEDGES pairs.
+
+    A row with more pairs than the cap gets a run of its own.
+    """
+    total: npt.NDArray[np.int64] = np.cumsum(pairs)
+    runs: list[tuple[int, int]] = []
+    lo: int = 0
+    while lo < len(pairs):
+        done: int = int(total[lo - 1]) if lo else 0
+        hi: int = max(
+            lo + 1, int(np.searchsorted(total, done + CLUSTERING_WEDGES, "right"))
+        )
+        runs.append((lo, hi))
+        lo = hi
+    return runs
+
+
+def _close(
+    csr: CSRGraph,
+    keys: npt.NDArray[np.int64],
+    b: npt.NDArray[np.int64],
+    c: npt.NDArray[np.int64],
+) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.float64]]:
+    """Look up the edges b - c closing a batch of wedges.
+
+    Returns
+    -------
+    tuple[NDArray[bool_], NDArray[float64]]
+        Whether each wedge is closed and the weights of the closing edges.
+    """
+    wanted: npt.NDArray[np.int64] = b * csr.n + c
+    found: npt.NDArray[np.int64] = np.minimum(
+        np.searchsorted(keys, wanted), len(keys) - 1
+    )
+    closed: npt.NDArray[np.bool_] = keys[found] == wanted
+    return closed, csr.weights[found[closed]]
+
+
+def _edge_keys(csr: CSRGraph) -> npt.NDArray[np.int64]:
+    # Rows are sorted and so are the neighbors within them, so the keys of
+    # all stored edges are already sorted.
+    rows: npt.NDArray[np.int64] = np.repeat(
+        np.arange(csr.n, dtype=np.int64), np.diff(csr.indptr)
+    )
+    return rows * csr.n + csr.indices
+
+
+def weighted_triangles(csr: CSRGraph) -> npt.NDArray[np.float64]:
+    """Sum of (w_ij * w_jk * w_ki) ** (1/3) over each node's triangles.
+
+    Triangles are found by checking every oriented wedge (see _oriented)
+    against the sorted edge keys, CLUSTERING_WEDGES wedges at a time.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to count triangles in.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.float64]
+        Weighted triangle sum of each node. Weights aren't normalized.
+    """
+    n: int = csr.n
+    triangles: npt.NDArray[np.float64] = np.zeros(n)
+    if not csr.m:
+        return triangles
+
+    keys: npt.NDArray[np.int64] = _edge_keys(csr)
+    indptr: npt.NDArray[np.int64]
+    out: npt.NDArray[np.int64]
+    out_w: npt.NDArray[np.float64]
+    indptr, out, out_w = _oriented(csr)
+    out_degree: npt.NDArray[np.int64] = np.diff(indptr)
+
+    for lo, hi in _chunks(out_degree * (out_degree - 1) // 2):
+        centers: npt.NDArray[np.int64]
+        first: npt.NDArray[np.int64]
+        second: npt.NDArray[np.int64]
+        centers, first, second = row_pairs(indptr[lo:hi], out_degree[lo:hi])
+        if not len(first):
+            continue
+
+        # Close the wedge a - b, a - c by looking up the edge b - c.
+        b: npt.NDArray[np.int64] = out[first]
+        c: npt.NDArray[np.int64] = out[second]
+        closed: npt.NDArray[np.bool_]
+        bc: npt.NDArray[np.float64]
+        closed, bc = _close(csr, keys, b, c)
+        weight: npt.NDArray[np.float64] = np.cbrt(
+            out_w[first[closed]] * out_w[second[closed]] * bc
+        )
+        for ends in (centers[closed] + lo, b[closed], c[closed]):
+            triangles += np.bincount(ends, weight, minlength=n)
+    return triangles
+
+
+def weighted_clustering(csr: CSRGraph) -> npt.NDArray[np.float64]:
+    """Weighted clustering coefficient of every node like nx.clustering.
+
+    Weights are normalized by the largest weight and each triangle counts
+    the geometric mean of its weights (Onnela et al.).
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to calculate clustering for.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.float64]
+        Clustering of each node in CSR order.
+    """
+    if not csr.m:
+        return np.zeros(csr.n)
+    degree: npt.NDArray[np.float64] = np.diff(csr.indptr).astype(np.float64)
+    pairs: npt.NDArray[np.float64] = degree * (degree - 1)
+    return np.divide(
+        2 * weighted_triangles(csr),
+        pairs * csr.weights.max(),
+        out=np.zeros(csr.n),
+        where=pairs > 0,
+    )
+
+
+def average_clustering(G: Graph, weight: str = "weight") -> float:
+    """Average weighted clustering like nx.average_clustering(G, weight=weight).
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph.
+    weight: str, optional
+        Edge attribute holding the weights. The default is "weight".
+
+    Returns
+    -------
+    float
+        Mean clustering over all nodes, including those with zero clustering.
+    """
+    if not len(G):
+        raise ZeroDivisionError("Average clustering of an empty graph.")
+    return float(weighted_clustering(to_csr(G, weight)).mean())
+
+
+def sample_size(error: float, confidence: float = 0.95) -> int:
+    """Nodes to sample so the average clustering is within error.
+
+    Clustering coefficients lie in [0, 1], so by Hoeffding's inequality the
+    mean of this many sampled nodes is within error of the true average with
+    probability confidence, however large the graph is.
+
+    Parameters
+    ----------
+    error: float
+        Target absolute error.
+    confidence: float, optional
+        Probability of being within error. The default is 0.95.
+
+    Returns
+    -------
+    int
+        Sample size.
+    """
+    return math.ceil(math.log(2 / (1 - confidence)) / (2 * error**2))
+
+
+def sampled_clustering(
+    csr: CSRGraph, sample: npt.NDArray[np.int64]
+) -> npt.NDArray[np.float64]:
+    """Weighted clustering of the sampled nodes only.
+
+    Each sampled node's neighbor pairs are checked against the edge keys,
+    so the cost depends on the sample rather than the whole graph.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph the nodes belong to.
+    sample: numpy.typing.NDArray[numpy.int64]
+        CSR indices of the nodes.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.float64]
+        Clustering of each sampled node like weighted_clustering.
+    """
+    if not csr.m:
+        return np.zeros(len(sample))
+    keys: npt.NDArray[np.int64] = _edge_keys(csr)
+    degree: npt.NDArray[np.int64] = np.diff(csr.indptr)[sample]
+    triangles: npt.NDArray[np.float64] = np.zeros(len(sample))
+
+    for lo, hi in _chunks(degree * (degree - 1) // 2):
+        owner: npt.NDArray[np.int64]
+        first: npt.NDArray[np.int64]
+        second: npt.NDArray[np.int64]
+        owner, first, second = row_pairs(csr.indptr[sample[lo:hi]], degree[lo:hi])
+        if not len(first):
+            continue
+        closed: npt.NDArray[np.bool_]
+        bc: npt.NDArray[np.float64]
+        closed, bc = _close(csr, keys, csr.indices[first], csr.indices[second])
+        weight: npt.NDArray[np.float64] = np.cbrt(
+            csr.weights[first[closed]] * csr.weights[second[closed]] * bc
+        )
+        triangles[lo:hi] += np.bincount(owner[closed], weight, minlength=hi - lo)
+
+    pairs: npt.NDArray[np.float64] = degree * (degree - 1.0)
+    # Unlike weighted_triangles, each triangle is counted once per node here,
+    # from one unordered pair of its neighbors.
+    return np.divide(
+        2 * triangles,
+        pairs * csr.weights.max(),
+        out=np.zeros(len(sample)),
+        where=pairs > 0,
+    )
+
+
+def sampled_average_clustering(
+    csr: CSRGraph,
+    error: float,
+    confidence: float = 0.95,
+    rng: Optional[Generator] = None,
+) -> tuple[float, float]:
+    """Estimate the average weighted clustering of csr from a sample of nodes.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph.
+    error: float
+        Target absolute error. See sample_size.
+    confidence: float, optional
+        Probability that the estimate is within the returned bound.
+        The default is 0.95.
+    rng: numpy.random.Generator, optional
+        Source of randomness for the sample. A fresh generator is used if
+        None.
+
+    Returns
+    -------
+    tuple[float, float]
+        Estimate and its error bound. The bound is 0 if the sample would have
+        covered every node, in which case the exact average is returned.
+    """
+    size: int = sample_size(error, confidence)
+    if size >= csr.n:
+        return float(weighted_clustering(csr).mean()), 0.0
+
+    rng = rng or np.random.default_rng()
+    sample: npt.NDArray[np.int64] = rng.choice(csr.n, size, replace=False)
+    return float(sampled_clustering(csr, sample).mean()), error
+
+
+def approximate_clustering(
+    G: Graph,
+    error: float,
+    confidence: float = 0.95,
+    rng: Optional[Generator] = None,
+    weight: str = "weight",
+) -> tuple[float, float]:
+    """Estimate the average weighted clustering from a sample of nodes.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph.
+    error: float
+        Target absolute error. See sample_size.
+    confidence: float, optional
+        Probability that the estimate is within the returned bound.
+        The default is 0.95.
+    rng: numpy.random.Generator, optional
+        Source of randomness for the sample. A fresh generator is used if
+        None.
+    weight: str, optional
+        Edge attribute holding the weights. The default is "weight".
+
+    Returns
+    -------
+    tuple[float, float]
+        Estimate and its error bound. The bound is 0 if the sample would have
+        covered every node, in which case the exact average is returned.
+    """
+    if not len(G):
+        raise ZeroDivisionError("Average clustering of an empty graph.")
+    return sampled_average_clustering(to_csr(G, weight), error, confidence, rng)
@@ -0,0 +1,536 @@
+import networkx as nx
+import numpy as np
+import numpy.typing as npt
+import logging
+
+from numpy.random import Generator
+from networkx import Graph
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from collections.abc import Callable
+
+from csrgraph import CSRGraph, csr_from_edges, edge_arrays, graph_cache, to_csr
+from instrument import traced
+
+# Seed used when none is given, the one print_useful_metrics always used.
+COMMUNITY_SEED: int = 314
+
+# Threads that score the nodes of a color class. The numpy kernels release
+# the GIL, so batches run on several cores at once.
+COMMUNITY_THREADS: int = 4
+
+# Neighbor list entries scored per batch. Batches are cut from the node
+# order rather than the thread count so results don't depend on threads.
+COMMUNITY_BATCH: int = 2**20
+
+# Label propagation gives up after this many rounds.
+MAX_ROUNDS: int = 100
+
+
+def color_classes(csr: CSRGraph, rng: Generator) -> list[npt.NDArray[np.int64]]:
+    """Split the nodes of csr into independent sets.
+
+    Jones and Plassmann's coloring: every node gets a random priority, and
+    each round the uncolored nodes that outrank all of their uncolored
+    neighbors form the next class. No two nodes in a class are adjacent, so
+    a class can update at once without nodes chasing each other's labels.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to color.
+    rng: numpy.random.Generator
+        Source of the priorities.
+
+    Returns
+    -------
+    list[numpy.typing.NDArray[numpy.int64]]
+        Nodes of each class.
+    """
+    priority: npt.NDArray[np.int64] = rng.permutation(csr.n)
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    u, v, _ = edge_arrays(csr)
+    remaining: npt.NDArray[np.bool_] = np.ones(csr.n, dtype=np.bool_)
+    classes: list[npt.NDArray[np.int64]] = []
+    while remaining.any():
+        # Each edge between uncolored nodes blocks its lower priority end.
+        lower: npt.NDArray[np.int64] = np.where(priority[u] < priority[v], u, v)
+        blocked: npt.NDArray[np.bool_] = np.zeros(csr.n, dtype=np.bool_)
+        blocked[lower] = True
+        chosen: npt.NDArray[np.bool_] = remaining & ~blocked
+        classes.append(np.flatnonzero(chosen))
+        remaining &= ~chosen
+        keep: npt.NDArray[np.bool_] = remaining[u] & remaining[v]
+        u, v = u[keep], v[keep]
+    return classes
+
+
+def _neighbor_scores(
+    csr: CSRGraph, nodes: npt.NDArray[np.int64], labels: npt.NDArray[np.int64]
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """Total edge weight from each node to each label among its neighbors.
+
+    Returns
+    -------
+    tuple[NDArray[int64], NDArray[int64], NDArray[float64]]
+        Position of the node in nodes, label, and weight of every
+        (node, label) pair, sorted by node then label.
+    """
+    starts: npt.NDArray[np.int64] = csr.indptr[nodes]
+    lengths: npt.NDArray[np.int64] = csr.indptr[nodes + 1] - starts
+    positions: npt.NDArray[np.int64] = np.arange(lengths.sum()) + np.repeat(
+        starts - (np.cumsum(lengths) - lengths), lengths
+    )
+    owner: npt.NDArray[np.int64] = np.repeat(np.arange(len(nodes)), lengths)
+    keys: npt.NDArray[np.int64] = owner * csr.n + labels[csr.indices[positions]]
+    unique: npt.NDArray[np.int64]
+    inverse: npt.NDArray[np.int64]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    scores: npt.NDArray[np.float64] = np.bincount(inverse, csr.weights[positions])
+    return unique // csr.n, unique % csr.n, scores
+
+
+def _pick(
+    owner: npt.NDArray[np.int64],
+    priority: npt.NDArray[np.float64],
+    count: int,
+    default: npt.NDArray[np.int64],
+    choices: npt.NDArray[np.int64],
+) -> npt.NDArray[np.int64]:
+    """Choose the highest priority entry of each owner.
+
+    Owners without entries keep their default.
+    """
+    order: npt.NDArray[np.intp] = np.lexsort((priority, owner))
+    # The last entry of each owner's run has the highest priority.
+    last: npt.NDArray[np.bool_] = np.append(owner[order][1:] != owner[order][:-1], True)
+    picked: npt.NDArray[np.int64] = default.copy()
+    if count and len(owner):
+        best: npt.NDArray[np.intp] = order[last]
+        picked[owner[best]] = choices[best]
+    return picked
+
+
+def _propagate(
+    csr: CSRGraph,
+    nodes: npt.NDArray[np.int64],
+    labels: npt.NDArray[np.int64],
+    rng: Generator,
+) -> npt.NDArray[np.int64]:
+    """New labels of nodes: the label with the most neighbor weight.
+
+    A node keeps its label while it's tied for the most weight. Other ties
+    are broken at random.
+    """
+    owner: npt.NDArray[np.int64]
+    label: npt.NDArray[np.int64]
+    scores: npt.NDArray[np.float64]
+    owner, label, scores = _neighbor_scores(csr, nodes, labels)
+    if not len(owner):
+        return labels[nodes]
+    best: npt.NDArray[np.float64] = np.full(len(nodes), -np.inf)
+    np.maximum.at(best, owner, scores)
+    tied: npt.NDArray[np.bool_] = scores >= best[owner] * (1 - 1e-12)
+    priority: npt.NDArray[np.float64] = np.where(tied, rng.random(len(owner)), -1.0)
+    priority[tied & (label == labels[nodes][owner])] = 2.0
+    return _pick(owner, priority, len(nodes), labels[nodes], label)
+
+
+def _batches(
+    csr: CSRGraph, nodes: npt.NDArray[np.int64]
+) -> list[npt.NDArray[np.int64]]:
+    """Split nodes into runs of about COMMUNITY_BATCH neighbor entries."""
+    entries: npt.NDArray[np.int64] = np.cumsum(
+        csr.indptr[nodes + 1] - csr.indptr[nodes]
+    )
+    cuts: npt.NDArray[np.intp] = np.searchsorted(
+        entries,
+        np.arange(COMMUNITY_BATCH, entries[-1] if len(entries) else 0, COMMUNITY_BATCH),
+    )
+    return [batch for batch in np.split(nodes, np.unique(cuts)) if len(batch)]
+
+
+def _update_class(
+    csr: CSRGraph,
+    nodes: npt.NDArray[np.int64],
+    rng: Generator,
+    executor: Optional[ThreadPoolExecutor],
+    update: Callable[[npt.NDArray[np.int64], Generator], npt.NDArray[np.int64]],
+) -> npt.NDArray[np.int64]:
+    """Run update over batches of nodes, on the executor if there is one.
+
+    Every batch gets its own generator seeded from rng, so the results are
+    the same with any number of threads.
+    """
+    batches: list[npt.NDArray[np.int64]] = _batches(csr, nodes)
+    seeds: list[int] = rng.integers(2**63, size=len(batches)).tolist()
+    rngs: list[Generator] = [np.random.default_rng(seed) for seed in seeds]
+    if executor is None or len(batches) < 2:
+        results = map(update, batches, rngs)
+    else:
+        results = executor.map(update, batches, rngs)
+    return np.concatenate(list(results)) if batches else nodes
+
+
+def by_size(membership: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Renumber communities from largest to smallest.
+
+    Ties go to the community whose first node comes first.
+
+    Parameters
+    ----------
+    membership: numpy.typing.NDArray[numpy.int64]
+        Community of each node.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Community of each node numbered 0 (largest) to k - 1.
+    """
+    first: npt.NDArray[np.intp]
+    inverse: npt.NDArray[np.int64]
+    counts: npt.NDArray[np.int64]
+    _, first, inverse, counts = np.unique(
+        membership, return_index=True, return_inverse=True, return_counts=True
+    )
+    order: npt.NDArray[np.intp] = np.lexsort((first, -counts))
+    rank: npt.NDArray[np.int64] = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse]
+
+
+def label_propagation(
+    csr: CSRGraph,
+    rng: Optional[Generator] = None,
+    synchronous: bool = False,
+    threads: int = COMMUNITY_THREADS,
+) -> npt.NDArray[np.int64]:
+    """Weighted label propagation communities.
+
+    Every node starts in its own community and repeatedly adopts the label
+    with the most edge weight among its neighbors until no label changes.
+    Semi-synchronous propagation (Cordasco and Gargano) updates one color
+    class at a time (see color_classes) and always settles. Synchronous
+    propagation updates every node at once, which is faster per round but
+    may flip back and forth on bipartite-like parts of the graph until
+    MAX_ROUNDS.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph.
+    rng: numpy.random.Generator, optional
+        Source of randomness for the coloring and ties. A fresh generator is
+        used if None.
+    synchronous: bool, optional
+        Update every node at once. The default is False.
+    threads: int, optional
+        Threads scoring batches of nodes. The default is COMMUNITY_THREADS.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Community of each node in CSR order, largest community first.
+    """
+    rng = rng or np.random.default_rng()
+    labels: npt.NDArray[np.int64] = np.arange(csr.n, dtype=np.int64)
+    classes: list[npt.NDArray[np.int64]] = (
+        [labels.copy()] if synchronous else color_classes(csr, rng)
+    )
+    with ThreadPoolExecutor(threads, "communities") as executor:
+        for rounds in range(1, MAX_ROUNDS + 1):
+            changed: int = 0
+            for nodes in classes:
+                new: npt.NDArray[np.int64] = _update_class(
+                    csr,
+                    nodes,
+                    rng,
+                    executor,
+                    lambda batch, batch_rng: _propagate(csr, batch, labels, batch_rng),
+                )
+                changed += int((new != labels[nodes]).sum())
+                labels[nodes] = new
+            if not changed:
+                logging.info(f"Label propagation settled after {rounds} rounds.")
+                break
+        else:
+            logging.warning(f"Label propagation didn't settle in {MAX_ROUNDS} rounds.")
+    return by_size(labels)
+
+
+def modularity(
+    csr: CSRGraph, membership: npt.NDArray[np.int64], resolution: float = 1.0
+) -> float:
+    """Weighted modularity of a partition like nx.community.modularity.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph.
+    membership: numpy.typing.NDArray[numpy.int64]
+        Community of each node.
+    resolution: float, optional
+        Resolution parameter. The default is 1.0.
+
+    Returns
+    -------
+    float
+        Modularity.
+    """
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    w: npt.NDArray[np.float64]
+    u, v, w = edge_arrays(csr)
+    total: float = w.sum()
+    inside: float = w[membership[u] == membership[v]].sum()
+    strength: npt.NDArray[np.float64] = np.bincount(
+        np.concatenate((u, v)), np.concatenate((w, w)), minlength=csr.n
+    )
+    degree_sums: npt.NDArray[np.float64] = np.bincount(membership, strength)
+    return float(inside / total - resolution * ((degree_sums / (2 * total)) ** 2).sum())
+
+
+def _move(
+    csr: CSRGraph,
+    nodes: npt.NDArray[np.int64],
+    community: npt.NDArray[np.int64],
+    strength: npt.NDArray[np.float64],
+    totals: npt.NDArray[np.float64],
+    scale: float,
+) -> npt.NDArray[np.int64]:
+    """Best community of each node by modularity gain.
+
+    Each node may join a neighbor's community, or stay if nothing beats
+    its own. Exact ties go to the higher numbered community.
+    """
+    owner: npt.NDArray[np.int64]
+    target: npt.NDArray[np.int64]
+    links: npt.NDArray[np.float64]
+    owner, target, links = _neighbor_scores(csr, nodes, community)
+    current: npt.NDArray[np.int64] = community[nodes]
+    if not len(owner):
+        return current
+
+    k: npt.NDArray[np.float64] = strength[nodes][owner]
+    own: npt.NDArray[np.bool_] = target == current[owner]
+    # Moving out first takes the node's own strength off its community.
+    gain: npt.NDArray[np.float64] = links - scale * k * (
+        totals[target] - np.where(own, k, 0.0)
+    )
+    # Staying with no links to the own community still loses its share.
+    stay: npt.NDArray[np.float64] = (
+        -scale * strength[nodes] * (totals[current] - strength[nodes])
+    )
+    np.maximum.at(stay, owner[own], gain[own])
+    better: npt.NDArray[np.bool_] = gain > stay[owner] + 1e-12 * np.abs(stay[owner])
+    return _pick(owner[better], gain[better], len(nodes), current, target[better])
+
+
+def _aggregate(
+    csr: CSRGraph, community: npt.NDArray[np.int64], loops: npt.NDArray[np.float64]
+) -> tuple[CSRGraph, npt.NDArray[np.float64]]:
+    """Collapse each community into one node.
+
+    Returns
+    -------
+    tuple[CSRGraph, NDArray[float64]]
+        Graph of the communities and the weight inside each one, since
+        CSRGraph has no self loops.
+    """
+    k: int = int(community.max()) + 1
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    w: npt.NDArray[np.float64]
+    u, v, w = edge_arrays(csr)
+    cu: npt.NDArray[np.int64] = community[u]
+    cv: npt.NDArray[np.int64] = community[v]
+    inside: npt.NDArray[np.bool_] = cu == cv
+    new_loops: npt.NDArray[np.float64] = np.bincount(
+        community, loops, minlength=k
+    ) + np.bincount(cu[inside], w[inside], minlength=k)
+
+    keys: npt.NDArray[np.int64] = (
+        np.minimum(cu, cv)[~inside] * k + np.maximum(cu, cv)[~inside]
+    )
+    unique: npt.NDArray[np.int64]
+    inverse: npt.NDArray[np.int64]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return (
+        csr_from_edges(
+            np.arange(k), unique // k, unique % k, np.bincount(inverse, w[~inside])
+        ),
+        new_loops,
+    )
+
+
+def louvain(
+    csr: CSRGraph,
+    rng: Optional[Generator] = None,
+    resolution: float = 1.0,
+    threshold: float = 1e-7,
+    threads: int = COMMUNITY_THREADS,
+) -> npt.NDArray[np.int64]:
+    """Multilevel Louvain communities.
+
+    Each level moves nodes to the neighboring community with the best
+    modularity gain until a pass gains less than threshold, then collapses
+    every community into one node for the next level. Moves are made one
+    color class at a time (see color_classes) with every node of a class
+    scored at once against the community totals before the class moves,
+    like the parallel heuristics of Lu, Halappanavar, and Kalyanaraman.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph.
+    rng: numpy.random.Generator, optional
+        Source of randomness for the colorings. A fresh generator is used if
+        None.
+    resolution: float, optional
+        Resolution parameter. Higher values give smaller communities.
+        The default is 1.0.
+    threshold: float, optional
+        Smallest modularity gain of a pass worth another pass.
+        The default is 1e-7.
+    threads: int, optional
+        Threads scoring batches of nodes. The default is COMMUNITY_THREADS.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Community of each node in CSR order, largest community first.
+    """
+    rng = rng or np.random.default_rng()
+    membership: npt.NDArray[np.int64] = np.arange(csr.n, dtype=np.int64)
+    if not csr.m:
+        return membership
+    total: float = csr.weights.sum() / 2
+    scale: float = resolution / (2 * total)
+    level: CSRGraph = csr
+    loops: npt.NDArray[np.float64] = np.zeros(csr.n)
+
+    with ThreadPoolExecutor(threads, "communities") as executor:
+        while True:
+            strength: npt.NDArray[np.float64] = (
+                np.bincount(
+                    np.repeat(np.arange(level.n), np.diff(level.indptr)),
+                    level.weights,
+                    minlength=level.n,
+                )
+                + 2 * loops
+            )
+            community: npt.NDArray[np.int64] = np.arange(level.n, dtype=np.int64)
+            totals: npt.NDArray[np.float64] = strength.copy()
+            classes: list[npt.NDArray[np.int64]] = color_classes(level, rng)
+            quality: float = -np.inf
+            while True:
+                for nodes in classes:
+                    new: npt.NDArray[np.int64] = _update_class(
+                        level,
+                        nodes,
+                        rng,
+                        executor,
+                        lambda batch, _: _move(
+                            level, batch, community, strength, totals, scale
+                        ),
+                    )
+                    community[nodes] = new
+                    totals = np.bincount(community, strength, minlength=level.n)
+                score: float = _level_modularity(
+                    level, community, loops, strength, total, resolution
+                )
+                if score - quality < threshold:
+                    break
+                quality = score
+
+            community = np.unique(community, return_inverse=True)[1]
+            if community.max() + 1 == level.n:
+                break
+            membership = community[membership]
+            logging.info(
+                f"Louvain level: {level.n} nodes into {community.max() + 1} "
+                f"communities, modularity {quality:.4f}"
+            )
+            level, loops = _aggregate(level, community, loops)
+    return by_size(membership)
+
+
+def _level_modularity(
+    level: CSRGraph,
+    community: npt.NDArray[np.int64],
+    loops: npt.NDArray[np.float64],
+    strength: npt.NDArray[np.float64],
+    total: float,
+    resolution: float,
+) -> float:
+    """Modularity of the original graph from a collapsed level."""
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    w: npt.NDArray[np.float64]
+    u, v, w = edge_arrays(level)
+    inside: float = w[community[u] == community[v]].sum() + loops.sum()
+    degree_sums: npt.NDArray[np.float64] = np.bincount(community, strength)
+    return float(inside / total - resolution * ((degree_sums / (2 * total)) ** 2).sum())
+
+
+# Community detection method name to function of (csr, rng, threads).
+METHODS: dict[str, Callable[[CSRGraph, Generator, int], npt.NDArray[np.int64]]] = {
+    "label_propagation": lambda csr, rng, threads: label_propagation(
+        csr, rng, threads=threads
+    ),
+    "louvain": lambda csr, rng, threads: louvain(csr, rng, threads=threads),
+}
+
+
+@traced
+def graph_communities(
+    G: Graph,
+    method: str = "label_propagation",
+    seed: int = COMMUNITY_SEED,
+    threads: int = COMMUNITY_THREADS,
+) -> npt.NDArray[np.int64]:
+    """Communities of G in CSR node order. Cached on G per method and seed.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph with weights under "weight".
+    method: str, optional
+        "label_propagation" or "louvain". The default is "label_propagation".
+    seed: int, optional
+        Seed of the random number generator. The default is COMMUNITY_SEED.
+    threads: int, optional
+        Threads scoring batches of nodes. The default is COMMUNITY_THREADS.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Community of each node of to_csr(G), largest community first.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown community detection method: {method}")
+    return graph_cache(
+        G,
+        f"communities_{method}_{seed}",
+        lambda: METHODS[method](to_csr(G), np.random.default_rng(seed), threads),
+    )
+
+
+def set_communities(G: Graph, membership: npt.NDArray[np.int64], attr: str) -> None:
+    """Store community numbers as a node attribute of G.
+
+    The attribute can then be passed to attribute_assortativity or used as
+    the node colors of draw_gamers.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph the communities were found on.
+    membership: numpy.typing.NDArray[numpy.int64]
+        Community of each node in CSR order, e.g. from graph_communities.
+    attr: str
+        Name of the attribute.
+    """
+    nodes: npt.NDArray[Any] = to_csr(G).nodes
+    nx.set_node_attributes(G, dict(zip(nodes.tolist(), membership.tolist())), attr)
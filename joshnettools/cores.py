@@ -0,0 +1,95 @@
+import numpy as np
+import numpy.typing as npt
+import logging
+
+from networkx import Graph
+
+from csrgraph import CSRGraph, graph_cache, to_csr
+
+
+def core_numbers(csr: CSRGraph) -> npt.NDArray[np.int64]:
+    """Core number of every node by peeling whole layers at once.
+
+    Batagelj and Zaversnik's bucket algorithm removes nodes one at a time in
+    order of degree. Here every node with degree at most k leaves together,
+    their neighbors' degrees drop by one bincount, and the newly exposed
+    nodes leave next until only nodes with degree above k remain. Each edge
+    is subtracted once, so the work stays linear in the edges apart from one
+    scan of the remaining nodes per distinct core number.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Core number of each node in CSR order like nx.core_number.
+    """
+    degree: npt.NDArray[np.int64] = np.diff(csr.indptr)
+    core: npt.NDArray[np.int64] = np.full(csr.n, -1, dtype=np.int64)
+    alive: npt.NDArray[np.int64] = np.arange(csr.n, dtype=np.int64)
+    k: int = 0
+    while len(alive):
+        # Cores only grow, so skip straight to the smallest remaining degree.
+        k = max(k, int(degree[alive].min()))
+        frontier: npt.NDArray[np.int64] = alive[degree[alive] <= k]
+        while len(frontier):
+            core[frontier] = k
+            starts: npt.NDArray[np.int64] = csr.indptr[frontier]
+            lengths: npt.NDArray[np.int64] = csr.indptr[frontier + 1] - starts
+            positions: npt.NDArray[np.int64] = np.arange(lengths.sum()) + np.repeat(
+                starts - (np.cumsum(lengths) - lengths), lengths
+            )
+            neighbors: npt.NDArray[np.int64] = csr.indices[positions]
+            neighbors = neighbors[core[neighbors] < 0]
+            degree -= np.bincount(neighbors, minlength=csr.n)
+            touched: npt.NDArray[np.int64] = np.unique(neighbors)
+            frontier = touched[degree[touched] <= k]
+        alive = alive[core[alive] < 0]
+    return core
+
+
+def graph_core_numbers(G: Graph) -> npt.NDArray[np.int64]:
+    """Core numbers of G in CSR node order. Cached on G.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Core number of each node of to_csr(G).
+    """
+
+    def compute() -> npt.NDArray[np.int64]:
+        core: npt.NDArray[np.int64] = core_numbers(to_csr(G))
+        logging.info(f"Core numbers of {len(G)} nodes up to {core.max(initial=0)}")
+        return core
+
+    return graph_cache(G, "core_numbers", compute)
+
+
+def k_core(G: Graph, k: int) -> Graph:
+    """The k-core of G as a subgraph view, like nx.k_core(G, k).
+
+    The view is masked from G's cached core numbers, so every k after the
+    first is nearly free.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph.
+    k: int
+        Smallest core number to keep.
+
+    Returns
+    -------
+    networkx.Graph
+        Subgraph view of the nodes with core number k or more.
+    """
+    keep: npt.NDArray[np.bool_] = graph_core_numbers(G) >= k
+    return G.subgraph(to_csr(G).nodes[keep].tolist())
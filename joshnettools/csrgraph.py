@@ -0,0 +1,321 @@
+import networkx as nx
+import numpy as np
+import numpy.typing as npt
+import logging
+
+from networkx import Graph
+from typing import Any, NamedTuple, TypeVar
+from collections.abc import Callable, Hashable
+
+T = TypeVar("T")
+
+# Key of the cache graph_cache keeps in G.graph.
+CACHE_ATTR: str = "_joshnet_cache"
+
+
+class CSRGraph(NamedTuple):
+    """Undirected graph as compressed sparse row arrays.
+
+    Node i's neighbors are indices[indptr[i]:indptr[i + 1]] with edge weights
+    at the same positions in weights. Every edge is stored in both
+    directions and neighbors are sorted. Self loops are dropped.
+
+    Attributes
+    ----------
+    nodes: numpy.typing.NDArray[Any]
+        Original node for each compact node index.
+    indptr: numpy.typing.NDArray[numpy.int64]
+        Row offsets. Length is the number of nodes + 1.
+    indices: numpy.typing.NDArray[numpy.int64]
+        Column (neighbor) indices.
+    weights: numpy.typing.NDArray[numpy.float64]
+        Edge weights.
+    """
+
+    nodes: npt.NDArray[Any]
+    indptr: npt.NDArray[np.int64]
+    indices: npt.NDArray[np.int64]
+    weights: npt.NDArray[np.float64]
+
+    @property
+    def n(self) -> int:
+        """Number of nodes."""
+        return len(self.indptr) - 1
+
+    @property
+    def m(self) -> int:
+        """Number of undirected edges."""
+        return len(self.indices) // 2
+
+
+def fingerprint(G: Graph) -> tuple[int, int, int]:
+    """Cheap structural fingerprint of G.
+
+    Subgraph views share their parent's graph attribute dictionary, so
+    cached values are keyed by the node set and edge count as well.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph to fingerprint.
+
+    Returns
+    -------
+    tuple[int, int, int]
+        Node count, edge count, and a hash of the node set.
+    """
+    return G.number_of_nodes(), G.number_of_edges(), hash(frozenset(G))
+
+
+def graph_cache(G: Graph, name: str, compute: Callable[[], T]) -> T:
+    """Return G's cached value for name, calculating it if needed.
+
+    Values are kept in G.graph so they live and die with the graph. Only
+    structural values should be cached as attribute changes aren't detected.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph the value belongs to.
+    name: str
+        Name of the cached value.
+    compute: Callable[[], T]
+        Calculates the value on a cache miss.
+
+    Returns
+    -------
+    T
+        Cached or freshly calculated value.
+    """
+    cache: dict[tuple[str, Hashable], Any] = G.graph.setdefault(CACHE_ATTR, {})
+    key: tuple[str, Hashable] = (name, fingerprint(G))
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def cached_values(G: Graph, name: str) -> list[Any]:
+    """Every value cached under name for G or any graph sharing its cache.
+
+    Subgraph views and copies share their parent's cache, so this finds the
+    parent's values from a subgraph and vice versa.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph whose cache to search.
+    name: str
+        Name of the cached values.
+
+    Returns
+    -------
+    list[Any]
+        Cached values of every fingerprint.
+    """
+    cache: dict[tuple[str, Hashable], Any] = G.graph.get(CACHE_ATTR, {})
+    return [value for (key, _), value in list(cache.items()) if key == name]
+
+
+def csr_from_edges(
+    nodes: npt.NDArray[Any],
+    u: npt.NDArray[np.int64],
+    v: npt.NDArray[np.int64],
+    w: npt.NDArray[np.float64],
+) -> CSRGraph:
+    """Build a CSRGraph from undirected edge arrays.
+
+    Parameters
+    ----------
+    nodes: numpy.typing.NDArray[Any]
+        Original node for each compact index.
+    u: numpy.typing.NDArray[numpy.int64]
+        First endpoint of each edge.
+    v: numpy.typing.NDArray[numpy.int64]
+        Second endpoint of each edge.
+    w: numpy.typing.NDArray[numpy.float64]
+        Weight of each edge.
+
+    Returns
+    -------
+    CSRGraph
+        Graph with each edge stored in both directions.
+    """
+    loops: npt.NDArray[np.bool_] = u == v
+    u, v, w = u[~loops], v[~loops], w[~loops]
+
+    rows: npt.NDArray[np.int64] = np.concatenate((u, v))
+    cols: npt.NDArray[np.int64] = np.concatenate((v, u))
+    weights: npt.NDArray[np.float64] = np.concatenate((w, w))
+    order: npt.NDArray[np.intp] = np.lexsort((cols, rows))
+
+    indptr: npt.NDArray[np.int64] = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(nodes)), out=indptr[1:])
+    return CSRGraph(
+        nodes, indptr, cols[order].astype(np.int64), weights[order].astype(np.float64)
+    )
+
+
+def row_pairs(
+    starts: npt.NDArray[np.int64], lengths: npt.NDArray[np.int64]
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Every pair of positions i < j within each of the given rows.
+
+    Parameters
+    ----------
+    starts: numpy.typing.NDArray[numpy.int64]
+        Offset of each row.
+    lengths: numpy.typing.NDArray[numpy.int64]
+        Length of each row.
+
+    Returns
+    -------
+    tuple[NDArray[int64], NDArray[int64], NDArray[int64]]
+        Row number (0 to len(starts) - 1) and the two positions of each pair.
+    """
+    row: npt.NDArray[np.int64] = np.repeat(np.arange(len(starts)), lengths)
+    positions: npt.NDArray[np.int64] = (
+        np.arange(len(row)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ) + starts[row]
+    later: npt.NDArray[np.int64] = np.repeat(starts + lengths, lengths) - positions - 1
+    first: npt.NDArray[np.int64] = np.repeat(positions, later)
+    second: npt.NDArray[np.int64] = (
+        first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(later) - later, later)
+    )
+    return np.repeat(row, later), first, second
+
+
+def project_edges(
+    tops: npt.NDArray[np.int64], bottoms: npt.NDArray[np.int64], bottom_n: int
+) -> CSRGraph:
+    """Weighted projection of bipartite edges onto the bottom nodes.
+
+    Like nx.bipartite.weighted_projected_graph, two bottom nodes are linked
+    with the number of top nodes they share as the weight, and every bottom
+    node is kept even if it has no neighbors.
+
+    Parameters
+    ----------
+    tops: numpy.typing.NDArray[numpy.int64]
+        Top node code of each distinct bipartite edge.
+    bottoms: numpy.typing.NDArray[numpy.int64]
+        Bottom node code (0 to bottom_n - 1) of each bipartite edge.
+    bottom_n: int
+        Number of bottom nodes.
+
+    Returns
+    -------
+    CSRGraph
+        Projection with the bottom codes as its nodes.
+    """
+    order: npt.NDArray[np.intp] = np.argsort(tops, kind="stable")
+    members: npt.NDArray[np.int64] = bottoms[order]
+    degree: npt.NDArray[np.int64] = np.bincount(tops)
+    first: npt.NDArray[np.int64]
+    second: npt.NDArray[np.int64]
+    _, first, second = row_pairs(np.cumsum(degree) - degree, degree)
+    a: npt.NDArray[np.int64] = np.minimum(members[first], members[second])
+    b: npt.NDArray[np.int64] = np.maximum(members[first], members[second])
+    keys: npt.NDArray[np.int64]
+    counts: npt.NDArray[np.int64]
+    keys, counts = np.unique(a * bottom_n + b, return_counts=True)
+    return csr_from_edges(
+        np.arange(bottom_n),
+        keys // bottom_n,
+        keys % bottom_n,
+        counts.astype(np.float64),
+    )
+
+
+def to_csr(G: Graph, weight: str = "weight") -> CSRGraph:
+    """Convert G to a CSRGraph. The result is cached on G.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Undirected graph.
+    weight: str, optional
+        Edge attribute holding the weights. Missing weights are 1.
+        The default is "weight".
+
+    Returns
+    -------
+    CSRGraph
+        G as CSR arrays.
+    """
+
+    def convert() -> CSRGraph:
+        logging.info(f"Converting {G.name or 'graph'} to CSR arrays")
+        nodes: npt.NDArray[Any] = np.fromiter(G, object, G.number_of_nodes())
+        index: dict[Any, int] = {node: i for i, node in enumerate(nodes)}
+        m: int = G.number_of_edges()
+        edges: npt.NDArray[np.float64] = np.fromiter(
+            (
+                x
+                for first, second, w in G.edges(data=weight, default=1.0)
+                for x in (index[first], index[second], w)
+            ),
+            np.float64,
+            3 * m,
+        ).reshape(m, 3)
+        return csr_from_edges(
+            nodes,
+            edges[:, 0].astype(np.int64),
+            edges[:, 1].astype(np.int64),
+            edges[:, 2],
+        )
+
+    return graph_cache(G, f"csr_{weight}", convert)
+
+
+def edge_arrays(
+    csr: CSRGraph,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """Return each undirected edge once as (u, v, weight) arrays with u < v.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to pull edges from.
+
+    Returns
+    -------
+    tuple[NDArray[int64], NDArray[int64], NDArray[float64]]
+        Endpoints and weights.
+    """
+    rows: npt.NDArray[np.int64] = np.repeat(
+        np.arange(csr.n, dtype=np.int64), np.diff(csr.indptr)
+    )
+    upper: npt.NDArray[np.bool_] = rows < csr.indices
+    return rows[upper], csr.indices[upper], csr.weights[upper]
+
+
+def node_codes(
+    G: Graph, csr: CSRGraph, attr: str
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[Any]]:
+    """Encode a node attribute as integer codes in CSR node order.
+
+    Missing attributes are treated as their own value (None) like NetworkX's
+    assortativity functions do.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph holding the attribute.
+    csr: CSRGraph
+        CSR arrays of G.
+    attr: str
+        Node attribute to encode.
+
+    Returns
+    -------
+    tuple[numpy.typing.NDArray[numpy.int64], numpy.typing.NDArray[Any]]
+        Code of each node and the attribute value of each code.
+    """
+    values: dict[Any, Any] = nx.get_node_attributes(G, attr)
+    labels: dict[Any, int] = {}
+    codes: npt.NDArray[np.int64] = np.fromiter(
+        (labels.setdefault(values.get(node), len(labels)) for node in csr.nodes),
+        np.int64,
+        csr.n,
+    )
+    return codes, np.fromiter(labels, object, len(labels))
@@ -0,0 +1,212 @@
+import numpy as np
+import numpy.typing as npt
+import math
+
+from numpy.random import Generator
+from typing import Any
+from collections import Counter
+from itertools import combinations
+
+# Curveball trades applied between updates of the projection's statistics.
+SWAP_BATCH: int = 64
+
+
+class CurveballChain:
+    """Degree preserving randomization of a bipartite graph.
+
+    Curveball trades shuffle the neighbors two top nodes don't share between
+    them, which keeps every top and bottom degree fixed. The weighted
+    projection onto the bottom nodes isn't rebuilt. Instead its weights,
+    weighted triangle sums, and degree assortativity sums are updated from
+    the net weight changes of each batch of trades.
+
+    Parameters
+    ----------
+    tops: numpy.typing.NDArray[numpy.int64]
+        Top node code (0 to top_n - 1) of each bipartite edge.
+    bottoms: numpy.typing.NDArray[numpy.int64]
+        Bottom node code (0 to bottom_n - 1) of each bipartite edge.
+    """
+
+    def __init__(
+        self, tops: npt.NDArray[np.int64], bottoms: npt.NDArray[np.int64]
+    ) -> None:
+        self.top_n: int = int(tops.max()) + 1
+        self.bottom_n: int = int(bottoms.max()) + 1
+        self.members: list[set[int]] = [set() for _ in range(self.top_n)]
+        for top, bottom in zip(tops.tolist(), bottoms.tolist()):
+            self.members[top].add(bottom)
+        self.initial: list[frozenset[int]] = [frozenset(s) for s in self.members]
+
+        # Weighted projection and its running statistics.
+        self.adj: list[dict[int, int]] = [{} for _ in range(self.bottom_n)]
+        self.edges: int = 0
+        self.weight_counts: Counter[int] = Counter()
+        self.strength: npt.NDArray[np.float64] = np.zeros(self.bottom_n)
+        self.degree: npt.NDArray[np.int64] = np.zeros(self.bottom_n, dtype=np.int64)
+        # Sum over each node's triangles of (w_ij * w_jk * w_ki) ** (1/3).
+        self.triangles: npt.NDArray[np.float64] = np.zeros(self.bottom_n)
+        # Degree assortativity sums: sum(k * s), sum(k * s ** 2), and
+        # sum(s_u * s_v) over edges.
+        self.ks: float = 0.0
+        self.ks2: float = 0.0
+        self.ss: float = 0.0
+
+        delta: Counter[tuple[int, int]] = Counter()
+        for members in self.members:
+            delta.update(combinations(sorted(members), 2))
+        self._apply(delta)
+        # Floating point sums drift a little with every update, so reset
+        # restores them exactly. Replicates then don't depend on the ones
+        # calculated before them.
+        self._observed: tuple[Any, ...] = (
+            self.triangles.copy(),
+            self.strength.copy(),
+            self.ks,
+            self.ks2,
+            self.ss,
+        )
+
+    def _set_weight(self, a: int, b: int, new: int) -> None:
+        """Change the weight of (a, b) and update degrees and triangles."""
+        old: int = self.adj[a].get(b, 0)
+        if old == new:
+            return
+
+        # Only triangles through common neighbors change. Sorted so the sums
+        # don't depend on dictionary order.
+        small, large = sorted((self.adj[a], self.adj[b]), key=len)
+        for c in sorted(small.keys() & large.keys()):
+            others: int = self.adj[a][c] * self.adj[b][c]
+            change: float = math.cbrt(new * others) - math.cbrt(old * others)
+            self.triangles[a] += change
+            self.triangles[b] += change
+            self.triangles[c] += change
+
+        if old:
+            self.weight_counts[old] -= 1
+        if new:
+            self.weight_counts[new] += 1
+            self.adj[a][b] = new
+            self.adj[b][a] = new
+        else:
+            del self.adj[a][b]
+            del self.adj[b][a]
+
+        linked: int = bool(new) - bool(old)
+        self.edges += linked
+        self.degree[[a, b]] += linked
+        self.strength[[a, b]] += new - old
+
+    def _assort_terms(self, nodes: set[int], sign: float) -> None:
+        """Add (sign=1) or remove (sign=-1) nodes' assortativity terms."""
+        for u in sorted(nodes):
+            self.ks += sign * self.degree[u] * self.strength[u]
+            self.ks2 += sign * self.degree[u] * self.strength[u] ** 2
+            for v in sorted(self.adj[u]):
+                # Edges between two of the nodes are only counted once.
+                if v not in nodes or u < v:
+                    self.ss += sign * self.strength[u] * self.strength[v]
+
+    def _apply(self, delta: Counter[tuple[int, int]]) -> None:
+        """Apply net projection weight changes."""
+        changed: dict[tuple[int, int], int] = {
+            pair: change for pair, change in delta.items() if change
+        }
+        nodes: set[int] = {node for pair in changed for node in pair}
+        self._assort_terms(nodes, -1.0)
+        for (a, b), change in sorted(changed.items()):
+            self._set_weight(a, b, self.adj[a].get(b, 0) + change)
+        self._assort_terms(nodes, 1.0)
+
+    @staticmethod
+    def _membership_delta(
+        delta: Counter[tuple[int, int]], old: set[int], new: set[int]
+    ) -> None:
+        """Accumulate the weight changes of a top node going from old to new."""
+        kept: set[int] = old & new
+        for removed in old - new:
+            for other in kept:
+                delta[min(removed, other), max(removed, other)] -= 1
+        for added in new - old:
+            for other in kept:
+                delta[min(added, other), max(added, other)] += 1
+        delta.subtract(combinations(sorted(old - new), 2))
+        delta.update(combinations(sorted(new - old), 2))
+
+    def trade(self, rng: Generator, trades: int, batch: int = SWAP_BATCH) -> None:
+        """Run curveball trades, updating the projection after each batch.
+
+        Parameters
+        ----------
+        rng: numpy.random.Generator
+            Source of randomness.
+        trades: int
+            Number of trades.
+        batch: int, optional
+            Trades per projection update. The default is SWAP_BATCH.
+        """
+        for lo in range(0, trades, batch):
+            delta: Counter[tuple[int, int]] = Counter()
+            pairs: npt.NDArray[np.int64] = rng.integers(
+                0, self.top_n, size=(min(batch, trades - lo), 2)
+            )
+            for first, second in pairs.tolist():
+                if first == second:
+                    continue
+                s1: set[int] = self.members[first]
+                s2: set[int] = self.members[second]
+                only1: list[int] = sorted(s1 - s2)
+                pool: list[int] = only1 + sorted(s2 - s1)
+                if not only1 or len(pool) == len(only1):
+                    continue
+
+                shuffled: list[int] = rng.permutation(pool).tolist()
+                shared: set[int] = s1 & s2
+                new1: set[int] = shared | set(shuffled[: len(only1)])
+                new2: set[int] = shared | set(shuffled[len(only1) :])
+                self._membership_delta(delta, s1, new1)
+                self._membership_delta(delta, s2, new2)
+                self.members[first] = new1
+                self.members[second] = new2
+            self._apply(delta)
+
+    def reset(self) -> None:
+        """Return to the observed bipartite graph."""
+        delta: Counter[tuple[int, int]] = Counter()
+        for top, initial in enumerate(self.initial):
+            if self.members[top] != initial:
+                self._membership_delta(delta, self.members[top], set(initial))
+                self.members[top] = set(initial)
+        self._apply(delta)
+
+        triangles, strength, self.ks, self.ks2, self.ss = self._observed
+        self.triangles = triangles.copy()
+        self.strength = strength.copy()
+
+    def density(self) -> float:
+        """Density of the projection."""
+        n: int = self.bottom_n
+        return 2 * self.edges / (n * (n - 1)) if n > 1 else 0.0
+
+    def average_clustering(self) -> float:
+        """Weighted average clustering like nx.average_clustering."""
+        max_weight: int = max(
+            (weight for weight, count in self.weight_counts.items() if count),
+            default=1,
+        )
+        pairs: npt.NDArray[np.float64] = self.degree * (self.degree - 1.0)
+        clustering: npt.NDArray[np.float64] = np.divide(
+            2 * self.triangles,
+            pairs * max_weight,
+            out=np.zeros(self.bottom_n),
+            where=pairs > 0,
+        )
+        return float(clustering.mean())
+
+    def degree_assortativity(self) -> float:
+        """Weighted degree Pearson correlation like
+        nx.degree_pearson_correlation_coefficient(G, weight="weight")."""
+        ends: int = 2 * self.edges
+        mean: float = self.ks / ends
+        return (2 * self.ss / ends - mean**2) / (self.ks2 / ends - mean**2)
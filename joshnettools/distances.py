@@ -0,0 +1,171 @@
+import networkx as nx
+import numpy as np
+import numpy.typing as npt
+import logging
+
+from networkx import Graph
+from typing import Any, NamedTuple
+
+from csrgraph import CSRGraph, graph_cache, to_csr
+
+
+class Extrema(NamedTuple):
+    """Exact distance extrema of a connected graph.
+
+    Attributes
+    ----------
+    diameter: int
+        Largest eccentricity.
+    radius: int
+        Smallest eccentricity.
+    center: list[Any]
+        Nodes with eccentricity equal to the radius.
+    periphery: list[Any]
+        Nodes with eccentricity equal to the diameter.
+    searches: int
+        Breadth first searches it took.
+    """
+
+    diameter: int
+    radius: int
+    center: list[Any]
+    periphery: list[Any]
+    searches: int
+
+
+def bfs_distances(csr: CSRGraph, source: int) -> npt.NDArray[np.int64]:
+    """Hop distances from source, one whole frontier at a time.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Graph to search.
+    source: int
+        CSR index of the source node.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.int64]
+        Distance of each node. -1 for unreachable nodes.
+    """
+    dist: npt.NDArray[np.int64] = np.full(csr.n, -1, dtype=np.int64)
+    dist[source] = 0
+    frontier: npt.NDArray[np.int64] = np.array([source], dtype=np.int64)
+    level: int = 0
+    while len(frontier):
+        level += 1
+        starts: npt.NDArray[np.int64] = csr.indptr[frontier]
+        lengths: npt.NDArray[np.int64] = csr.indptr[frontier + 1] - starts
+        # Concatenate the neighbor lists of the whole frontier.
+        positions: npt.NDArray[np.int64] = np.arange(lengths.sum()) + np.repeat(
+            starts - (np.cumsum(lengths) - lengths), lengths
+        )
+        neighbors: npt.NDArray[np.int64] = csr.indices[positions]
+        frontier = np.unique(neighbors[dist[neighbors] < 0])
+        dist[frontier] = level
+    return dist
+
+
+def bounding_extrema(csr: CSRGraph) -> Extrema:
+    """Diameter, radius, center, and periphery by bounding eccentricities.
+
+    Takes and Kosters' bounding algorithm. Every BFS from a node v with
+    eccentricity e(v) bounds every other node w by
+    max(e(v) - d(v, w), d(v, w)) <= e(w) <= e(v) + d(v, w). Searches
+    alternate between the candidate with the largest upper bound and the one
+    with the smallest lower bound (starting with a double sweep from the
+    highest degree node) until every node either has a known eccentricity
+    or provably can't be in the center or the periphery. That usually takes
+    a handful of searches rather than one per node.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Connected graph.
+
+    Returns
+    -------
+    Extrema
+        Exact diameter, radius, center, and periphery.
+    """
+    n: int = csr.n
+    degree: npt.NDArray[np.int64] = np.diff(csr.indptr)
+    lower: npt.NDArray[np.int64] = np.zeros(n, dtype=np.int64)
+    upper: npt.NDArray[np.int64] = np.full(n, n, dtype=np.int64)
+    candidates: npt.NDArray[np.bool_] = np.ones(n, dtype=np.bool_)
+
+    current: int = int(np.argmax(degree))
+    high: bool = True
+    searches: int = 0
+    while candidates.any():
+        dist: npt.NDArray[np.int64] = bfs_distances(csr, current)
+        searches += 1
+        if (dist < 0).any():
+            raise nx.NetworkXError("Graph is not connected.")
+        ecc: int = int(dist.max())
+        np.maximum(lower, np.maximum(ecc - dist, dist), out=lower)
+        np.minimum(upper, ecc + dist, out=upper)
+
+        diameter_lower: int = int(lower.max())
+        radius_upper: int = int(upper.min())
+        # Known eccentricities are done. So are nodes that can't reach the
+        # diameter and can't get down to the radius.
+        candidates &= lower != upper
+        candidates &= ~((upper < diameter_lower) & (lower > radius_upper))
+        if not candidates.any():
+            break
+
+        # The double sweep: the first search's farthest node comes next.
+        if searches == 1:
+            far: npt.NDArray[np.int64] = np.flatnonzero(candidates & (dist == ecc))
+            if len(far):
+                current = int(far[np.argmax(degree[far])])
+                continue
+
+        pool: npt.NDArray[np.int64] = np.flatnonzero(candidates)
+        if high:
+            current = int(pool[np.lexsort((degree[pool], upper[pool]))[-1]])
+        else:
+            current = int(pool[np.lexsort((-degree[pool], lower[pool]))[0]])
+        high = not high
+
+    diameter: int = int(lower.max())
+    radius: int = int(upper.min())
+    known: npt.NDArray[np.bool_] = lower == upper
+    return Extrema(
+        diameter,
+        radius,
+        csr.nodes[known & (lower == radius)].tolist(),
+        csr.nodes[known & (lower == diameter)].tolist(),
+        searches,
+    )
+
+
+def extrema(G: Graph) -> Extrema:
+    """Exact diameter, radius, center, and periphery of G. Cached on G.
+
+    Replaces nx.eccentricity followed by nx.diameter, nx.radius, nx.center,
+    and nx.periphery. See bounding_extrema.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Connected graph. Edge weights are ignored like nx.eccentricity.
+
+    Returns
+    -------
+    Extrema
+        Exact diameter, radius, center, and periphery.
+    """
+    if not len(G):
+        raise nx.NetworkXError("Graph has no nodes.")
+
+    def compute() -> Extrema:
+        result: Extrema = bounding_extrema(to_csr(G))
+        logging.info(
+            f"Diameter {result.diameter} and radius {result.radius} took "
+            f"{result.searches} searches over {len(G)} nodes."
+        )
+        return result
+
+    return graph_cache(G, "extrema", compute)
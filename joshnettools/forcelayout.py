@@ -0,0 +1,404 @@
+import numpy as np
+import numpy.typing as npt
+import logging
+import math
+
+from numpy.random import Generator
+from typing import NamedTuple, Optional
+
+from csrgraph import CSRGraph
+
+# Seed of the layout unless one is given.
+LAYOUT_SEED: int = 0
+
+# Strength of the repulsion relative to the springs (Hu's C).
+REPULSION: float = 0.2
+
+# Pull toward the center at the layout's natural radius. Keeps components
+# that nothing else holds together from drifting away.
+GRAVITY: float = 1.0
+
+# Coarsening stops at this many nodes or when a level shrinks by less than
+# COARSEN_RATIO.
+COARSEST: int = 32
+COARSEN_RATIO: float = 0.8
+
+# Handshake rounds per coarsening level.
+MATCH_ROUNDS: int = 3
+
+# Iterations of the coarsest level and of every finer level. Finer levels
+# start from the prolonged coarse layout and need far fewer.
+COARSE_ITERATIONS: int = 300
+FINE_ITERATIONS: int = 30
+
+# Step length update of Hu's adaptive cooling and the step, relative to the
+# spring length, below which a level has converged.
+COOLING: float = 0.9
+STEP_TOLERANCE: float = 0.01
+
+# Deepest level of the quadtree and the average number of nodes sharing a
+# leaf below which it isn't split further.
+MAX_DEPTH: int = 20
+LEAF_NODES: int = 4
+
+# Cells or nodes whose Barnes-Hut interactions are gathered at once.
+FORCE_BATCH: int = 2**16
+
+# Children of a cell's parent and the parent's neighbors, counted from the
+# lower left child of the parent's lower left neighbor.
+_FAR_OFFSETS: npt.NDArray[np.int64] = np.array(
+    [(a, b) for a in range(6) for b in range(6)], dtype=np.int64
+)
+
+# A leaf and its neighbors.
+_NEAR_OFFSETS: npt.NDArray[np.int64] = np.array(
+    [(a, b) for a in (-1, 0, 1) for b in (-1, 0, 1)], dtype=np.int64
+)
+
+
+class Level(NamedTuple):
+    """One level of the quadtree.
+
+    Attributes
+    ----------
+    codes: numpy.typing.NDArray[numpy.int64]
+        Sorted codes (x << level | y) of the nonempty cells.
+    cell: numpy.typing.NDArray[numpy.int64]
+        Index into codes of each node's cell.
+    mass: numpy.typing.NDArray[numpy.float64]
+        Mass of each cell.
+    center: numpy.typing.NDArray[numpy.float64]
+        Center of mass of each cell.
+    """
+
+    codes: npt.NDArray[np.int64]
+    cell: npt.NDArray[np.int64]
+    mass: npt.NDArray[np.float64]
+    center: npt.NDArray[np.float64]
+
+
+def _quadtree(
+    pos: npt.NDArray[np.float64], mass: npt.NDArray[np.float64]
+) -> list[Level]:
+    """Levels of the quadtree over pos until the leaves are small.
+
+    Splitting stops once a node shares its leaf with LEAF_NODES nodes on
+    average, so clumps get deep trees and empty space costs nothing.
+    """
+    low: npt.NDArray[np.float64] = pos.min(axis=0)
+    span: float = max(float((pos.max(axis=0) - low).max()), 1e-9)
+    grid: npt.NDArray[np.int64] = np.minimum(
+        ((pos - low) / span * 2**MAX_DEPTH).astype(np.int64), 2**MAX_DEPTH - 1
+    )
+    levels: list[Level] = []
+    for level in range(MAX_DEPTH + 1):
+        cells: npt.NDArray[np.int64] = grid >> (MAX_DEPTH - level)
+        codes: npt.NDArray[np.int64]
+        cell: npt.NDArray[np.int64]
+        codes, cell = np.unique(
+            (cells[:, 0] << level) | cells[:, 1], return_inverse=True
+        )
+        cell_mass: npt.NDArray[np.float64] = np.bincount(cell, mass)
+        center: npt.NDArray[np.float64] = np.stack(
+            [np.bincount(cell, mass * pos[:, 0]), np.bincount(cell, mass * pos[:, 1])],
+            axis=1,
+        )
+        levels.append(Level(codes, cell, cell_mass, center / cell_mass[:, None]))
+        crowding: int = int((np.bincount(cell) ** 2).sum())
+        if level >= 2 and crowding <= LEAF_NODES * len(pos):
+            break
+    return levels
+
+
+def _lookup(
+    codes: npt.NDArray[np.int64],
+    level: int,
+    cells: npt.NDArray[np.int64],
+    cx: npt.NDArray[np.int64],
+    cy: npt.NDArray[np.int64],
+    keep: npt.NDArray[np.bool_],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Pairs of cells and the nonempty cells at (cx, cy) on the same level.
+
+    cx and cy hold a row of candidate coordinates per entry of cells. Only
+    the candidates marked by keep and inside the grid are looked up.
+    """
+    side: int = 1 << level
+    keep = keep & (cx >= 0) & (cx < side) & (cy >= 0) & (cy < side)
+    candidates: npt.NDArray[np.int64] = (cx[keep] << level) | cy[keep]
+    found: npt.NDArray[np.int64] = np.minimum(
+        np.searchsorted(codes, candidates), len(codes) - 1
+    )
+    exists: npt.NDArray[np.bool_] = codes[found] == candidates
+    owners: npt.NDArray[np.int64] = np.broadcast_to(cells[:, None], keep.shape)[keep]
+    return owners[exists], found[exists]
+
+
+def _pull(
+    at: npt.NDArray[np.float64],
+    center: npt.NDArray[np.float64],
+    mass: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """Repulsion mass / distance at each point from each center."""
+    delta: npt.NDArray[np.float64] = at - center
+    dist2: npt.NDArray[np.float64] = np.maximum((delta**2).sum(axis=1), 1e-12)
+    return (mass / dist2)[:, None] * delta
+
+
+def _accumulate(
+    force: npt.NDArray[np.float64],
+    index: npt.NDArray[np.int64],
+    push: npt.NDArray[np.float64],
+) -> None:
+    for axis in (0, 1):
+        force[:, axis] += np.bincount(index, push[:, axis], minlength=len(force))
+
+
+def repulsion(
+    pos: npt.NDArray[np.float64], mass: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Barnes-Hut approximation of every node's repulsion, mass / distance.
+
+    Rather than walking the quadtree once per node, cells interact with
+    cells: on each level a cell is pushed by the children of its parent's
+    neighbors that aren't its own neighbors, as one mass at their center,
+    and every node in the cell gets that push. Those cells are at least a
+    cell apart, which is about the accuracy of an opening criterion of one.
+    Nodes of the same or neighboring leaves push each other exactly.
+
+    Parameters
+    ----------
+    pos: numpy.typing.NDArray[numpy.float64]
+        Position of each node.
+    mass: numpy.typing.NDArray[numpy.float64]
+        Mass of each node.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.float64]
+        Force on each node without the REPULSION constant.
+    """
+    n: int = len(pos)
+    levels: list[Level] = _quadtree(pos, mass)
+    depth: int = len(levels) - 1
+    force: npt.NDArray[np.float64] = np.zeros_like(pos)
+
+    # No two cells of level one are a cell apart.
+    for level in range(2, depth + 1):
+        tree: Level = levels[level]
+        cell_force: npt.NDArray[np.float64] = np.zeros_like(tree.center)
+        for start in range(0, len(tree.codes), FORCE_BATCH):
+            cells: npt.NDArray[np.int64] = np.arange(
+                start, min(len(tree.codes), start + FORCE_BATCH)
+            )
+            x: npt.NDArray[np.int64] = (tree.codes[cells] >> level)[:, None]
+            y: npt.NDArray[np.int64] = (tree.codes[cells] & ((1 << level) - 1))[:, None]
+            cx: npt.NDArray[np.int64] = (x >> 1) * 2 - 2 + _FAR_OFFSETS[:, 0]
+            cy: npt.NDArray[np.int64] = (y >> 1) * 2 - 2 + _FAR_OFFSETS[:, 1]
+            src: npt.NDArray[np.int64]
+            dst: npt.NDArray[np.int64]
+            src, dst = _lookup(
+                tree.codes,
+                level,
+                cells,
+                cx,
+                cy,
+                (np.abs(cx - x) > 1) | (np.abs(cy - y) > 1),
+            )
+            _accumulate(
+                cell_force,
+                src,
+                _pull(tree.center[src], tree.center[dst], tree.mass[dst]),
+            )
+        force += cell_force[tree.cell]
+
+    leaf: Level = levels[depth]
+    # Nodes grouped by leaf.
+    order: npt.NDArray[np.int64] = np.argsort(leaf.cell, kind="stable")
+    counts: npt.NDArray[np.int64] = np.bincount(leaf.cell)
+    firsts: npt.NDArray[np.int64] = np.cumsum(counts) - counts
+    for start in range(0, n, FORCE_BATCH):
+        nodes: npt.NDArray[np.int64] = np.arange(start, min(n, start + FORCE_BATCH))
+        codes: npt.NDArray[np.int64] = leaf.codes[leaf.cell[nodes]]
+        x = (codes >> depth)[:, None]
+        y = (codes & ((1 << depth) - 1))[:, None]
+        src, dst = _lookup(
+            leaf.codes,
+            depth,
+            nodes,
+            x + _NEAR_OFFSETS[:, 0],
+            y + _NEAR_OFFSETS[:, 1],
+            np.ones((len(nodes), len(_NEAR_OFFSETS)), dtype=np.bool_),
+        )
+        # Every node against every other node of its own and neighboring leaves.
+        lengths: npt.NDArray[np.int64] = counts[dst]
+        positions: npt.NDArray[np.int64] = np.arange(lengths.sum()) + np.repeat(
+            firsts[dst] - (np.cumsum(lengths) - lengths), lengths
+        )
+        node: npt.NDArray[np.int64] = np.repeat(src, lengths)
+        other: npt.NDArray[np.int64] = order[positions]
+        pair: npt.NDArray[np.bool_] = node != other
+        node, other = node[pair], other[pair]
+        _accumulate(force, node, _pull(pos[node], pos[other], mass[other]))
+    return force
+
+
+def _edge_arrays(
+    csr: CSRGraph,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Both directions of every edge."""
+    return np.repeat(np.arange(csr.n), np.diff(csr.indptr)), csr.indices
+
+
+def _coarsen(
+    u: npt.NDArray[np.int64],
+    v: npt.NDArray[np.int64],
+    mass: npt.NDArray[np.float64],
+    rng: Generator,
+) -> npt.NDArray[np.int64]:
+    """Cluster of each node on the next coarser level.
+
+    Nodes are paired by handshakes: each free node picks the free neighbor
+    with the lightest combined mass and pairs that pick each other match.
+    Unmatched nodes then join a matched neighbor's cluster so that stars
+    collapse as well as chains.
+    """
+    n: int = len(mass)
+    match: npt.NDArray[np.int64] = np.full(n, -1, dtype=np.int64)
+    for _ in range(MATCH_ROUNDS):
+        free: npt.NDArray[np.bool_] = (match[u] < 0) & (match[v] < 0)
+        fu: npt.NDArray[np.int64] = u[free]
+        fv: npt.NDArray[np.int64] = v[free]
+        if not len(fu):
+            break
+        score: npt.NDArray[np.float64] = mass[fu] + mass[fv] + rng.random(len(fu))
+        order: npt.NDArray[np.int64] = np.lexsort((score, fu))
+        first: npt.NDArray[np.bool_] = np.r_[True, fu[order][1:] != fu[order][:-1]]
+        pick: npt.NDArray[np.int64] = np.full(n, -1, dtype=np.int64)
+        pick[fu[order][first]] = fv[order][first]
+        chosen: npt.NDArray[np.int64] = np.flatnonzero(pick >= 0)
+        mutual: npt.NDArray[np.int64] = chosen[pick[pick[chosen]] == chosen]
+        match[mutual] = pick[mutual]
+
+    root: npt.NDArray[np.int64] = np.arange(n, dtype=np.int64)
+    matched: npt.NDArray[np.bool_] = match >= 0
+    root[matched] = np.minimum(root[matched], match[matched])
+    # Unmatched nodes join the lightest matched neighbor's pair.
+    joins: npt.NDArray[np.bool_] = ~matched[u] & matched[v]
+    ju: npt.NDArray[np.int64] = u[joins]
+    jv: npt.NDArray[np.int64] = v[joins]
+    order = np.lexsort((mass[jv] + rng.random(len(jv)), ju))
+    first = np.r_[True, ju[order][1:] != ju[order][:-1]] if len(ju) else order > 0
+    root[ju[order][first]] = root[jv[order][first]]
+    return np.unique(root, return_inverse=True)[1]
+
+
+def _forces(
+    pos: npt.NDArray[np.float64],
+    mass: npt.NDArray[np.float64],
+    u: npt.NDArray[np.int64],
+    v: npt.NDArray[np.int64],
+) -> npt.NDArray[np.float64]:
+    """Spring, repulsion, and gravity forces with a spring length of one."""
+    force: npt.NDArray[np.float64] = REPULSION * repulsion(pos, mass)
+    delta: npt.NDArray[np.float64] = pos[v] - pos[u]
+    pull: npt.NDArray[np.float64] = delta * np.sqrt((delta**2).sum(axis=1))[:, None]
+    for axis in (0, 1):
+        force[:, axis] += np.bincount(u, pull[:, axis], minlength=len(pos))
+    center: npt.NDArray[np.float64] = np.average(pos, axis=0, weights=mass)
+    radius: float = math.sqrt(mass.sum())
+    force -= GRAVITY * (pos - center) / radius
+    return force
+
+
+def _relax(
+    pos: npt.NDArray[np.float64],
+    mass: npt.NDArray[np.float64],
+    u: npt.NDArray[np.int64],
+    v: npt.NDArray[np.int64],
+    iterations: int,
+    step: float,
+) -> npt.NDArray[np.float64]:
+    """Move nodes along their forces with Hu's adaptive step length."""
+    energy: float = math.inf
+    progress: int = 0
+    for _ in range(iterations):
+        force: npt.NDArray[np.float64] = _forces(pos, mass, u, v)
+        norms: npt.NDArray[np.float64] = np.sqrt((force**2).sum(axis=1))
+        pos = pos + step * force / np.maximum(norms, 1e-12)[:, None]
+        previous: float = energy
+        energy = float((norms**2).sum())
+        if energy < previous:
+            progress += 1
+            if progress >= 5:
+                progress = 0
+                step /= COOLING
+        else:
+            progress = 0
+            step *= COOLING
+        if step < STEP_TOLERANCE:
+            break
+    return pos
+
+
+def force_layout(
+    csr: CSRGraph,
+    seed: Optional[int] = LAYOUT_SEED,
+) -> npt.NDArray[np.float64]:
+    """Multilevel force directed layout like GraphViz's sfdp, in process.
+
+    The graph is coarsened by matching neighbors until it's tiny, the
+    coarsest graph is laid out from random positions, and each finer level
+    starts from its clusters' positions before relaxing. Repulsion between
+    every pair of nodes is approximated by Barnes-Hut, so an iteration takes
+    about n log n time on the CSR arrays without GraphViz's DOT round trip.
+
+    Parameters
+    ----------
+    csr: CSRGraph
+        Undirected graph. Weights are ignored.
+    seed: int, optional
+        Seed of the layout. The default is LAYOUT_SEED.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.float64]
+        (n, 2) positions in CSR order.
+    """
+    rng: Generator = np.random.default_rng(seed)
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    u, v = _edge_arrays(csr)
+    mass: npt.NDArray[np.float64] = np.ones(csr.n)
+    if csr.n <= 1:
+        return np.zeros((csr.n, 2))
+
+    # Coarsen until the graph is tiny or stops shrinking.
+    levels: list[tuple[npt.NDArray[np.int64], ...]] = [(u, v, mass)]
+    clusters: list[npt.NDArray[np.int64]] = []
+    while len(levels[-1][2]) > COARSEST:
+        u, v, mass = levels[-1]
+        cluster: npt.NDArray[np.int64] = _coarsen(u, v, mass, rng)
+        n_coarse: int = int(cluster.max()) + 1
+        if n_coarse > COARSEN_RATIO * len(mass):
+            break
+        cu: npt.NDArray[np.int64] = cluster[u]
+        cv: npt.NDArray[np.int64] = cluster[v]
+        keep: npt.NDArray[np.bool_] = cu != cv
+        codes: npt.NDArray[np.int64] = np.unique(cu[keep] * n_coarse + cv[keep])
+        clusters.append(cluster)
+        levels.append((codes // n_coarse, codes % n_coarse, np.bincount(cluster, mass)))
+    logging.info(
+        f"Force layout of {csr.n} nodes over {len(levels)} levels down to "
+        f"{len(levels[-1][2])} nodes"
+    )
+
+    u, v, mass = levels[-1]
+    side: float = math.sqrt(mass.sum())
+    pos: npt.NDArray[np.float64] = rng.random((len(mass), 2)) * side
+    pos = _relax(pos, mass, u, v, COARSE_ITERATIONS, side / 4)
+    for (u, v, mass), cluster in zip(levels[-2::-1], clusters[::-1]):
+        # The clusters' nodes start on top of their cluster with some jitter.
+        pos = pos[cluster] + rng.normal(scale=0.1, size=(len(cluster), 2))
+        pos = _relax(pos, mass, u, v, FINE_ITERATIONS, 1.0)
+    return pos
@@ -5,6 +5,7 @@ from networkx.classes.graph import Graph
 from typing import Optional
 
 import subcolors
+from instrument import traced
 
 
 def parse_auth_attr(gamers_df: pd.DataFrame, node: str, attr: str) -> str:
@@ -79,6 +80,7 @@ def parse_edge_attr(gamers_df: pd.DataFrame, first: str, second: str, attr: str)
     return subcolors.subreddit_colors(intersects)
 
 
+@traced
 def add_attributes(G: Graph, gamers_df: pd.DataFrame) -> None:
     """Add attributes to gamers network.
 
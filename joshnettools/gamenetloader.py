@@ -6,11 +6,234 @@ import logging
 from typing import Optional
 from pathlib import Path
 
+from instrument import traced
+
 # Shrink the network by removing everyone who doesn't appear as frequently
 # as this value.
 DEFAULT_N_FREQUENCY: int = 3
 
+# Local copy of the data set load tries first.
+DATA_PATH: Path = (
+    Path(__file__).parent.resolve().joinpath("data", "gamers_reddit_medium_2020.csv")
+)
+
+# ======================================
+# Systems, games, and general subreddits
+# ======================================
+GAME_SUBS: list[str] = [
+    "DarkSouls2",
+    "KingdomHearts",
+    "darksouls",
+    "fireemblem",
+    "MonsterHunter",
+    "Doom",
+    "bloodborne",
+    "DevilMayCry",
+    "darksouls3",
+    "pokemon",
+    "halo",
+    "yakuzagames",
+    "Fallout",
+    "DestinyTheGame",
+    "metalgearsolid",
+    "skyrim",
+    "MonsterHunterWorld",
+    "demonssouls",
+    "wow",
+    "Minecraft",
+    "Overwatch",
+    "GlobalOffensive",
+    "leagueoflegends",
+    "zelda",
+    "AnimalCrossing",
+    "witcher",
+    "PUBATTLEGROUNDS",
+    "SEGA",
+    "smashbros",
+    "RocketLeague",
+    "FallGuysGame",
+    "StardewValley",
+    "DotA2",
+]
+
+SYS_SUBS: list[str] = [
+    "psx",
+    "PS3",
+    "ps2",
+    "pcmasterrace",
+    "nintendo",
+    "xboxone",
+    "pcgaming",
+    "PS4",
+    "Steam",
+    "buildapc",
+    "NintendoSwitch",
+    "PS5",
+    "XboxSeriesX",
+    "3DS",
+    "xbox",
+    "xbox360",
+]
+
+GEN_SUBS: list[str] = [
+    "JRPG",
+    "gamedesign",
+    "linux_gaming",
+    "otomegames",
+    "boardgames",
+    "emulation",
+    "Games",
+    "gaming",
+    "GamePhysics",
+    "rpg",
+    "truegaming",
+    "ShouldIbuythisgame",
+    "FreeGamesOnSteam",
+    "IndieGaming",
+]
+
+# =========================================================
+# Subreddits reasonably associated with a company/system/PC
+# =========================================================
+
+# The Yakuzas are recently being ported to PC, but I'll add it to Sony
+# for now anyway.
+SONY_SUBS: list[str] = [
+    "psx",
+    "ps2",
+    "PS3",
+    "PS4",
+    "PS5",
+    "bloodborne",
+    "demonssouls",
+    "KingdomHearts",
+    "yakuzagames",
+]
 
+# The Halo Master Chief Collection was ported to PC in 2019.
+# Buuuut the Xbox section seems lonely so I'll include Halo.
+# (This is a limitation based on how I collected the data).
+XBOX_SUBS: list[str] = ["xbox", "xbox360", "xboxone", "XboxSeriesX", "halo"]
+
+NINTENDO_SUBS: list[str] = [
+    "nintendo",
+    "NintendoSwitch",
+    "3DS",
+    "fireemblem",
+    "pokemon",
+    "AnimalCrossing",
+    "smashbros",
+    "zelda",
+]
+
+PC_SUBS: list[str] = [
+    "wow",
+    "leagueoflegends",
+    "GlobalOffensive",
+    "Minecraft",
+    "Overwatch",
+    "linux_gaming",
+    "emulation",
+    "Steam",
+    "buildapc",
+    "pcmasterrace",
+    "FreeGamesOnSteam",
+    "DotA2",
+    "pcgaming",
+]
+
+MULTI_SUBS: list[str] = [
+    "DarkSouls2",
+    "darksouls",
+    "MonsterHunter",
+    "Fallout",
+    "DestinyTheGame",
+    "skyrim",
+    "metalgearsolid",
+    "witcher",
+    "PUBATTLEGROUNDS",
+    "SEGA",
+    "RocketLeague",
+    "FallGuysGame",
+    "StardewValley",
+    "otomegames",
+    "Doom",
+    "DevilMayCry",
+    "darksouls3",
+    "JRPG",
+    "rpg",
+    "IndieGaming",
+    "MonsterHunterWorld",
+]
+
+NONSYS_SUBS: list[str] = [
+    "gamedesign",
+    "boardgames",
+    "Games",
+    "gaming",
+    "GamePhysics",
+    "truegaming",
+    "ShouldIbuythisgame",
+]
+
+# Attribute to (subreddits, value) pairs that label_subreddits sets from each
+# row's subreddit. Later pairs win for subreddits in several lists.
+SUBREDDIT_LABELS: dict[str, list[tuple[list[str], str]]] = {
+    # VGames avoids clashes with Games
+    "SysGamGen": [(GAME_SUBS, "VGames"), (SYS_SUBS, "Systems"), (GEN_SUBS, "General")],
+    # Colors for SysGamGem
+    # Stolen from: https://github.com/morhetz/gruvbox-contrib
+    "SysGamGen_col": [
+        (GAME_SUBS, "#cc241d"),
+        (SYS_SUBS, "#458588"),
+        (GEN_SUBS, "#b16286"),
+    ],
+    "Systems": [
+        (SONY_SUBS, "Sony"),
+        (XBOX_SUBS, "Xbox"),
+        (NINTENDO_SUBS, "Nintendo"),
+        (PC_SUBS, "PC"),
+        (MULTI_SUBS, "Multi"),
+        (NONSYS_SUBS, "NonSys"),
+    ],
+}
+
+
+def subreddit_labels(attr: str) -> dict[str, str]:
+    """Map each labeled subreddit to its value of attr.
+
+    Parameters
+    ----------
+    attr: str
+        Attribute in SUBREDDIT_LABELS such as "Systems" or "SysGamGen".
+
+    Returns
+    -------
+    dict[str, str]
+        Subreddit to value. Unlisted subreddits are missing.
+    """
+    return {sub: value for subs, value in SUBREDDIT_LABELS[attr] for sub in subs}
+
+
+def label_subreddits(gamers: pd.DataFrame) -> pd.DataFrame:
+    """Add the SUBREDDIT_LABELS attributes to every row based on its subreddit.
+
+    Parameters
+    ----------
+    gamers: pandas.DataFrame
+        Gamers network as a DataFrame.
+
+    Returns
+    -------
+    pandas.DataFrame
+        gamers with the attributes set. Unlisted subreddits get NaN.
+    """
+    for attr in SUBREDDIT_LABELS:
+        gamers[attr] = gamers.subreddit.map(subreddit_labels(attr))
+    return gamers
+
+
+@traced
 def shrink_network_by(
     gamers_df: pd.DataFrame, n_freq: int = DEFAULT_N_FREQUENCY
 ) -> pd.DataFrame:
@@ -36,6 +259,7 @@ def shrink_network_by(
     return gamers_df.loc[gamers_df.author.isin(freq_auths)]
 
 
+@traced
 def load_network(path: str | Path, n_freq: int = DEFAULT_N_FREQUENCY) -> pd.DataFrame:
     """Loads and processes gamers network from path.
 
@@ -55,184 +279,7 @@ def load_network(path: str | Path, n_freq: int = DEFAULT_N_FREQUENCY) -> pd.Data
     logging.info(f"Loading network data from {path}")
     gamers: pd.DataFrame = pd.read_csv(path, engine="pyarrow")
     gamers = shrink_network_by(gamers, n_freq)
-
-    # ======================================
-    # Systems, games, and general subreddits
-    # ======================================
-    game_subs: list[str] = [
-        "DarkSouls2",
-        "KingdomHearts",
-        "darksouls",
-        "fireemblem",
-        "MonsterHunter",
-        "Doom",
-        "bloodborne",
-        "DevilMayCry",
-        "darksouls3",
-        "pokemon",
-        "halo",
-        "yakuzagames",
-        "Fallout",
-        "DestinyTheGame",
-        "metalgearsolid",
-        "skyrim",
-        "MonsterHunterWorld",
-        "demonssouls",
-        "wow",
-        "Minecraft",
-        "Overwatch",
-        "GlobalOffensive",
-        "leagueoflegends",
-        "zelda",
-        "AnimalCrossing",
-        "witcher",
-        "PUBATTLEGROUNDS",
-        "SEGA",
-        "smashbros",
-        "RocketLeague",
-        "FallGuysGame",
-        "StardewValley",
-        "DotA2",
-    ]
-
-    sys_subs: list[str] = [
-        "psx",
-        "PS3",
-        "ps2",
-        "pcmasterrace",
-        "nintendo",
-        "xboxone",
-        "pcgaming",
-        "PS4",
-        "Steam",
-        "buildapc",
-        "NintendoSwitch",
-        "PS5",
-        "XboxSeriesX",
-        "3DS",
-        "xbox",
-        "xbox360",
-    ]
-
-    gen_subs: list[str] = [
-        "JRPG",
-        "gamedesign",
-        "linux_gaming",
-        "otomegames",
-        "boardgames",
-        "emulation",
-        "Games",
-        "gaming",
-        "GamePhysics",
-        "rpg",
-        "truegaming",
-        "ShouldIbuythisgame",
-        "FreeGamesOnSteam",
-        "IndieGaming",
-    ]
-
-    # VGames avoids clashes with Games
-    gamers.loc[gamers.subreddit.isin(game_subs), "SysGamGen"] = "VGames"
-    gamers.loc[gamers.subreddit.isin(sys_subs), "SysGamGen"] = "Systems"
-    gamers.loc[gamers.subreddit.isin(gen_subs), "SysGamGen"] = "General"
-    # Colors for SysGamGem
-    # Stolen from: https://github.com/morhetz/gruvbox-contrib
-    gamers.loc[gamers.subreddit.isin(game_subs), "SysGamGen_col"] = "#cc241d"
-    gamers.loc[gamers.subreddit.isin(sys_subs), "SysGamGen_col"] = "#458588"
-    gamers.loc[gamers.subreddit.isin(gen_subs), "SysGamGen_col"] = "#b16286"
-
-    # =========================================================
-    # Subreddits reasonably associated with a company/system/PC
-    # =========================================================
-
-    # The Yakuzas are recently being ported to PC, but I'll add it to Sony
-    # for now anyway.
-    sony_subs: list[str] = [
-        "psx",
-        "ps2",
-        "PS3",
-        "PS4",
-        "PS5",
-        "bloodborne",
-        "demonssouls",
-        "KingdomHearts",
-        "yakuzagames",
-    ]
-
-    # The Halo Master Chief Collection was ported to PC in 2019.
-    # Buuuut the Xbox section seems lonely so I'll include Halo.
-    # (This is a limitation based on how I collected the data).
-    xbox_subs: list[str] = ["xbox", "xbox360", "xboxone", "XboxSeriesX", "halo"]
-
-    nintendo_subs: list[str] = [
-        "nintendo",
-        "NintendoSwitch",
-        "3DS",
-        "fireemblem",
-        "pokemon",
-        "AnimalCrossing",
-        "smashbros",
-        "zelda",
-    ]
-
-    pc_subs: list[str] = [
-        "wow",
-        "leagueoflegends",
-        "GlobalOffensive",
-        "Minecraft",
-        "Overwatch",
-        "linux_gaming",
-        "emulation",
-        "Steam",
-        "buildapc",
-        "pcmasterrace",
-        "FreeGamesOnSteam",
-        "DotA2",
-        "pcgaming",
-    ]
-
-    multi_subs: list[str] = [
-        "DarkSouls2",
-        "darksouls",
-        "MonsterHunter",
-        "Fallout",
-        "DestinyTheGame",
-        "skyrim",
-        "metalgearsolid",
-        "witcher",
-        "PUBATTLEGROUNDS",
-        "SEGA",
-        "RocketLeague",
-        "FallGuysGame",
-        "StardewValley",
-        "otomegames",
-        "Doom",
-        "DevilMayCry",
-        "darksouls3",
-        "JRPG",
-        "rpg",
-        "IndieGaming",
-        "MonsterHunterWorld",
-    ]
-
-    nonsys_subs: list[str] = [
-        "gamedesign",
-        "boardgames",
-        "Games",
-        "gaming",
-        "GamePhysics",
-        "truegaming",
-        "ShouldIbuythisgame",
-    ]
-
-    gamers.loc[gamers.subreddit.isin(sony_subs), "Systems"] = "Sony"
-    gamers.loc[gamers.subreddit.isin(xbox_subs), "Systems"] = "Xbox"
-    gamers.loc[gamers.subreddit.isin(nintendo_subs), "Systems"] = "Nintendo"
-    gamers.loc[gamers.subreddit.isin(pc_subs), "Systems"] = "PC"
-    gamers.loc[gamers.subreddit.isin(multi_subs), "Systems"] = "Multi"
-    gamers.loc[gamers.subreddit.isin(nonsys_subs), "Systems"] = "NonSys"
-
-    return gamers
+    return label_subreddits(gamers)
 
 
 def load(path: Optional[str | Path] = None) -> pd.DataFrame:
@@ -252,11 +299,7 @@ def load(path: Optional[str | Path] = None) -> pd.DataFrame:
     if not path:
         try:
             logging.info("Trying to load data from disk")
-            path = (
-                Path(__file__)
-                .parent.resolve()
-                .joinpath("data", "gamers_reddit_medium_2020.csv")
-            )
+            path = DATA_PATH
         # Catch FileNotFoundError in order to try GitHub next.
         except FileNotFoundError:
             logging.warning("Loading data from GitHub")
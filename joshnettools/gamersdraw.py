@@ -1,19 +1,29 @@
+from __future__ import annotations
+
 import networkx as nx
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
 
-from matplotlib.patches import Patch
-from matplotlib.figure import Figure
-from matplotlib.axes import Axes, Subplot
-from matplotlib.legend import Legend
 from networkx.classes.graph import Graph
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from collections.abc import Sequence, Iterable
 
+from distances import Extrema, extrema
+from cores import k_core
+from instrument import traced
+from layout import Positions, graph_layout
+
+# matplotlib is only imported once something is drawn so that importing this
+# module (or main) stays cheap for jobs that never plot.
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+    from matplotlib.axes import Axes, Subplot
+    from matplotlib.legend import Legend
+
 
+@traced
 def draw_gamers(
     gamers: Graph,
     algo: str = "sfdp",
@@ -35,7 +45,9 @@ def draw_gamers(
         Preprocessed graph of the gamers network data.
     algo: str
         Network drawing algorithm to pass to GraphViz. Must be one of: dot,
-        twopi, fdp, sfdp, circo. Defaults to sfdp.
+        twopi, fdp, sfdp, circo, or "force" for the in process layout of
+        forcelayout.py. Defaults to sfdp. Layouts are cached, see
+        layout.graph_layout.
     color: str
         Name of attribute to use for node colors. For example, sub_color will
         retrieve the colors defined by the sub_color attribute.
@@ -54,12 +66,13 @@ def draw_gamers(
         f"DRAW: Gamers network with the {algo} algorithm, {color} node colors, and {edge_color} edge color."
     )
 
-    # Use GraphViz to calculate node and edge positions rather than the slower
-    # NetworkX implementations
-    pos: dict[int, tuple[float, float]] = nx.nx_pydot.pydot_layout(gamers, prog=algo)
+    # Subgraphs of a graph that's already been drawn reuse its layout.
+    pos: Positions = graph_layout(gamers, algo)
 
     # Create a base Figure and Axes if not provided
     if not fig and not ax:
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(22, 22))
     elif bool(fig) ^ bool(ax):
         # Raise an error if only one of fig or ax is provided instead of both
@@ -95,6 +108,7 @@ def draw_gamers(
     return fig, ax
 
 
+@traced
 def draw_degree_centrality(
     gamers: Graph,
     offset: int = 10000,
@@ -143,6 +157,7 @@ def draw_degree_centrality(
     )
 
 
+@traced
 def draw_k_core_decompose(
     gamers: Graph,
     k_range: range = range(8, 16),
@@ -183,6 +198,8 @@ def draw_k_core_decompose(
     )
     col: int = int(len(k_range) / 2) if len(k_range) != 2 else 2
 
+    import matplotlib.pyplot as plt
+
     # I want a large figure because this looks terrible if too small.
     fig: Figure
     axes: npt.NDArray[Subplot]
@@ -192,7 +209,8 @@ def draw_k_core_decompose(
         edge_color = np.repeat(edge_color, len(k_range))
 
     for ax, k, ecolor in zip(axes.flat, k_range, edge_color):
-        decomposed: Graph = nx.k_core(gamers, k)
+        # Every k is masked from one core number decomposition.
+        decomposed: Graph = k_core(gamers, k)
 
         # Ignoring return values since they're the same fig, ax I passed in.
         draw_gamers(
@@ -202,6 +220,7 @@ def draw_k_core_decompose(
     return fig, axes
 
 
+@traced
 def draw_diameter_radius(
     lcc: Graph,
     cent_offset: int = 2048,
@@ -236,10 +255,10 @@ def draw_diameter_radius(
     """
     logging.info("DRAW: Center and periphery")
 
-    # Avoid recalculating eccentricity. We'll need an eccentricity dictionary
-    # at least once.
-    logging.info("Calculating eccentricity.")
-    lcc_ecc: dict[int, int] = nx.eccentricity(lcc)
+    # Center and periphery come from bounding eccentricities rather than
+    # calculating every node's eccentricity. The result is cached on lcc.
+    logging.info("Calculating center and periphery.")
+    lcc_extrema: Extrema = extrema(lcc)
 
     if barycenter:
         # Barycenter centrality is normalized by accounting for the total
@@ -247,10 +266,8 @@ def draw_diameter_radius(
         logging.info("Calculating barycenter")
         center: list[int] = nx.barycenter(lcc, weight="weight")
     else:
-        logging.info("Calculating center")
-        center = nx.center(lcc, lcc_ecc)
-    logging.info("Calculating periphery")
-    periphery: list[int] = nx.periphery(lcc, lcc_ecc)
+        center = lcc_extrema.center
+    periphery: list[int] = lcc_extrema.periphery
 
     # Nodes outside of the radius/diameter are green. The center is red and
     # the periphery is yellow.
@@ -284,6 +301,7 @@ def draw_diameter_radius(
     )
 
 
+@traced
 def draw_lollypop(counts_df: pd.Series, suptitle: str) -> tuple[Figure, Subplot]:
     """Draw a lollypop plot of counts_df.
 
@@ -303,6 +321,7 @@ def draw_lollypop(counts_df: pd.Series, suptitle: str) -> tuple[Figure, Subplot]
         Axes associated with fig.
     """
     logging.info("DRAW: lollypop plot")
+    import matplotlib.pyplot as plt
 
     fig: Figure
     ax: Subplot
@@ -377,6 +396,8 @@ def add_network_leg(
         )
 
     if legend and col_labels is not None:
+        from matplotlib.patches import Patch
+
         # Manual legend creation
         # Patches are used to represent each color present
         handles: list[Patch] = []
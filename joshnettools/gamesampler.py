@@ -0,0 +1,152 @@
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import logging
+
+from numpy.random import Generator
+from pathlib import Path
+from typing import Optional
+
+from gamenetloader import (
+    DATA_PATH,
+    DEFAULT_N_FREQUENCY,
+    label_subreddits,
+    subreddit_labels,
+)
+
+# Rows read at a time while streaming the data set.
+SAMPLE_CHUNK: int = 2**16
+
+# Sampling unit to its column.
+UNITS: dict[str, str] = {"author": "author", "thread": "permalink"}
+
+# Stratum of subreddits without a label.
+UNLABELED: str = "Unlabeled"
+
+
+def _chunks(path: str | Path, chunksize: int) -> pd.io.parsers.TextFileReader:
+    return pd.read_csv(path, chunksize=chunksize)
+
+
+def _tally(total: Optional[pd.Series], counts: pd.Series) -> pd.Series:
+    """Add one chunk's counts to the running totals."""
+    return counts if total is None else total.add(counts, fill_value=0)
+
+
+def _quotas(counts: pd.Series, size: int) -> pd.Series:
+    """Split size over strata in proportion to their unit counts.
+
+    Largest remainders get the leftover units so the quotas add up to size.
+    """
+    exact: pd.Series = counts / counts.sum() * size
+    quotas: pd.Series = np.floor(exact).astype(np.int64)
+    leftover: int = size - int(quotas.sum())
+    order: pd.Index = (exact - quotas).sort_values(ascending=False, kind="stable").index
+    quotas[order[:leftover]] += 1
+    return quotas.clip(upper=counts)
+
+
+def sample_network(
+    size: int,
+    unit: str = "author",
+    strata: Optional[str] = None,
+    path: Optional[str | Path] = None,
+    seed: Optional[int] = None,
+    n_freq: int = DEFAULT_N_FREQUENCY,
+    chunksize: int = SAMPLE_CHUNK,
+) -> pd.DataFrame:
+    """Sample authors or threads while streaming the data set.
+
+    Unlike sampling rows, every row of a sampled unit is kept. Sampling
+    authors keeps all of their posts, so their projection is exactly the
+    subgraph of the full projection induced by the sampled authors. Sampling
+    threads keeps everyone who posted in them.
+
+    The data set is streamed twice in chunks and never loaded whole. The
+    first scan counts each author's rows (for the n_freq filter that load
+    applies) and the rows of each unit in each stratum. The second keeps the
+    rows of the sampled units. Sampling threads takes a scan in between to
+    find the threads that an author passing n_freq posted in.
+
+    Parameters
+    ----------
+    size: int
+        Units to sample. Fewer are returned if there aren't that many.
+    unit: str, optional
+        "author" or "thread". The default is "author".
+    strata: str, optional
+        Sample each value of this attribute in proportion to its units, e.g.
+        "Systems" or "SysGamGen". A unit belongs to the stratum most of its
+        rows are in. The default is None (uniform).
+    path: str | Path, optional
+        Data set to sample. The default is None (DATA_PATH).
+    seed: int, optional
+        Seed of the sample. The default is None.
+    n_freq: int, optional
+        Drop authors with fewer rows in the full data set like load does.
+        The default is DEFAULT_N_FREQUENCY.
+    chunksize: int, optional
+        Rows read at a time. The default is SAMPLE_CHUNK.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Rows of the sampled units with the same attributes as load.
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Unknown sampling unit: {unit}")
+    column: str = UNITS[unit]
+    path = path or DATA_PATH
+    labels: dict[str, str] = subreddit_labels(strata) if strata else {}
+
+    logging.info(f"Counting {unit}s in {path}")
+    authors: Optional[pd.Series] = None
+    unit_strata: Optional[pd.Series] = None
+    chunk: pd.DataFrame
+    for chunk in _chunks(path, chunksize):
+        authors = _tally(authors, chunk.author.value_counts())
+        stratum: pd.Series = (
+            chunk.subreddit.map(labels).fillna(UNLABELED) if strata else UNLABELED
+        )
+        unit_strata = _tally(
+            unit_strata,
+            chunk.assign(stratum=stratum).groupby([column, "stratum"]).size(),
+        )
+    if authors is None or unit_strata is None:
+        raise ValueError(f"No rows in {path}")
+    eligible: pd.Index = authors.index[authors >= n_freq]
+
+    # Keep each unit's most common stratum.
+    counts: pd.DataFrame = unit_strata.rename("rows").reset_index()
+    if unit == "author":
+        counts = counts[counts.author.isin(eligible)]
+    else:
+        # A thread whose posters n_freq drops all would come back without
+        # rows, so only threads with an eligible poster are sampled. That
+        # takes another scan now that eligibility is known.
+        posted: set[str] = set()
+        for chunk in _chunks(path, chunksize):
+            posted.update(chunk.permalink[chunk.author.isin(eligible)].unique())
+        counts = counts[counts.permalink.isin(posted)]
+    counts = counts.sort_values(
+        [column, "rows", "stratum"], ascending=[True, False, True]
+    ).drop_duplicates(column)
+
+    rng: Generator = np.random.default_rng(seed)
+    quotas: pd.Series = _quotas(counts.stratum.value_counts().sort_index(), size)
+    chosen: list[npt.NDArray[np.object_]] = [
+        rng.choice(
+            np.sort(counts.loc[counts.stratum == name, column].to_numpy()),
+            quota,
+            replace=False,
+        )
+        for name, quota in quotas.items()
+    ]
+    sampled: pd.Index = pd.Index(np.concatenate(chosen) if chosen else [])
+    logging.info(f"Sampled {len(sampled)} {unit}s: {quotas.to_dict()}")
+
+    rows: list[pd.DataFrame] = [
+        chunk[chunk[column].isin(sampled) & chunk.author.isin(eligible)]
+        for chunk in _chunks(path, chunksize)
+    ]
+    return label_subreddits(pd.concat(rows, ignore_index=True))
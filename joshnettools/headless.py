@@ -0,0 +1,210 @@
+# Load, project, calculate metrics, and generate replicates without plotting.
+# Nothing here imports matplotlib, so batch jobs and their worker processes
+# start quickly. main.py draws the figures.
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import argparse
+import logging
+import pickle
+
+from networkx import Graph
+from pathlib import Path
+from typing import Optional
+from collections.abc import Callable
+
+from gamenetloader import DATA_PATH, load
+from gamesampler import UNITS, sample_network
+from projections import project_auth_tops_bauth
+from metrics import DEFAULT_METRICS, METRICS, compute_metrics, save_metrics
+from nullstore import NullStore
+from randomnet import (
+    CURVEBALL_REPLICATES,
+    dispatcher,
+    random_assort,
+    random_clust,
+    random_deg_assort,
+    random_deg_cent,
+    random_density,
+)
+
+# Replicate functions by name.
+REPLICATES: dict[str, Callable[..., float]] = {
+    func.__name__: func
+    for func in (
+        random_clust,
+        random_density,
+        random_deg_cent,
+        random_deg_assort,
+        random_assort,
+        *CURVEBALL_REPLICATES,
+    )
+}
+
+
+def load_gamers(
+    path: Optional[str] = None,
+    sample: Optional[int] = None,
+    unit: str = "author",
+    strata: Optional[str] = None,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """Load the whole data set or a sample of it.
+
+    Parameters
+    ----------
+    path: str, optional
+        Data set. The default is None (see gamenetloader.load).
+    sample: int, optional
+        Sample this many authors or threads instead. See
+        gamesampler.sample_network. The default is None.
+    unit: str, optional
+        Sampling unit. The default is "author".
+    strata: str, optional
+        Attribute to sample proportionally within. The default is None.
+    seed: int, optional
+        Seed of the sample. The default is None.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Gamers network as a DataFrame.
+    """
+    if sample is not None:
+        return sample_network(sample, unit, strata, path or DATA_PATH, seed)
+    return load(path)
+
+
+def _load(args: argparse.Namespace) -> None:
+    gamers: pd.DataFrame = load_gamers(
+        args.data, args.sample, args.unit, args.strata, args.seed
+    )
+    print(
+        f"{len(gamers)} rows, {gamers.author.nunique()} authors, "
+        f"{gamers.permalink.nunique()} threads, "
+        f"{gamers.subreddit.nunique()} subreddits"
+    )
+    if args.out:
+        gamers.to_csv(args.out, index=False)
+
+
+def _project(args: argparse.Namespace) -> None:
+    projection: Graph = project_auth_tops_bauth(
+        load_gamers(args.data, args.sample, args.unit, args.strata, args.seed)
+    )
+    print(f"{projection.number_of_nodes()} nodes, {projection.number_of_edges()} edges")
+    if args.out:
+        with open(args.out, "wb") as out:
+            pickle.dump(projection, out, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _metrics(args: argparse.Namespace) -> None:
+    projection: Graph = project_auth_tops_bauth(
+        load_gamers(args.data, args.sample, args.unit, args.strata, args.seed)
+    )
+    table: pd.DataFrame = compute_metrics(projection, args.metrics)
+    if args.out:
+        save_metrics(table, args.out)
+    print(table.pivot(index="metric", columns="view", values="value"))
+
+
+def _replicates(args: argparse.Namespace) -> None:
+    gamers: pd.DataFrame = load_gamers(
+        args.data, args.sample, args.unit, args.strata, args.seed
+    )
+    func: Callable[..., float] = REPLICATES[args.func]
+    reps: npt.NDArray[np.floating] = dispatcher(
+        gamers,
+        func,
+        replicates=args.replicates,
+        processes=args.processes,
+        assort=args.assort if func is random_assort else None,
+        checkpoint=args.checkpoint,
+        seed=args.seed,
+        store=NullStore(args.store) if args.store else None,
+        observed=args.observed,
+        precision=args.precision,
+        trades=args.trades,
+    )
+    print(
+        f"{args.func}: {len(reps)} replicates, mean {reps.mean():.6g}, "
+        f"std {reps.std():.6g}"
+    )
+    if args.out:
+        np.save(args.out, reps)
+
+
+def parser() -> argparse.ArgumentParser:
+    """Command line of the headless entry point."""
+    cli: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Load, project, and calculate metrics or replicates "
+        "without plotting."
+    )
+    cli.add_argument("--data", default=None, help="data set (default: load's)")
+    cli.add_argument(
+        "--sample", type=int, default=None, help="sample this many authors or threads"
+    )
+    cli.add_argument("--unit", choices=list(UNITS), default="author")
+    cli.add_argument("--strata", default=None, help="attribute to stratify by")
+    cli.add_argument("--seed", type=int, default=None)
+    commands = cli.add_subparsers(dest="command", required=True)
+
+    load_cli: argparse.ArgumentParser = commands.add_parser(
+        "load", help="summarize the data set"
+    )
+    load_cli.add_argument("--out", type=Path, help="write the rows to a CSV file")
+    load_cli.set_defaults(run=_load)
+
+    project_cli: argparse.ArgumentParser = commands.add_parser(
+        "project", help="project threads onto authors"
+    )
+    project_cli.add_argument("--out", type=Path, help="pickle the projection")
+    project_cli.set_defaults(run=_project)
+
+    metrics_cli: argparse.ArgumentParser = commands.add_parser(
+        "metrics", help="calculate metrics of the projection"
+    )
+    metrics_cli.add_argument(
+        "--metrics",
+        nargs="+",
+        default=list(DEFAULT_METRICS),
+        help=f"names from {', '.join(METRICS)}",
+    )
+    metrics_cli.add_argument("--out", type=Path, help=".json or .parquet file")
+    metrics_cli.set_defaults(run=_metrics)
+
+    reps_cli: argparse.ArgumentParser = commands.add_parser(
+        "replicates", help="generate null model replicates"
+    )
+    reps_cli.add_argument("func", choices=list(REPLICATES))
+    reps_cli.add_argument("--replicates", type=int, default=100000)
+    reps_cli.add_argument("--processes", type=int, default=6)
+    reps_cli.add_argument("--assort", default="SysGamGen")
+    reps_cli.add_argument("--checkpoint", type=Path, default=None)
+    reps_cli.add_argument("--store", type=Path, default=None, help="NullStore dir")
+    reps_cli.add_argument(
+        "--precision",
+        type=float,
+        default=None,
+        help="stop once the p-value is this precise (needs --observed)",
+    )
+    reps_cli.add_argument(
+        "--observed", type=float, default=None, help="observed value of the metric"
+    )
+    reps_cli.add_argument(
+        "--trades", type=int, default=None, help="curveball trades per replicate"
+    )
+    reps_cli.add_argument("--out", type=Path, help=".npy file")
+    reps_cli.set_defaults(run=_replicates)
+    return cli
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    cli: argparse.ArgumentParser = parser()
+    args: argparse.Namespace = cli.parse_args()
+    # Adaptive runs compare the replicates to the observed value.
+    if getattr(args, "precision", None) is not None and args.observed is None:
+        cli.error("--precision needs --observed")
+    args.run(args)
@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+from networkx import Graph
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Optional, TypeVar
+from collections.abc import Callable, Iterator
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Trace file the spans are appended to as JSON lines. Tracing is off unless
+# it's set when the modules are imported.
+TRACE_ENV: str = "JOSHNET_TRACE"
+
+# Also trace Python allocations with tracemalloc if set. It's exact but slows
+# allocation heavy code down a lot, so it's opt in.
+TRACE_MALLOC_ENV: str = "JOSHNET_TRACE_MALLOC"
+
+TRACE_PATH: Optional[str] = os.environ.get(TRACE_ENV) or None
+TRACE_MALLOC: bool = TRACE_PATH is not None and bool(os.environ.get(TRACE_MALLOC_ENV))
+
+_lock: threading.Lock = threading.Lock()
+_local: threading.local = threading.local()
+
+
+def sizes(value: Any, prefix: str = "") -> dict[str, int]:
+    """Item counts of a DataFrame, graph, or array.
+
+    Parameters
+    ----------
+    value: Any
+        Value to describe.
+    prefix: str, optional
+        Prepended to every key. The default is "".
+
+    Returns
+    -------
+    dict[str, int]
+        rows for DataFrames and arrays, nodes and edges for graphs, and
+        nothing for anything else.
+    """
+    if isinstance(value, (pd.DataFrame, np.ndarray)):
+        return {f"{prefix}rows": len(value)}
+    if isinstance(value, Graph):
+        return {
+            f"{prefix}nodes": value.number_of_nodes(),
+            f"{prefix}edges": value.number_of_edges(),
+        }
+    return {}
+
+
+def _max_rss() -> int:
+    # Kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _child_cpu() -> float:
+    # Only counts worker processes that have exited.
+    usage: resource.struct_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _write(record: dict[str, Any]) -> None:
+    line: str = json.dumps(record, default=str) + "\n"
+    # Appends this small are atomic, so worker processes can share the file.
+    with _lock, open(TRACE_PATH, "a") as out:  # type: ignore[arg-type]
+        out.write(line)
+
+
+@contextmanager
+def _span(name: str, fields: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """Measure the body and append its record to the trace file.
+
+    Nested spans record their parent. tracemalloc's peak is shared by every
+    thread, so spans running at the same time see each other's allocations.
+    """
+    stack: list[dict[str, Any]] = _local.__dict__.setdefault("stack", [])
+    record: dict[str, Any] = {
+        "name": name,
+        "parent": stack[-1]["name"] if stack else None,
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        "start": time.time(),
+        **fields,
+    }
+    if TRACE_MALLOC:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        # The parent's peak so far is saved before the peak is reset for us.
+        if stack:
+            stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+        tracemalloc.reset_peak()
+        record.update(_base=current, _peak=current)
+    stack.append(record)
+    rss: int = _max_rss()
+    wall: float = time.perf_counter()
+    cpu: float = time.thread_time()
+    child: float = _child_cpu()
+    status: str = "ok"
+    try:
+        yield record
+    except BaseException as err:
+        status = type(err).__name__
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - wall
+        record["cpu_seconds"] = time.thread_time() - cpu
+        record["child_cpu_seconds"] = _child_cpu() - child
+        record["max_rss_bytes"] = _max_rss()
+        record["rss_growth_bytes"] = record["max_rss_bytes"] - rss
+        record["status"] = status
+        rate: Optional[str] = record.pop("_rate", None)
+        if rate in record and record["seconds"] > 0:
+            record[f"{rate}_per_second"] = record[rate] / record["seconds"]
+        stack.pop()
+        if TRACE_MALLOC:
+            peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+            record["malloc_peak_bytes"] = peak - record.pop("_base")
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+        _write(record)
+
+
+def span(name: str, **fields: Any) -> AbstractContextManager[dict[str, Any]]:
+    """Trace a block of code.
+
+    The record is yielded so the block can add counts to it. Nothing is
+    measured if tracing is off.
+
+    Parameters
+    ----------
+    name: str
+        Name of the span in the trace.
+    **fields: Any
+        Extra JSON serializable fields for the record.
+
+    Returns
+    -------
+    AbstractContextManager[dict[str, Any]]
+        Context manager yielding the record (an unused dict if off).
+    """
+    if TRACE_PATH is None:
+        return nullcontext({})
+    return _span(name, fields)
+
+
+def traced(func: Optional[F] = None, *, rate: Optional[str] = None) -> Any:
+    """Trace every call of func.
+
+    Each call records wall time, the calling thread's CPU time and that of
+    worker processes that exited during the call, the growth of the peak
+    RSS, the tracemalloc peak if TRACE_MALLOC_ENV is set, and the sizes of
+    the first argument (in_rows, in_nodes, in_edges) and of the result.
+    func is returned untouched if tracing is off, so tracing costs nothing
+    unless TRACE_ENV is set.
+
+    Parameters
+    ----------
+    func: F, optional
+        Function to trace. Omitted when used as @traced(rate=...).
+    rate: str, optional
+        Name of what the result's rows count, such as "replicates". The
+        record gets that count and a per second rate. The default is None.
+
+    Returns
+    -------
+    F
+        Traced func, or a decorator if func is None.
+    """
+
+    def decorate(func: F) -> F:
+        if TRACE_PATH is None:
+            return func
+        name: str = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            fields: dict[str, Any] = sizes(args[0], "in_") if args else {}
+            with _span(name, fields) as record:
+                result: Any = func(*args, **kwargs)
+                counts: dict[str, int] = sizes(result)
+                if rate is not None and "rows" in counts:
+                    record[rate] = counts.pop("rows")
+                    record["_rate"] = rate
+                record.update(counts)
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate if func is None else decorate(func)
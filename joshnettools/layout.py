@@ -0,0 +1,135 @@
+import networkx as nx
+import logging
+
+from networkx import Graph
+from typing import Any, Optional
+
+from csrgraph import CSRGraph, cached_values, graph_cache, to_csr
+from forcelayout import LAYOUT_SEED, force_layout
+
+# GraphViz programs pydot_layout can run.
+GRAPHVIZ_PROGS: tuple[str, ...] = ("dot", "neato", "twopi", "fdp", "sfdp", "circo")
+
+# In process multilevel layout on the CSR arrays. See forcelayout.py.
+FORCE: str = "force"
+
+Positions = dict[Any, tuple[float, float]]
+
+
+def _layout_name(algo: str) -> str:
+    return f"layout_{algo}"
+
+
+def compute_layout(
+    G: Graph, algo: str = "sfdp", seed: Optional[int] = LAYOUT_SEED
+) -> Positions:
+    """Lay G out from scratch without any caching.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph to lay out.
+    algo: str, optional
+        One of GRAPHVIZ_PROGS or FORCE. FORCE lays G out in process, which
+        suits graphs too large for GraphViz's DOT round trip. The default is
+        "sfdp".
+    seed: int, optional
+        Seed of the FORCE layout. The default is LAYOUT_SEED.
+
+    Returns
+    -------
+    Positions
+        Node to (x, y).
+    """
+    if algo != FORCE and algo not in GRAPHVIZ_PROGS:
+        raise ValueError(f"Unknown layout algorithm: {algo}")
+    logging.info(f"Laying out {len(G)} nodes with {algo}")
+    if algo == FORCE:
+        csr: CSRGraph = to_csr(G)
+        return dict(
+            zip(csr.nodes.tolist(), map(tuple, force_layout(csr, seed).tolist()))
+        )
+    # GraphViz is much faster than the NetworkX implementations.
+    return nx.nx_pydot.pydot_layout(G, prog=algo)
+
+
+def parent_layout(G: Graph, algo: str = "sfdp") -> Optional[Positions]:
+    """Smallest cached layout covering every node of G.
+
+    Subgraph views, copies, k-cores, and ego graphs share the cache of the
+    graph they came from, so their parent's layout is found here.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph to find a layout for.
+    algo: str, optional
+        Algorithm of the layout. The default is "sfdp".
+
+    Returns
+    -------
+    Optional[Positions]
+        Cached positions of a supergraph of G or None.
+    """
+    covering: list[Positions] = [
+        pos
+        for pos in cached_values(G, _layout_name(algo))
+        if len(pos) >= len(G) and all(node in pos for node in G)
+    ]
+    return min(covering, key=len) if covering else None
+
+
+def graph_layout(G: Graph, algo: str = "sfdp", reuse: bool = True) -> Positions:
+    """Positions of G's nodes, laying it out at most once. Cached on G.
+
+    A subgraph of a graph that's already been laid out keeps its nodes'
+    positions from the parent, so drawing a graph, its largest component,
+    its k-cores, and ego graphs needs a single layout. The nodes also stay
+    put between the figures.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph to lay out.
+    algo: str, optional
+        Layout algorithm. See compute_layout. The default is "sfdp".
+    reuse: bool, optional
+        Take the positions of a cached parent layout if there is one.
+        The default is True.
+
+    Returns
+    -------
+    Positions
+        Node to (x, y).
+    """
+
+    def compute() -> Positions:
+        parent: Optional[Positions] = parent_layout(G, algo) if reuse else None
+        if parent is not None:
+            logging.info(f"Reusing a {len(parent)} node {algo} layout")
+            return {node: parent[node] for node in G}
+        return compute_layout(G, algo)
+
+    return graph_cache(G, _layout_name(algo), compute)
+
+
+def laid_out(G: Graph, algo: str = "sfdp") -> Graph:
+    """Lay G out and return it with the layout cached.
+
+    The cache travels with G when it's pickled, so a pipeline stage running
+    this once spares every isolated drawing stage its own layout.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Graph to lay out.
+    algo: str, optional
+        Layout algorithm. The default is "sfdp".
+
+    Returns
+    -------
+    networkx.Graph
+        G itself.
+    """
+    graph_layout(G, algo)
+    return G
@@ -1,16 +1,25 @@
+from __future__ import annotations
+
 import networkx as nx
 import pandas as pd
 import numpy as np
 import numpy.typing as npt
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
-from network.classes.graph import Graph
+import os
+from pathlib import Path
+from networkx import Graph
 from logging import info
-from typing import Optional
+from typing import Any, Optional, TYPE_CHECKING
+from collections.abc import Callable
+
+# Plotting modules load matplotlib lazily, so main only needs its types.
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
 
 # from matplotlib.patches import Patch
 
-from gamenetloader import load, shrink_network_by
+from gamenetloader import DATA_PATH, load
+from gamesampler import sample_network
 from projections import project_auth_tops_bauth
 from gamersdraw import (
     draw_degree_centrality,
@@ -25,8 +34,20 @@ from randomnet import (
     random_density,
     random_deg_assort,
     random_assort,
+    permutation_assort,
+    replicate_p_value,
 )
 from pvalueplots import p_value_plots
+from clustering import average_clustering
+from centrality import Centrality, graph_centrality, top_k
+from assortativity import attribute_assortativity, degree_assortativity
+from csrgraph import to_csr
+from components import Components, graph_components, largest_component
+from metrics import DEFAULT_METRICS, compute_metrics, save_metrics
+from nullstore import NullStore
+from replicatepool import ReplicatePool
+from pipeline import Pipeline, Stage
+from layout import laid_out
 
 # Maybe put these in a notebook?
 # gamers_df.groupby("author").subreddit.nunique().sort_values(ascending=False)
@@ -55,6 +76,35 @@ def deg_cent_metrics(
     return dc
 
 
+def bridge_authors(
+    projection: Graph, samples: int = 1000, k: int = 20, seed: int = 0
+) -> pd.DataFrame:
+    """Authors with the highest sampled betweenness centrality.
+
+    High betweenness authors sit on the shortest paths between otherwise
+    separate parts of the network, such as different console communities.
+
+    Parameters
+    ----------
+    projection: networkx.Graph
+        Projected gamers network.
+    samples: int, optional
+        Source nodes to search from. The default is 1000.
+    k: int, optional
+        Authors to return. The default is 20.
+    seed: int, optional
+        Seed of the source sample. The default is 0.
+
+    Returns
+    -------
+    pandas.DataFrame
+        See centrality.top_k.
+    """
+    betweenness: Centrality
+    betweenness, _ = graph_centrality(projection, samples, seed)
+    return top_k(betweenness, k)
+
+
 def sorted_components(projection: Graph) -> list[set[int]]:
     """Return the largest connected components in descending order.
 
@@ -68,7 +118,15 @@ def sorted_components(projection: Graph) -> list[set[int]]:
     list[set[int]]
         Sorted list of connected components.
     """
-    return sorted(nx.connected_components(projection), key=len, reverse=True)
+    # Union find labels are already numbered from largest to smallest.
+    found: Components = graph_components(projection)
+    # np.split would hand back one empty component for an empty graph.
+    if not len(found.sizes):
+        return []
+    nodes: npt.NDArray[Any] = to_csr(projection).nodes
+    order: npt.NDArray[np.intp] = np.argsort(found.labels, kind="stable")
+    bounds: npt.NDArray[np.int64] = np.cumsum(found.sizes)[:-1]
+    return [set(part.tolist()) for part in np.split(nodes[order], bounds)]
 
 
 def largest_connected_component(projection: Graph) -> Graph:
@@ -82,9 +140,10 @@ def largest_connected_component(projection: Graph) -> Graph:
     Returns
     -------
     networkx.Graph
-        Largest connected component.
+        Largest connected component. Its compact CSR arrays are cached on it
+        for the array kernels.
     """
-    lcc: Graph = nx.subgraph(projection, sorted_components(projection)[0])
+    lcc: Graph = largest_component(projection)
     # Note to self: subgraph isn't a copy so this breaks.
     # lcc.name = "LCC of {}".format(projection.name)
     return lcc
@@ -94,6 +153,9 @@ def test_small(N: int) -> tuple[pd.DataFrame, pd.DataFrame, Graph]:
     """
     Return an N sized DataFrame and projection for testing my code.
 
+    See sample_small for a sample of whole authors or threads that doesn't
+    load the full data set.
+
     Parameters
     ----------
     N: int
@@ -111,34 +173,75 @@ def test_small(N: int) -> tuple[pd.DataFrame, pd.DataFrame, Graph]:
     return (gamers_full, gamers_small, project_auth_tops_bauth(gamers_small))
 
 
-# Lots of duplicated code. Oops. I realized I like how I did it for 790.
-def draw_and_save(
-    projection: Graph,
-    gamers_df: pd.DataFrame,
-    path: str = "../../assets/",
-    k_range: range = range(50, 90, 10),
-) -> None:
-    """Create and save plots used in final paper."""
+def sample_small(
+    N: int, unit: str = "author", strata: Optional[str] = None
+) -> tuple[pd.DataFrame, Graph]:
+    """
+    Return a sample of N authors or threads and its projection for testing.
+
+    Parameters
+    ----------
+    N: int
+        Authors or threads to sample.
+    unit: str, optional
+        "author" or "thread". The default is "author".
+    strata: str, optional
+        Attribute such as "Systems" to sample proportionally within.
+        The default is None.
+
+    Returns
+    -------
+    tuple[pandas.DataFrame, networkx.Graph]
+        DataFrame of the sampled units' rows and its projection.
+    """
+    # Sampling whole authors or threads keeps their co-posting structure and
+    # streams the data set instead of loading all of it.
+    gamers_small: pd.DataFrame = sample_network(N, unit, strata)
+    return (gamers_small, project_auth_tops_bauth(gamers_small))
+
+
+# Node colors of the SysGamGen attribute for figure legends.
+COL_LABELS: list[tuple[str, str]] = [
+    ("#ff79c6", "Systems/consoles"),
+    ("#50fa7b", "Games or game series"),
+    ("#8be9fd", "Miscellaneous"),
+]
+
+# Master seed of the pipeline's null replicates. It's one of the replicates
+# stage's parameters, so cached replicates are reproducible and a new seed
+# runs the stage again.
+REPLICATE_SEED: int = 2020
+
+# Titles of the metrics with null distributions in the order they're drawn.
+NULL_TITLES: list[str] = [
+    "Average clustering",
+    "Density",
+    "Degree assortativity",
+    "Assortativity on Systems, Games, & General",
+]
+
+
+def draw_degcent_figure(projection: Graph, path: str = "../../assets/") -> None:
+    """Draw and save the network sized by degree centrality."""
     print("Drawing graph augmented with degree centrality.")
     fig: Figure
     ax: Axes
     fig, ax, _ = draw_degree_centrality(projection, alpha=0.6)
 
     # Add legend and title
-    col_labels: list[tuple[str, str]] = [
-        ("#ff79c6", "Systems/consoles"),
-        ("#50fa7b", "Games or game series"),
-        ("#8be9fd", "Miscellaneous"),
-    ]
-    add_network_leg(fig, ax, suptitle="Size = degree centrality", col_labels=col_labels)
+    add_network_leg(fig, ax, suptitle="Size = degree centrality", col_labels=COL_LABELS)
 
     # Save the rendered network.
     fig.savefig(path + "network_degcent.png", bbox_inches="tight")
 
-    # K-core decomposition
+
+def draw_diarad_figure(projection: Graph, path: str = "../../assets/") -> None:
+    """Draw and save the diameter and radius of the LCC."""
     print("Calculating largest connected component.")
     lcc: Graph = largest_connected_component(projection)
     print("Drawing diameter and radius.")
+    fig: Figure
+    ax: Axes
     fig, ax = draw_diameter_radius(lcc, barycenter=False)
     add_network_leg(
         fig,
@@ -152,6 +255,17 @@ def draw_and_save(
     )
     fig.savefig(path + "network_diarad.png", bbox_inches="tight")
 
+
+def k_core_figure_name(k_range: range) -> str:
+    return "network_k_core_{}_{}.png".format(min(k_range), max(k_range))
+
+
+def draw_k_core_figure(
+    projection: Graph,
+    path: str = "../../assets/",
+    k_range: range = range(50, 90, 10),
+) -> None:
+    """Draw and save the k-core decomposition through k_range."""
     print("Drawing k core for k {} -> {}".format(min(k_range), max(k_range)))
     # I'm overriding the color here because it ends up too overbearing
     # for k = 70, 80
@@ -164,158 +278,304 @@ def draw_and_save(
 
     for k_ax, k in zip(ax.flat, k_range):
         add_network_leg(fig, k_ax, "k = {}".format(k), col_labels=None, legend=False)
-    fig.savefig(
-        path + "network_k_core_{}_{}.png".format(min(k_range), max(k_range)),
-        bbox_inches="tight",
-    )
+    fig.savefig(path + k_core_figure_name(k_range), bbox_inches="tight")
+
+
+def null_replicates(
+    projection: Graph,
+    gamers_df: pd.DataFrame,
+    checkpoint_dir: Optional[str] = None,
+    seed: Optional[int] = None,
+    store_dir: Optional[str] = None,
+    precision: Optional[float] = None,
+    permute_labels: bool = False,
+    clust_error: Optional[float] = None,
+) -> tuple[list[float], list[npt.NDArray[np.floating]]]:
+    """Observed metrics and their null distribution replicates.
 
+    See draw_and_save for the parameters.
+
+    Returns
+    -------
+    tuple[list[float], list[numpy.typing.NDArray[numpy.floating]]]
+        Observed values and replicates in the order of NULL_TITLES.
+    """
     print("Calculating average clustering replicates.")
     N_reps: int = 10000
     processes: int = 7
-
-    clust_obs: np.floating = nx.average_clustering(projection, weight="weight")
-    clust_reps: npt.NDArray[np.floating] = dispatcher(
-        gamers_df, random_clust, replicates=N_reps, processes=processes
+    store: Optional[NullStore] = NullStore(store_dir) if store_dir else None
+    # Each metric gets its own checkpoint named after the replicate function.
+    checkpoint: Callable[[str], Optional[str]] = lambda name: (
+        os.path.join(checkpoint_dir, name) if checkpoint_dir else None
     )
 
-    print("Calculating network density replicates.")
-    dens_obs: np.floating = nx.density(projection)
-    dens_reps: npt.NDArray[np.floating] = dispatcher(
-        gamers_df, random_density, replicates=N_reps, processes=processes
-    )
+    # One pool of warm worker processes serves all four metrics.
+    with ReplicatePool(processes) as pool:
+        clust_obs: float = average_clustering(projection, weight="weight")
+        clust_reps: npt.NDArray[np.floating] = dispatcher(
+            gamers_df,
+            random_clust,
+            replicates=N_reps,
+            pool=pool,
+            seed=seed,
+            store=store,
+            checkpoint=checkpoint("random_clust"),
+            observed=clust_obs,
+            precision=precision,
+            clust_error=clust_error,
+        )
 
-    print("Calculating random degree assortativity replicates.")
-    deg_obs: np.floating = nx.degree_pearson_correlation_coefficient(
-        projection, weight="weight"
-    )
-    deg_reps: npt.NDArray[np.floating] = dispatcher(
-        gamers_df, random_deg_assort, replicates=N_reps, processes=processes
-    )
+        print("Calculating network density replicates.")
+        dens_obs: np.floating = nx.density(projection)
+        dens_reps: npt.NDArray[np.floating] = dispatcher(
+            gamers_df,
+            random_density,
+            replicates=N_reps,
+            pool=pool,
+            seed=seed,
+            store=store,
+            checkpoint=checkpoint("random_density"),
+            observed=dens_obs,
+            precision=precision,
+        )
 
-    print("Calculating random assortativity replicates.")
-    assort_obs: np.floating = nx.attribute_assortativity_coefficient(
-        projection, "SysGamGen"
-    )
-    assort_reps: npt.NDArray[np.floating] = dispatcher(
-        gamers_df,
-        random_assort,
-        replicates=N_reps,
-        processes=processes,
-        assort="SysGamGen",
-    )
+        print("Calculating random degree assortativity replicates.")
+        deg_obs: float = degree_assortativity(to_csr(projection))
+        deg_reps: npt.NDArray[np.floating] = dispatcher(
+            gamers_df,
+            random_deg_assort,
+            replicates=N_reps,
+            pool=pool,
+            seed=seed,
+            store=store,
+            checkpoint=checkpoint("random_deg_assort"),
+            observed=deg_obs,
+            precision=precision,
+        )
 
-    print("Drawing p-values plots (without p-values though)")
-    fig, ax = p_value_plots(
+        print("Calculating random assortativity replicates.")
+        assort_obs: float = attribute_assortativity(projection, ["SysGamGen"])[
+            "SysGamGen"
+        ]
+        assort_reps: npt.NDArray[np.floating]
+        if permute_labels:
+            assort_reps = permutation_assort(
+                projection, "SysGamGen", replicates=N_reps, seed=seed
+            )
+        else:
+            assort_reps = dispatcher(
+                gamers_df,
+                random_assort,
+                replicates=N_reps,
+                pool=pool,
+                assort="SysGamGen",
+                seed=seed,
+                store=store,
+                checkpoint=checkpoint("random_assort"),
+                observed=assort_obs,
+                precision=precision,
+            )
+
+    return (
         [clust_obs, dens_obs, deg_obs, assort_obs],
         [clust_reps, dens_reps, deg_reps, assort_reps],
-        [
-            "Average clustering",
-            "Density",
-            "Degree assortativity",
-            "Assortativity on Systems, Games, & General",
-        ],
-        False,
-        False,
     )
+
+
+def draw_p_value_figures(
+    replicates: tuple[list[float], list[npt.NDArray[np.floating]]],
+    path: str = "../../assets/",
+    clust_error: Optional[float] = None,
+) -> None:
+    """Draw and save the null distributions of null_replicates.
+
+    The p-values are printed with their intervals, which are widened by
+    clust_error for sampled clustering replicates.
+    """
+    observed: list[float]
+    reps: list[npt.NDArray[np.floating]]
+    observed, reps = replicates
+    # Only the clustering replicates (the first) are approximate.
+    errors: list[float] = [clust_error or 0.0] + [0.0] * (len(observed) - 1)
+    for title, obs, rep, error in zip(NULL_TITLES, observed, reps, errors):
+        p_value, low, high = replicate_p_value(rep, obs, error=error)
+        print(f"{title}: p = {p_value:.4g} ({low:.4g}, {high:.4g})")
+    print("Drawing p-values plots (without p-values though)")
+    fig, ax = p_value_plots(observed, reps, NULL_TITLES, False, False)
     # Suptitle breaks for some reason if bbox_inches isn't set to tight.
     # Also, I have no idea why it works above.
     fig.savefig(path + "metrics_dist.png", bbox_inches="tight")
 
-    fig, ax = p_value_plots(
-        [clust_obs, dens_obs, deg_obs, assort_obs],
-        [clust_reps, dens_reps, deg_reps, assort_reps],
-        [
-            "Average clustering",
-            "Density",
-            "Degree assortativity",
-            "Assortativity on Systems, Games, & General",
-        ],
-        plot_p=False,
-    )
+    fig, ax = p_value_plots(observed, reps, NULL_TITLES, plot_p=False)
     fig.savefig(path + "metrics_dist_w_obs.png", bbox_inches="tight")
 
+
+def draw_ego_figure(projection: Graph, path: str = "../../assets/") -> None:
+    """Draw and save the ego graph of the highest degree centrality author."""
     print("Drawing ego graph.")
     dc: list[tuple[int, float]] = sorted(
         nx.degree_centrality(projection).items(), key=lambda n: n[1], reverse=True
     )
     fig, ax, _ = draw_degree_centrality(nx.ego_graph(projection, dc[0][0]), alpha=0.6)
     add_network_leg(
-        fig, ax, suptitle="Ego graph of highest degree cent", col_labels=col_labels
+        fig, ax, suptitle="Ego graph of highest degree cent", col_labels=COL_LABELS
     )
     fig.savefig(path + "ego_graph_dc.png", bbox_inches="tight")
 
 
-def print_useful_metrics(
-    projection: nx.Graph, attributes: Optional[list[str]] = None
+# Lots of duplicated code. Oops. I realized I like how I did it for 790.
+def draw_and_save(
+    projection: Graph,
+    gamers_df: pd.DataFrame,
+    path: str = "../../assets/",
+    k_range: range = range(50, 90, 10),
+    checkpoint_dir: Optional[str] = None,
+    seed: Optional[int] = None,
+    store_dir: Optional[str] = None,
+    precision: Optional[float] = None,
+    permute_labels: bool = False,
+    clust_error: Optional[float] = None,
 ) -> None:
-    """Print metrics for projection and LCC, such as radius and diameter."""
-    # Using a mutable list is bad default practice, I think.
-    if not attributes:
-        attributes = ["SysGamGen", "Systems"]
+    """Create and save plots used in final paper.
+
+    Replicates are checkpointed to checkpoint_dir if it's set so that a
+    crashed run may be resumed by calling this function again. Passing a seed
+    makes the replicates reproducible. Replicates are reused from and saved to
+    the null distribution store at store_dir if it's set. Setting precision
+    stops each metric's replicates early once its p-value is that precise.
+    The assortativity null model permutes the observed labels rather than
+    generating random graphs if permute_labels is set. Clustering replicates
+    are estimated from samples of nodes to within clust_error if it's set.
+    """
+    draw_degcent_figure(projection, path)
+    draw_diarad_figure(projection, path)
+    draw_k_core_figure(projection, path, k_range)
+    replicates: tuple[list[float], list[npt.NDArray[np.floating]]] = null_replicates(
+        projection,
+        gamers_df,
+        checkpoint_dir,
+        seed,
+        store_dir,
+        precision,
+        permute_labels,
+        clust_error,
+    )
+    draw_p_value_figures(replicates, path, clust_error)
+    draw_ego_figure(projection, path)
 
-    lcc: nx.Graph = largest_connected_component(projection)
-    # Avoid recalculating eccentricity
-    lcc_ecc: dict[int, int] = nx.eccentricity(lcc)
 
-    # Standard graph info.
-    print("Full:\n{}".format(nx.info(projection)))
-    print("LCC:\n{}".format(nx.info(lcc)))
+def print_useful_metrics(
+    projection: nx.Graph,
+    attributes: Optional[list[str]] = None,
+    output: Optional[str] = None,
+) -> pd.DataFrame:
+    """Print metrics for projection and LCC, such as radius and diameter.
 
-    # Radius and diameter are only valid for connected graphs
-    print("Radius: {}".format(nx.radius(lcc, lcc_ecc)))
-    print("Diameter: {}".format(nx.diameter(lcc, lcc_ecc)))
+    Parameters
+    ----------
+    projection: networkx.Graph
+        Projected gamers network.
+    attributes: list[str], optional
+        Attributes to calculate assortativity for. The default is None
+        (SysGamGen and Systems).
+    output: str, optional
+        Save the metrics to this .json or .parquet file instead of printing
+        them. The default is None.
 
-    # Number of communities
-    print(
-        "Number of communities: {}".format(
-            len(list(nx.community.asyn_lpa_communities(projection, "weight", 314)))
-        )
-    )
-    print(
-        "LCC number of communities: {}".format(
-            len(list(nx.community.asyn_lpa_communities(lcc, "weight", 314)))
-        )
-    )
+    Returns
+    -------
+    pandas.DataFrame
+        Metrics table. See metrics.compute_metrics.
+    """
+    # Using a mutable list is bad default practice, I think.
+    if not attributes:
+        attributes = ["SysGamGen", "Systems"]
 
-    # Clustering
-    print("Avg. clust: {}".format(nx.average_clustering(projection, weight="weight")))
-    print("LCC avg. clust: {}".format(nx.average_clustering(lcc, weight="weight")))
+    metrics: list[str] = [
+        metric for metric in DEFAULT_METRICS if not metric.startswith("assortativity:")
+    ] + ["assortativity:{}".format(attr) for attr in attributes]
+    table: pd.DataFrame = compute_metrics(projection, metrics)
 
-    # Density
-    print("Density: {}".format(nx.density(projection)))
-    print("LCC density: {}".format(nx.density(lcc)))
+    if output:
+        save_metrics(table, output)
+    else:
+        print(table.pivot(index="metric", columns="view", values="value").loc[metrics])
+    return table
 
-    # Degree assortativity
-    print(
-        "Degree assortativity: {}".format(
-            nx.degree_assortativity_coefficient(projection, weight="weight")
-        )
-    )
-    print(
-        "LCC degree assortativity: {}".format(
-            nx.degree_assortativity_coefficient(lcc, weight="weight")
-        )
-    )
 
-    # Attribute assortativity
-    for attr in attributes:
-        print(
-            "{} assortativity: {}".format(
-                attr, nx.attribute_assortativity_coefficient(projection, attr)
-            )
-        )
-        print(
-            "LCC {} assortativity: {}".format(
-                attr, nx.attribute_assortativity_coefficient(lcc, attr)
-            )
-        )
+def pipeline_stages(
+    path: str = "../../assets/",
+    k_range: range = range(50, 90, 10),
+    seed: int = REPLICATE_SEED,
+) -> list[Stage]:
+    """Stages that produce the metrics and figures of the final paper.
+
+    load already shrinks the network, so there's no separate shrinking stage.
+    Every figure is its own isolated stage since pyplot isn't thread safe.
+    They all draw the projection carrying its cached layout, so sfdp only
+    runs once. The null replicates are calculated from seed.
+    """
+    assets: Path = Path(path)
+    return [
+        Stage("gamers", load, files=(DATA_PATH,)),
+        Stage("projection", project_auth_tops_bauth, ("gamers",)),
+        # Laid out once here; the figures of the projection and its subgraphs
+        # reuse the cached positions.
+        Stage("laid_out", laid_out, ("projection",)),
+        Stage(
+            "metrics",
+            print_useful_metrics,
+            ("projection",),
+            {"output": str(assets / "metrics.json")},
+            outputs=(assets / "metrics.json",),
+        ),
+        Stage(
+            "degcent_figure",
+            draw_degcent_figure,
+            ("laid_out",),
+            {"path": path},
+            outputs=(assets / "network_degcent.png",),
+            isolated=True,
+        ),
+        Stage(
+            "diarad_figure",
+            draw_diarad_figure,
+            ("laid_out",),
+            {"path": path},
+            outputs=(assets / "network_diarad.png",),
+            isolated=True,
+        ),
+        Stage(
+            "k_core_figure",
+            draw_k_core_figure,
+            ("laid_out",),
+            {"path": path, "k_range": k_range},
+            outputs=(assets / k_core_figure_name(k_range),),
+            isolated=True,
+        ),
+        Stage("replicates", null_replicates, ("projection", "gamers"), {"seed": seed}),
+        Stage(
+            "p_value_figures",
+            draw_p_value_figures,
+            ("replicates",),
+            {"path": path},
+            outputs=(assets / "metrics_dist.png", assets / "metrics_dist_w_obs.png"),
+            isolated=True,
+        ),
+        Stage(
+            "ego_figure",
+            draw_ego_figure,
+            ("laid_out",),
+            {"path": path},
+            outputs=(assets / "ego_graph_dc.png",),
+            isolated=True,
+        ),
+    ]
 
 
 if __name__ == "__main__":
     info("Running code to produce metrics and plots.")
-    gamers_df: pd.DataFrame = load()
-    gamers_df = shrink_network_by(gamers_df)
-    projection: Graph = project_auth_tops_bauth(gamers_df)
-
-    print_useful_metrics(projection)
-    draw_and_save(projection, gamers_df)
+    # Only stages whose code, parameters, or inputs changed run again.
+    results: dict[str, Any] = Pipeline(pipeline_stages(), ".pipeline_cache").run()
+    table: pd.DataFrame = results["metrics"]
+    print(table.pivot(index="metric", columns="view", values="value"))
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import networkx as nx
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import logging
+import threading
+import time
+
+from networkx import Graph
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Optional, TypeVar
+from collections.abc import Callable, Sequence
+
+from assortativity import attribute_assortativity, degree_assortativity
+from clustering import weighted_clustering
+from csrgraph import CSRGraph, to_csr
+from communities import COMMUNITY_SEED, by_size, graph_communities
+from components import Components, graph_components, largest_component
+from cores import graph_core_numbers
+from distances import Extrema, extrema
+from instrument import span, traced
+
+T = TypeVar("T")
+
+# Metrics print_useful_metrics calculates for each view. Attribute metrics
+# are written as "assortativity:<attribute>".
+DEFAULT_METRICS: tuple[str, ...] = (
+    "nodes",
+    "edges",
+    "average_degree",
+    "components",
+    "radius",
+    "diameter",
+    "communities",
+    "average_clustering",
+    "density",
+    "degree_assortativity",
+    "assortativity:SysGamGen",
+    "assortativity:Systems",
+)
+
+DEFAULT_VIEWS: tuple[str, ...] = ("full", "lcc")
+
+
+class GraphView:
+    """A graph plus intermediates shared by the metrics calculated on it.
+
+    Intermediates are calculated once on first use, even when several
+    metrics ask for them from different threads at the same time.
+
+    Parameters
+    ----------
+    name: str
+        Name of the view, e.g. "full" or "lcc".
+    G: networkx.Graph
+        Graph of the view.
+    parent: GraphView, optional
+        View G was taken from. Some intermediates are derived from the
+        parent's instead of being calculated again. The default is None.
+    attributes: Sequence[str], optional
+        Node attributes the assortativity metrics may ask for. They're all
+        calculated together. The default is ().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        G: Graph,
+        parent: Optional[GraphView] = None,
+        attributes: Sequence[str] = (),
+    ) -> None:
+        self.name: str = name
+        self.G: Graph = G
+        self.parent: Optional[GraphView] = parent
+        self.attributes: tuple[str, ...] = tuple(attributes)
+        self._values: dict[str, Any] = {}
+        self._locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._guard: threading.Lock = threading.Lock()
+
+    def get(self, key: str, compute: Callable[[], T]) -> T:
+        """Return intermediate key, calculating it with compute if needed."""
+        with self._guard:
+            lock: threading.Lock = self._locks[key]
+        with lock:
+            if key not in self._values:
+                start: float = time.perf_counter()
+                self._values[key] = compute()
+                logging.info(
+                    f"{self.name}: {key} took {time.perf_counter() - start:.2f}s"
+                )
+        return self._values[key]
+
+    @property
+    def csr(self) -> CSRGraph:
+        return self.get("csr", lambda: to_csr(self.G))
+
+    def components(self) -> Components:
+        """Connected components, largest first."""
+        return self.get("components", lambda: graph_components(self.G))
+
+    def connected(self) -> bool:
+        return len(self.G) > 0 and len(self.components().sizes) == 1
+
+    def extrema(self) -> Extrema:
+        """Diameter, radius, center, and periphery. Needs a connected view."""
+        return self.get("extrema", lambda: extrema(self.G))
+
+    def communities(self, method: str = "label_propagation") -> npt.NDArray[np.int64]:
+        """Community of each node in CSR order. See graph_communities.
+
+        Communities never span components, so a view of part of its parent
+        reuses the parent's communities within its nodes.
+        """
+
+        def compute() -> npt.NDArray[np.int64]:
+            if self.parent is not None:
+                parent: npt.NDArray[np.int64] = self.parent.communities(method)
+                positions: npt.NDArray[np.intp] = pd.Index(
+                    self.parent.csr.nodes
+                ).get_indexer(self.csr.nodes)
+                return by_size(parent[positions])
+            self.csr
+            return graph_communities(self.G, method, COMMUNITY_SEED)
+
+        return self.get(f"communities_{method}", compute)
+
+    def assortativity(self) -> dict[str, float]:
+        """Attribute assortativity of every attribute in one pass."""
+
+        def compute() -> dict[str, float]:
+            # Warm the shared CSR arrays that attribute_assortativity reads.
+            self.csr
+            return attribute_assortativity(self.G, self.attributes)
+
+        return self.get("assortativity", compute)
+
+
+def make_views(
+    G: Graph, names: Sequence[str] = DEFAULT_VIEWS, attributes: Sequence[str] = ()
+) -> list[GraphView]:
+    """Build the named views of G.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Full graph.
+    names: Sequence[str], optional
+        "full" and/or "lcc" (largest connected component).
+        The default is DEFAULT_VIEWS.
+    attributes: Sequence[str], optional
+        Node attributes for the assortativity metrics. The default is ().
+
+    Returns
+    -------
+    list[GraphView]
+        Views in the order of names.
+    """
+    full: GraphView = GraphView("full", G, attributes=attributes)
+    views: dict[str, Callable[[], GraphView]] = {
+        "full": lambda: full,
+        "lcc": lambda: GraphView("lcc", largest_component(G), full, attributes),
+    }
+    unknown: set[str] = set(names) - set(views)
+    if unknown:
+        raise ValueError(f"Unknown views: {unknown}")
+    return [views[name]() for name in names]
+
+
+def _radius(view: GraphView, _: Optional[str]) -> float:
+    # Only defined for connected graphs.
+    if not view.connected():
+        return np.nan
+    return view.extrema().radius
+
+
+def _diameter(view: GraphView, _: Optional[str]) -> float:
+    if not view.connected():
+        return np.nan
+    return view.extrema().diameter
+
+
+# Metric name to function of (view, argument). The argument is the part after
+# the colon in names like "assortativity:SysGamGen".
+METRICS: dict[str, Callable[[GraphView, Optional[str]], float]] = {
+    "nodes": lambda view, _: view.G.number_of_nodes(),
+    "edges": lambda view, _: view.G.number_of_edges(),
+    "average_degree": lambda view, _: 2 * view.csr.m / view.csr.n,
+    "components": lambda view, _: len(view.components().sizes),
+    "radius": _radius,
+    "diameter": _diameter,
+    "communities": lambda view, _: view.communities().max() + 1,
+    "louvain_communities": lambda view, _: view.communities("louvain").max() + 1,
+    "average_clustering": lambda view, _: weighted_clustering(view.csr).mean(),
+    "density": lambda view, _: nx.density(view.G),
+    "degeneracy": lambda view, _: graph_core_numbers(view.G).max(initial=0),
+    "degree_assortativity": lambda view, _: degree_assortativity(view.csr),
+    "assortativity": lambda view, attr: view.assortativity()[attr],
+}
+
+
+@traced
+def compute_metrics(
+    G: Graph,
+    metrics: Sequence[str] = DEFAULT_METRICS,
+    views: Sequence[str] = DEFAULT_VIEWS,
+    threads: int = 4,
+) -> pd.DataFrame:
+    """Calculate metrics for views of G.
+
+    Intermediates such as components, distance extrema, communities, and CSR
+    arrays are calculated once per view and shared by the metrics that need
+    them. Metrics run in parallel on a thread pool; the numpy kernels release
+    the GIL while NetworkX based metrics mostly take turns.
+
+    Parameters
+    ----------
+    G: networkx.Graph
+        Full graph.
+    metrics: Sequence[str], optional
+        Names from METRICS. Attribute metrics are written as
+        "assortativity:<attribute>". The default is DEFAULT_METRICS.
+    views: Sequence[str], optional
+        Views of G to calculate the metrics for. See make_views.
+        The default is DEFAULT_VIEWS.
+    threads: int, optional
+        Metrics calculated at once. The default is 4.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per view and metric with columns view, metric, value, and
+        seconds. Metrics undefined for a view, such as the radius of a
+        disconnected graph, are NaN.
+    """
+    parsed: list[tuple[str, str, Optional[str]]] = []
+    for metric in metrics:
+        name, _, arg = metric.partition(":")
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        parsed.append((metric, name, arg or None))
+    attributes: list[str] = [
+        arg for _, name, arg in parsed if name == "assortativity" and arg
+    ]
+
+    def run(view: GraphView, name: str, arg: Optional[str]) -> tuple[float, float]:
+        start: float = time.perf_counter()
+        with span(f"metric.{name}", view=view.name, arg=arg):
+            value: float = float(METRICS[name](view, arg))
+        return value, time.perf_counter() - start
+
+    rows: list[dict[str, Any]] = []
+    with ThreadPoolExecutor(threads, "metrics") as executor:
+        futures: list[tuple[str, str, Future[tuple[float, float]]]] = []
+        for view in make_views(G, views, attributes):
+            for metric, name, arg in parsed:
+                futures.append(
+                    (view.name, metric, executor.submit(run, view, name, arg))
+                )
+        for view_name, metric, future in futures:
+            value, seconds = future.result()
+            rows.append(
+                {
+                    "view": view_name,
+                    "metric": metric,
+                    "value": value,
+                    "seconds": seconds,
+                }
+            )
+    return pd.DataFrame(rows, columns=["view", "metric", "value", "seconds"])
+
+
+def save_metrics(table: pd.DataFrame, path: str | Path) -> None:
+    """Save a compute_metrics table as JSON or Parquet based on the suffix.
+
+    Parameters
+    ----------
+    table: pandas.DataFrame
+        Result of compute_metrics.
+    path: str | Path
+        Output file ending in .json or .parquet.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".json":
+        table.to_json(path, orient="records", indent=2)
+    elif path.suffix == ".parquet":
+        table.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unsupported metrics format: {path.suffix}")
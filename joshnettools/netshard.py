@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import os
+import queue
+import threading
+import traceback
+
+from numpy.random import Generator
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Optional
+from collections.abc import Callable, Iterator, Mapping
+
+from replicatepool import ReplicateJob, replicate_rng
+
+# Environment variable holding the shared secret when none is passed in.
+AUTHKEY_ENV: str = "JOSHNET_AUTHKEY"
+
+# Seconds between checks for new blocks and shutdown.
+POLL_INTERVAL: float = 0.5
+
+
+def _authkey(authkey: Optional[bytes]) -> bytes:
+    """Return authkey or the key from AUTHKEY_ENV."""
+    if authkey is not None:
+        return authkey
+    if AUTHKEY_ENV not in os.environ:
+        raise ValueError(f"Pass an authkey or set {AUTHKEY_ENV}.")
+    return os.environ[AUTHKEY_ENV].encode()
+
+
+def run_worker(address: tuple[str, int], authkey: Optional[bytes] = None) -> None:
+    """Calculate replicate blocks for a ShardCoordinator until it hangs up.
+
+    The worker must be able to import the replicate functions, i.e. run from
+    a checkout of this repository.
+
+    Parameters
+    ----------
+    address: tuple[str, int]
+        Host and port of the coordinator.
+    authkey: bytes, optional
+        Shared secret of the coordinator. Read from JOSHNET_AUTHKEY if None.
+    """
+    conn: Connection = Client(address, authkey=_authkey(authkey))
+    logging.info(f"Connected to coordinator at {address}")
+    # Parameters are only sent the first time this worker sees a job.
+    params: dict[int, tuple[Any, ...]] = {}
+    try:
+        while True:
+            try:
+                message: tuple[Any, ...] = conn.recv()
+            except EOFError:
+                break
+            if message[0] == "stop":
+                break
+
+            _, job_id, payload, entropy, start, count = message
+            if payload is not None:
+                params[job_id] = payload
+            func, top_n, bottom_n, edge_n, kwargs = params[job_id]
+            try:
+                for index in range(start, start + count):
+                    rng: Generator = replicate_rng(entropy, index)
+                    conn.send(
+                        (
+                            "rep",
+                            job_id,
+                            index,
+                            func(rng, top_n, bottom_n, edge_n, **kwargs),
+                        )
+                    )
+            except Exception:
+                conn.send(("error", job_id, start, traceback.format_exc()))
+            conn.send(("done", job_id, start, count))
+    finally:
+        conn.close()
+    logging.info("Coordinator hung up. Stopping.")
+
+
+class ShardCoordinator:
+    """Hand replicate blocks to workers on other hosts over TCP.
+
+    Workers started with run_worker connect to the coordinator, which sends
+    each one a block of (job, start, count) at a time. Replicate i is always
+    seeded with replicate_rng(entropy, i), so the results are identical to a
+    single host run with the same seed. A block held by a worker that hangs
+    up, or that doesn't answer within block_timeout, goes back in the queue
+    for the other workers.
+
+    The coordinator is a drop in replacement for ReplicatePool in dispatcher.
+
+    Parameters
+    ----------
+    address: tuple[str, int], optional
+        Host and port to listen on. Port 0 picks a free port; see address.
+        The default is ("localhost", 0).
+    authkey: bytes, optional
+        Shared secret the workers must know. Read from JOSHNET_AUTHKEY if
+        None.
+    block_timeout: float, optional
+        Seconds to wait on a worker's next replicate before giving its block
+        to someone else. The default is None (only lost connections count).
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("localhost", 0),
+        authkey: Optional[bytes] = None,
+        block_timeout: Optional[float] = None,
+    ) -> None:
+        self._authkey: bytes = _authkey(authkey)
+        self.block_timeout: Optional[float] = block_timeout
+        self._listener: Listener = Listener(address, authkey=self._authkey)
+        self.address: tuple[str, int] = self._listener.address
+        # Blocks of (job id, start, count) waiting for a worker.
+        self._blocks: queue.Queue[tuple[int, int, int]] = queue.Queue()
+        self._running: dict[int, ReplicateJob] = {}
+        # Replicate function, network parameters, and keyword arguments plus
+        # the entropy of each running job.
+        self._params: dict[int, tuple[tuple[Any, ...], int]] = {}
+        self._ids: Iterator[int] = itertools.count()
+        self._lock: threading.Lock = threading.Lock()
+        self._closing: bool = False
+        self._handlers: list[threading.Thread] = []
+
+        self._acceptor: threading.Thread = threading.Thread(
+            target=self._accept, name="netshard_acceptor", daemon=True
+        )
+        self._acceptor.start()
+        logging.info(f"Coordinator listening on {self.address}")
+
+    @property
+    def workers(self) -> int:
+        """Number of connected workers."""
+        return sum(handler.is_alive() for handler in self._handlers)
+
+    def submit(
+        self,
+        func: Callable[..., float],
+        params: tuple[int, int, int],
+        kwargs: Mapping[str, Any],
+        entropy: int,
+        blocks: list[tuple[int, int]],
+    ) -> ReplicateJob:
+        """Queue blocks of replicates. See ReplicatePool.submit."""
+        with self._lock:
+            job: ReplicateJob = ReplicateJob(
+                self, next(self._ids), sum(count for _, count in blocks)
+            )
+            self._running[job.job_id] = job
+            self._params[job.job_id] = ((func, *params, dict(kwargs)), entropy)
+        for start, count in blocks:
+            self._blocks.put((job.job_id, start, count))
+        return job
+
+    def _cancel(self, job: ReplicateJob) -> None:
+        # Queued blocks of the job are skipped. Blocks already handed out
+        # run to the end and their replicates are dropped.
+        with self._lock:
+            self._running.pop(job.job_id, None)
+            self._params.pop(job.job_id, None)
+
+    def _accept(self) -> None:
+        while not self._closing:
+            try:
+                conn: Connection = self._listener.accept()
+            except (AuthenticationError, OSError, EOFError) as err:
+                if not self._closing:
+                    logging.warning(f"Rejected a worker: {err}")
+                continue
+            if self._closing:
+                conn.close()
+                break
+            handler: threading.Thread = threading.Thread(
+                target=self._serve,
+                args=(conn,),
+                name=f"netshard_worker_{len(self._handlers)}",
+                daemon=True,
+            )
+            self._handlers.append(handler)
+            handler.start()
+
+    def _serve(self, conn: Connection) -> None:
+        """Feed one worker blocks until it or the coordinator goes away."""
+        name: str = threading.current_thread().name
+        logging.info(f"{name} connected.")
+        seen: set[int] = set()
+        block: Optional[tuple[int, int, int]] = None
+        received: int = 0
+        try:
+            while not self._closing:
+                try:
+                    block = self._blocks.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                job_id, start, count = block
+                with self._lock:
+                    job: Optional[ReplicateJob] = self._running.get(job_id)
+                    if job is None:
+                        block = None
+                        continue
+                    payload, entropy = self._params[job_id]
+                conn.send(
+                    (
+                        "block",
+                        job_id,
+                        None if job_id in seen else payload,
+                        entropy,
+                        start,
+                        count,
+                    )
+                )
+                seen.add(job_id)
+
+                received = 0
+                while True:
+                    if not conn.poll(self.block_timeout):
+                        raise TimeoutError(f"{name} timed out.")
+                    kind, _, a, b = conn.recv()
+                    if kind == "done":
+                        break
+                    if kind == "rep":
+                        received += 1
+                        self._deliver(job_id, a, b, name)
+                    elif kind == "error":
+                        self._fail(job_id, b)
+                block = None
+        except (EOFError, OSError, TimeoutError) as err:
+            logging.warning(f"Lost {name}: {err!r}")
+        finally:
+            if block is not None:
+                # A worker calculates its block in order, so only the tail
+                # of the block is missing.
+                job_id, start, count = block
+                if received < count:
+                    self._blocks.put((job_id, start + received, count - received))
+            if self._closing:
+                try:
+                    conn.send(("stop",))
+                except (OSError, ValueError):
+                    pass
+            conn.close()
+
+    def _deliver(self, job_id: int, index: int, replicate: float, worker: str) -> None:
+        with self._lock:
+            job: Optional[ReplicateJob] = self._running.get(job_id)
+            # A block reassigned after a timeout may still arrive twice.
+            if job is None or index in job._seen:
+                return
+            job._seen.add(index)
+            if len(job._seen) == job.total:
+                del self._running[job_id]
+                del self._params[job_id]
+        job._results.put((index, replicate, worker))
+
+    def _fail(self, job_id: int, error: str) -> None:
+        with self._lock:
+            job: Optional[ReplicateJob] = self._running.get(job_id)
+        if job is not None:
+            job._results.put(RuntimeError(f"Replicate failed:\n{error}"))
+
+    def close(self) -> None:
+        """Tell the workers to stop and stop listening."""
+        if self._closing:
+            return
+        self._closing = True
+        logging.info("Closing down the coordinator.")
+        # Wake the acceptor up.
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        self._acceptor.join(timeout=POLL_INTERVAL * 4)
+        self._listener.close()
+        for handler in self._handlers:
+            handler.join(timeout=POLL_INTERVAL * 4)
+
+    def __enter__(self) -> ShardCoordinator:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Calculate replicates for a remote ShardCoordinator. "
+        f"The shared secret is read from {AUTHKEY_ENV}."
+    )
+    parser.add_argument("host", help="Coordinator host.")
+    parser.add_argument("port", type=int, help="Coordinator port.")
+    args: argparse.Namespace = parser.parse_args()
+    run_worker((args.host, args.port))
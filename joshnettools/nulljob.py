@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+import asyncio
+import inspect
+import threading
+import time
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from collections import Counter
+from typing import Any, Generator, Optional
+from collections.abc import Callable, Hashable
+
+from randomnet import dispatcher
+from replicatepool import ReplicateJob
+
+# Threads running dispatcher for submit_null when no executor is passed in.
+# The replicates themselves run in worker processes, so a handful of threads
+# is plenty.
+DEFAULT_THREADS: int = 4
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock: threading.Lock = threading.Lock()
+
+
+def _default_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(DEFAULT_THREADS, "nulljob")
+        return _executor
+
+
+class NullJob:
+    """Handle for a null model running in the background.
+
+    Created by submit_null. Progress is readable from any thread while the
+    replicates are calculated, and the handle may be awaited from asyncio.
+
+    Attributes
+    ----------
+    total: int
+        Replicates requested. Adaptive runs may stop earlier.
+    completed: int
+        Replicates finished so far, including ones from a store or checkpoint.
+    future: concurrent.futures.Future
+        Future of dispatcher's result.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        callback: Optional[Callable[[NullJob], None]] = None,
+        every: int = 100,
+    ) -> None:
+        self.total: int = total
+        self.completed: int = 0
+        # Replaced by the executor's future in submit_null.
+        self.future: Future[npt.NDArray[np.floating]] = Future()
+        self._callback: Optional[Callable[[NullJob], None]] = callback
+        self._every: int = every
+        self._started: float = time.monotonic()
+        self._calculated: int = 0
+        self._job: Optional[ReplicateJob] = None
+        self._reps: Optional[npt.NDArray[np.floating]] = None
+        self._filled: Optional[npt.NDArray[np.bool_]] = None
+        self._cancelled: bool = False
+
+    def _attach(
+        self,
+        job: ReplicateJob,
+        reps: npt.NDArray[np.floating],
+        filled: npt.NDArray[np.bool_],
+    ) -> None:
+        """Called by dispatcher once the replicates are submitted."""
+        self._started = time.monotonic()
+        self._job, self._reps, self._filled = job, reps, filled
+        self.completed = int(filled.sum())
+        if self._cancelled:
+            job.cancel()
+
+    def _update(self) -> None:
+        """Called by dispatcher after every replicate."""
+        self.completed += 1
+        self._calculated += 1
+        if self._callback is not None and not self._calculated % self._every:
+            self._callback(self)
+
+    def _done(self, future: Future[npt.NDArray[np.floating]]) -> None:
+        if self._callback is not None and not future.cancelled():
+            self._callback(self)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the replicates were submitted."""
+        return time.monotonic() - self._started
+
+    def rates(self) -> dict[Hashable, float]:
+        """Replicates per second of each worker."""
+        if self._job is None:
+            return {}
+        elapsed: float = self.elapsed
+        counts: Counter[Hashable] = self._job.worker_counts.copy()
+        return {worker: count / elapsed for worker, count in counts.items()}
+
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until all replicates are done. None until known."""
+        if self.done():
+            return 0.0
+        if not self._calculated:
+            return None
+        rate: float = self._calculated / self.elapsed
+        return (self.total - self.completed) / rate
+
+    def partial(self) -> npt.NDArray[np.floating]:
+        """Copy of the replicates finished so far, in no particular order."""
+        if self.future.done() and not self.future.cancelled():
+            if self.future.exception() is None:
+                return self.future.result().copy()
+        if self._reps is None or self._filled is None:
+            return np.zeros(0)
+        return self._reps[: len(self._filled)][self._filled].copy()
+
+    def cancel(self) -> bool:
+        """Stop the job. Returns False if it already finished."""
+        if self.future.done():
+            return False
+        self._cancelled = True
+        if self.future.cancel():
+            return True
+        if self._job is not None:
+            self._job.cancel()
+        return True
+
+    def done(self) -> bool:
+        """Whether the job finished, failed, or was cancelled."""
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> npt.NDArray[np.floating]:
+        """Wait for the replicates. See concurrent.futures.Future.result."""
+        return self.future.result(timeout)
+
+    def __await__(self) -> Generator[Any, None, npt.NDArray[np.floating]]:
+        return asyncio.wrap_future(self.future).__await__()
+
+    def __repr__(self) -> str:
+        return f"NullJob({self.completed}/{self.total}, eta={self.eta()})"
+
+
+def submit_null(
+    *args: Any,
+    progress: Optional[Callable[[NullJob], None]] = None,
+    every: int = 100,
+    executor: Optional[Executor] = None,
+    **kwargs: Any,
+) -> NullJob:
+    """Run dispatcher in the background and return a handle to it.
+
+    Several jobs may share one ReplicatePool (dispatcher's pool argument) to
+    calculate their replicates side by side on the same workers.
+
+    Parameters
+    ----------
+    *args, **kwargs: Any
+        Arguments for dispatcher.
+    progress: Callable[[NullJob], None], optional
+        Called from the job's thread every every replicates and once the job
+        finishes. The default is None.
+    every: int, optional
+        Replicates between progress calls. The default is 100.
+    executor: concurrent.futures.Executor, optional
+        Thread executor to run dispatcher on. A shared module level
+        ThreadPoolExecutor is used if None.
+
+    Returns
+    -------
+    NullJob
+        Handle of the running job.
+    """
+    bound: inspect.BoundArguments = inspect.signature(dispatcher).bind(*args, **kwargs)
+    bound.apply_defaults()
+    handle: NullJob = NullJob(bound.arguments["replicates"], progress, every)
+
+    def run() -> npt.NDArray[np.floating]:
+        return dispatcher(*args, monitor=handle, **kwargs)
+
+    future: Future[npt.NDArray[np.floating]] = (executor or _default_executor()).submit(
+        run
+    )
+    handle.future = future
+    future.add_done_callback(handle._done)
+    return handle
@@ -0,0 +1,149 @@
+import numpy as np
+import numpy.typing as npt
+import json
+import logging
+import os
+import time
+
+from pathlib import Path
+from typing import Any, Optional
+
+# Default cap on the total size of the stored replicates (1 GiB).
+DEFAULT_MAX_BYTES: int = 2**30
+
+# Parameters that identify a null distribution. The seed is stored alongside.
+KEY_FIELDS: tuple[str, ...] = (
+    "func",
+    "top_n",
+    "bottom_n",
+    "edge_n",
+    "unique_attr",
+    "clust_error",
+    "edge_digest",
+    "trades",
+)
+
+
+class NullStore:
+    """On disk store of null distribution replicates.
+
+    Replicates depend only on the random network's parameters (or the
+    observed edges' digest for degree preserving replicates), the metric,
+    and the seed, so they're stored as one .npz per (parameters, seed) with a
+    JSON index in the same directory. The least recently used entries are
+    evicted once the store grows past max_bytes.
+
+    Parameters
+    ----------
+    path: str | Path
+        Directory of the store. Created if missing.
+    max_bytes: int, optional
+        Size cap for all stored replicates. The default is DEFAULT_MAX_BYTES.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path: Path = Path(path)
+        self.max_bytes: int = max_bytes
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._index_path: Path = self.path.joinpath("index.json")
+
+    def _read_index(self) -> dict[str, dict[str, Any]]:
+        if not self._index_path.exists():
+            return {}
+        return json.loads(self._index_path.read_text())
+
+    def _write_index(self, index: dict[str, dict[str, Any]]) -> None:
+        # Write then rename so a crash never leaves half an index behind.
+        tmp: Path = self._index_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(index, indent=2))
+        os.replace(tmp, self._index_path)
+
+    @staticmethod
+    def _matches(entry: dict[str, Any], params: dict[str, Any]) -> bool:
+        # Entries written before a field existed have it unset.
+        return all(entry.get(field) == params.get(field) for field in KEY_FIELDS)
+
+    def get(
+        self, params: dict[str, Any], seed: Optional[int] = None
+    ) -> Optional[tuple[int, npt.NDArray[np.floating]]]:
+        """Look up stored replicates.
+
+        Parameters
+        ----------
+        params: dict[str, Any]
+            Network parameters and metric. See KEY_FIELDS.
+        seed: int, optional
+            Master seed of the replicates. Any seed is acceptable if None, in
+            which case the largest entry is returned.
+
+        Returns
+        -------
+        Optional[tuple[int, numpy.typing.NDArray[numpy.floating]]]
+            Seed entropy and replicates or None if nothing is stored.
+        """
+        index: dict[str, dict[str, Any]] = self._read_index()
+        candidates: list[str] = [
+            name
+            for name, entry in index.items()
+            if self._matches(entry, params) and seed in (None, entry["seed"])
+        ]
+        if not candidates:
+            return None
+
+        name: str = max(candidates, key=lambda name: index[name]["replicates"])
+        with np.load(self.path.joinpath(name)) as npz:
+            replicates: npt.NDArray[np.floating] = npz["replicates"]
+
+        index[name]["last_used"] = time.time()
+        self._write_index(index)
+        logging.info(f"Null store hit: {len(replicates)} replicates from {name}")
+        return index[name]["seed"], replicates
+
+    def put(
+        self, params: dict[str, Any], seed: int, replicates: npt.NDArray[np.floating]
+    ) -> None:
+        """Store replicates, replacing a smaller entry with the same key.
+
+        Parameters
+        ----------
+        params: dict[str, Any]
+            Network parameters and metric. See KEY_FIELDS.
+        seed: int
+            Master seed entropy the replicates were calculated with.
+        replicates: numpy.typing.NDArray[numpy.floating]
+            Replicates 0 through len(replicates) - 1 for seed.
+        """
+        index: dict[str, dict[str, Any]] = self._read_index()
+        name: str = (
+            "_".join([*(str(params.get(field)) for field in KEY_FIELDS), str(seed)])
+            + ".npz"
+        )
+        if name in index and index[name]["replicates"] >= len(replicates):
+            return
+
+        np.savez(self.path.joinpath(name), replicates=np.asarray(replicates))
+        index[name] = {
+            **{field: params.get(field) for field in KEY_FIELDS},
+            "seed": seed,
+            "replicates": len(replicates),
+            "bytes": self.path.joinpath(name).stat().st_size,
+            "last_used": time.time(),
+        }
+        self._evict(index, name)
+        self._write_index(index)
+
+    def _evict(self, index: dict[str, dict[str, Any]], keep: str) -> None:
+        """Remove least recently used entries until the store fits max_bytes.
+
+        The entry named keep, which was just written, is never evicted.
+        """
+        total: int = sum(entry["bytes"] for entry in index.values())
+        for name in sorted(index, key=lambda name: index[name]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            logging.info(f"Evicting {name} from the null store")
+            total -= index[name]["bytes"]
+            self.path.joinpath(name).unlink(missing_ok=True)
+            del index[name]
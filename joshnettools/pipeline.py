@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from types import MappingProxyType, ModuleType
+from typing import Any, NamedTuple, Optional
+from collections.abc import Callable, Mapping, Sequence
+
+# Bytes read at a time when hashing input files.
+HASH_CHUNK: int = 2**20
+
+
+class Stage(NamedTuple):
+    """One step of a Pipeline.
+
+    The stage runs func(*input values, **params). Its cache key hashes
+    func's source code, the source files of every module next to func's that
+    it imports (directly or not), params, the contents of files, and the
+    keys of its inputs, so changing any of them re-runs the stage and
+    everything downstream of it.
+
+    Attributes
+    ----------
+    name: str
+        Unique name other stages refer to it by.
+    func: Callable[..., Any]
+        Function calculating the stage's value. Must be picklable (defined
+        at module level) if isolated is set.
+    inputs: tuple[str, ...]
+        Stages whose values are passed to func, in order.
+    params: Mapping[str, Any]
+        Keyword arguments for func. Must be picklable.
+    files: tuple[str | Path, ...]
+        Files func reads. Their contents are part of the key.
+    outputs: tuple[str | Path, ...]
+        Files func writes, such as figures. The stage re-runs if any is
+        missing.
+    isolated: bool
+        Run in a worker process instead of a thread. Use it for stages that
+        aren't thread safe, such as anything drawing with pyplot.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    inputs: tuple[str, ...] = ()
+    params: Mapping[str, Any] = MappingProxyType({})
+    files: tuple[str | Path, ...] = ()
+    outputs: tuple[str | Path, ...] = ()
+    isolated: bool = False
+
+
+def _local_modules(module: ModuleType) -> list[ModuleType]:
+    """module and the modules it imports from its own directory, recursively.
+
+    Functions, classes, and modules a module holds count as imports, so
+    kernels a stage reaches through other modules (e.g. dispatcher's) are
+    found as well.
+    """
+    home: Path = Path(module.__file__ or "").resolve().parent
+    found: dict[str, ModuleType] = {}
+    pending: list[ModuleType] = [module]
+    while pending:
+        current: ModuleType = pending.pop()
+        source: Optional[str] = getattr(current, "__file__", None)
+        if source is None or Path(source).resolve().parent != home:
+            continue
+        if source in found:
+            continue
+        found[source] = current
+        for value in vars(current).values():
+            imported: Optional[ModuleType] = (
+                value if isinstance(value, ModuleType) else inspect.getmodule(value)
+            )
+            if imported is not None:
+                pending.append(imported)
+    return [found[source] for source in sorted(found)]
+
+
+def _code_id(func: Callable[..., Any]) -> bytes:
+    """Identify func by its name, its source code, and the sources of the
+    modules it depends on (see _local_modules)."""
+    name: str = f"{func.__module__}.{func.__qualname__}"
+    try:
+        code: str = name + inspect.getsource(func)
+    except (OSError, TypeError):
+        code = name
+    module: Optional[ModuleType] = sys.modules.get(func.__module__)
+    if module is not None and getattr(module, "__file__", None):
+        for local in _local_modules(module):
+            code += _file_hash(local.__file__)
+    return code.encode()
+
+
+def _file_hash(path: str | Path) -> str:
+    digest: hashlib._Hash = hashlib.sha256()
+    try:
+        with open(path, "rb") as data:
+            for chunk in iter(lambda: data.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return "missing"
+    return digest.hexdigest()
+
+
+def _call(stage: Stage, args: list[Any]) -> Any:
+    return stage.func(*args, **stage.params)
+
+
+class Pipeline:
+    """Run stages in dependency order, reusing cached values.
+
+    Values are pickled to cache_dir under their stage's key (see Stage). A
+    stage whose key is cached and whose outputs exist is skipped, and its
+    value is only loaded if a stage that does run needs it. Stages whose
+    inputs are ready run at the same time: threads for most stages and
+    processes for isolated ones.
+
+    Parameters
+    ----------
+    stages: Sequence[Stage]
+        Stages in any order.
+    cache_dir: str | Path
+        Directory of cached values. Created if needed.
+    threads: int, optional
+        Stages running at once in threads. The default is 4.
+    processes: int, optional
+        Isolated stages running at once. The default is 2.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        cache_dir: str | Path,
+        threads: int = 4,
+        processes: int = 2,
+    ) -> None:
+        self.stages: dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            unknown: set[str] = set(stage.inputs) - set(self.stages)
+            if unknown:
+                raise ValueError(f"{stage.name} needs unknown stages: {unknown}")
+
+        self.cache_dir: Path = Path(cache_dir)
+        self.threads: int = threads
+        self.processes: int = processes
+        self._keys: dict[str, str] = {}
+        self.order: list[str] = self._sort()
+
+    def _sort(self) -> list[str]:
+        """Stage names with every stage after its inputs."""
+        order: list[str] = []
+        state: dict[str, bool] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name):
+                return
+            if name in state:
+                raise ValueError(f"Stages depend on each other in a cycle at {name}")
+            state[name] = False
+            for upstream in self.stages[name].inputs:
+                visit(upstream)
+            state[name] = True
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def key(self, name: str) -> str:
+        """Content hash of a stage's definition and everything upstream."""
+        if name not in self._keys:
+            stage: Stage = self.stages[name]
+            digest: hashlib._Hash = hashlib.sha256()
+            digest.update(stage.name.encode())
+            digest.update(_code_id(stage.func))
+            digest.update(pickle.dumps(sorted(stage.params.items()), protocol=4))
+            for path in stage.files:
+                digest.update(_file_hash(path).encode())
+            for upstream in stage.inputs:
+                digest.update(self.key(upstream).encode())
+            self._keys[name] = digest.hexdigest()
+        return self._keys[name]
+
+    def _path(self, name: str) -> Path:
+        return self.cache_dir / f"{name}-{self.key(name)[:16]}.pkl"
+
+    def cached(self, name: str) -> bool:
+        """Whether a stage can be skipped."""
+        return self._path(name).exists() and all(
+            os.path.exists(path) for path in self.stages[name].outputs
+        )
+
+    def _load(self, name: str) -> Any:
+        with open(self._path(name), "rb") as cached:
+            return pickle.load(cached)
+
+    def _store(self, name: str, value: Any) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves half a value.
+        handle, temp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(handle, "wb") as out:
+            pickle.dump(value, out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self._path(name))
+        # Older values of the stage are stale now.
+        for old in self.cache_dir.glob(f"{name}-*.pkl"):
+            if old != self._path(name):
+                old.unlink()
+
+    def run(
+        self, targets: Optional[Sequence[str]] = None, force: Sequence[str] = ()
+    ) -> dict[str, Any]:
+        """Run whatever the targets need that isn't cached.
+
+        Parameters
+        ----------
+        targets: Sequence[str], optional
+            Stages to bring up to date. If None, the stages no other stage
+            takes as an input, so the values of cached intermediate stages
+            are only loaded if something stale needs them.
+        force: Sequence[str], optional
+            Stages to run even if they're cached. Stages downstream of them
+            only run if they're stale themselves. The default is ().
+
+        Returns
+        -------
+        dict[str, Any]
+            Value of each target.
+        """
+        if targets is None:
+            inputs: set[str] = {
+                upstream for stage in self.stages.values() for upstream in stage.inputs
+            }
+            targets = [name for name in self.stages if name not in inputs]
+        else:
+            targets = list(targets)
+        needed: set[str] = set()
+
+        def require(name: str) -> None:
+            if name not in needed:
+                needed.add(name)
+                for upstream in self.stages[name].inputs:
+                    require(upstream)
+
+        for name in targets:
+            require(name)
+
+        stale: set[str] = {
+            name for name in needed if name in force or not self.cached(name)
+        }
+        # Cached values are only loaded if a stale stage or the caller needs
+        # them.
+        wanted: set[str] = set(targets) | {
+            upstream for name in stale for upstream in self.stages[name].inputs
+        }
+        todo: list[str] = [
+            name for name in self.order if name in stale or name in wanted
+        ]
+        logging.info(
+            f"Pipeline: {len(stale)} of {len(needed)} stages to run, "
+            f"{len(needed) - len(stale)} cached"
+        )
+
+        values: dict[str, Any] = {}
+        with ThreadPoolExecutor(self.threads, "pipeline") as threads:
+            with ProcessPoolExecutor(self.processes) as processes:
+                running: dict[Future[Any], tuple[str, float]] = {}
+                while todo or running:
+                    for name in [
+                        name
+                        for name in todo
+                        if all(
+                            upstream in values for upstream in self.stages[name].inputs
+                        )
+                        or name not in stale
+                    ]:
+                        todo.remove(name)
+                        stage: Stage = self.stages[name]
+                        future: Future[Any]
+                        if name not in stale:
+                            future = threads.submit(self._load, name)
+                        else:
+                            executor: Executor = (
+                                processes if stage.isolated else threads
+                            )
+                            future = executor.submit(
+                                _call, stage, [values[up] for up in stage.inputs]
+                            )
+                        running[future] = (name, time.perf_counter())
+
+                    done: set[Future[Any]]
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name, start = running.pop(future)
+                        values[name] = future.result()
+                        if name in stale:
+                            self._store(name, values[name])
+                            logging.info(
+                                f"Pipeline: {name} took "
+                                f"{time.perf_counter() - start:.2f}s"
+                            )
+        return {name: values[name] for name in targets}
@@ -4,8 +4,10 @@ import logging
 
 from networkx import Graph
 from gamenetattrs import add_attributes
+from instrument import traced
 
 
+@traced
 def project_gamers(gamers_df: pd.DataFrame, top: str, bottom: str) -> Graph:
     """Project top onto bottom for gamers_df.
 
@@ -1,14 +1,20 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+from __future__ import annotations
+
 import numpy as np
 import numpy.typing as npt
 
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from collections.abc import Sequence, Iterable
-from matplotlib.axes import Subplot
-from matplotlib.figure import Figure
 
+from instrument import traced
+from randomnet import replicate_p_value
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Subplot
+    from matplotlib.figure import Figure
 
+
+@traced
 def p_value_plots(
     observed: Sequence[np.floating],
     replicates: Sequence[npt.NDArray[np.floating]],
@@ -17,6 +23,7 @@ def p_value_plots(
     plot_p: bool = True,
     figsize: tuple[int, int] = (20, 20),
     suptitle: Optional[str] = None,
+    errors: Optional[Sequence[float]] = None,
 ) -> tuple[Figure, npt.NDArray[Subplot]]:
     """Plot observed values and replicates for one or more variables.
 
@@ -34,6 +41,10 @@ def p_value_plots(
         Figure size.
     suptitle: Optional[str]
         Main title for plot.
+    errors: Optional[Sequence[float]]
+        Error bound of each variable's replicates, e.g. dispatcher's
+        clust_error for sampled clustering replicates. The p-value's interval
+        is widened by it. Defaults to exact replicates.
 
     Returns
     -------
@@ -47,7 +58,7 @@ def p_value_plots(
     assert isinstance(replicates, Iterable)
     assert all(map(lambda rep: isinstance(rep, Iterable), replicates))
     assert isinstance(labels, Sequence)
-    assert len(observed) & len(replicates) & (len(observed) == len(replicates))
+    assert len(observed) and len(observed) == len(replicates)
 
     # Equal rows and columns...mostly. We'll have an extra row if the length
     # is odd.
@@ -57,10 +68,16 @@ def p_value_plots(
     )
     col: int = int(len(observed) / 2) if len(observed) != 2 else 2
 
+    # Imported here so batch jobs importing this module never load matplotlib.
+    import matplotlib.pyplot as plt
+
     fig: Figure
     axes: npt.NDArray[Subplot]
     fig, axes = plt.subplots(row, col, figsize=figsize)
-    for ax, obs, reps, label in zip(axes.flat, observed, replicates, labels):
+    errors = errors if errors is not None else [0.0] * len(observed)
+    for ax, obs, reps, label, error in zip(
+        axes.flat, observed, replicates, labels, errors
+    ):
         ax.hist(reps, bins="fd", color="#bd93f9")
 
         # Add observed value line and p-value
@@ -70,10 +87,12 @@ def p_value_plots(
             # P-values are the probability of obtaining results at least as
             # extreme as what was observed.
             # So sum(replicates >= observed)/len(replicates)
-            # (which is just the mean as shown below).
+            # (see replicate_p_value).
             # The replicates were calculated via random graphs
             # so I THINK this is statistically sound.
-            p_value: np.floating = np.mean(reps >= obs)
+            # Approximate replicates widen the interval by their error.
+            p_value, low, high = replicate_p_value(reps, obs, error=error)
+            label = f"{label}\np = {p_value:.3g} ({low:.3g}, {high:.3g})"
 
         # Labels and aesthetics
         ax.set_title(label, fontsize=22, fontweight="bold", color="#f8f8f2")
@@ -1,21 +1,59 @@
+from __future__ import annotations
+
 import networkx as nx
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
+import hashlib
+import json
 import logging
-import multiprocessing
+import os
+import math
 
-from numpy.random import Generator
+from numpy.random import Generator, SeedSequence
 from networkx import Graph
-from multiprocessing import Process, Value
-from multiprocessing.queues import Queue
-from multiprocessing.sharedctypes import Synchronized
-from ctypes import c_bool
-from typing import Any, Optional, Mapping
+from pathlib import Path
+from statistics import NormalDist
+from collections import OrderedDict
+from typing import Any, Optional, Mapping, TYPE_CHECKING
 from collections.abc import Callable
 
+from assortativity import degree_assortativity, label_assortativity, mixing_coefficient
+from clustering import average_clustering, sampled_average_clustering
+from curveball import CurveballChain
+from instrument import traced
+from csrgraph import CSRGraph, to_csr, edge_arrays, node_codes, project_edges
+from netshard import ShardCoordinator
+from nullstore import NullStore
+from replicatepool import ReplicateJob, ReplicatePool, replicate_rng
+
+if TYPE_CHECKING:
+    from nulljob import NullJob
+
+# Replicates are handed out to the workers in blocks of this many replicates.
+# A block is also the unit of checkpointing, so an interrupted run loses at
+# most one block per worker.
+BLOCK_SIZE: int = 50
+
+# Label permutation batches are split over edges so that a batch's label
+# lookups hold at most this many cells at once.
+PERMUTATION_CELLS: int = 2**24
+
+# Curveball trades per observed bipartite edge in each replicate. Every
+# replicate starts from the observed graph, so it has to run long enough to
+# forget it. The share of edges moved and the projection's statistics level
+# off at about ten trades per edge on the synthetic data sets. Far fewer,
+# e.g. one trade per top node, leave most edges where they were.
+CURVEBALL_TRADES_PER_EDGE: int = 10
+
+# Adaptive runs never stop before this many replicates. The interval is too
+# unreliable for tiny samples.
+MIN_ADAPTIVE_REPLICATES: int = 100
+
 
-def random_graph(top_n: int, bottom_n: int, edge_n: int) -> Graph:
+def random_graph(
+    top_n: int, bottom_n: int, edge_n: int, rng: Optional[Generator] = None
+) -> Graph:
     """Generate a random bipartite graph and return its projection.
 
     Parameters
@@ -25,6 +63,8 @@ def random_graph(top_n: int, bottom_n: int, edge_n: int) -> Graph:
     bottom_n: int
         Number of bottom nodes (nodes to project on).
     edge_n: Number of edges between the node sets.
+    rng: numpy.random.Generator, optional
+        Source of randomness. NetworkX's global RNG is used if None.
 
     Returns
     -------
@@ -33,7 +73,11 @@ def random_graph(top_n: int, bottom_n: int, edge_n: int) -> Graph:
     """
     # Generate a random graph using the parameters of a previously created
     # graph
-    G: Graph = nx.bipartite.generators.gnmk_random_graph(top_n, bottom_n, edge_n)
+    # NetworkX seeds its own Python RNG from an integer drawn from rng.
+    seed: Optional[int] = int(rng.integers(2**63)) if rng is not None else None
+    G: Graph = nx.bipartite.generators.gnmk_random_graph(
+        top_n, bottom_n, edge_n, seed=seed
+    )
 
     # Sanity check. Useless sanity check.
     assert nx.bipartite.is_bipartite(G)
@@ -48,22 +92,51 @@ def random_graph(top_n: int, bottom_n: int, edge_n: int) -> Graph:
     return nx.bipartite.weighted_projected_graph(G, bnodes)
 
 
+def random_projection(
+    top_n: int, bottom_n: int, edge_n: int, rng: Generator
+) -> CSRGraph:
+    """Generate the projection of a random bipartite graph as CSR arrays.
+
+    The same model as random_graph (edge_n distinct edges drawn uniformly)
+    without building either graph in NetworkX. The projection still costs
+    one entry per pair of bottom nodes sharing a top node.
+
+    Parameters
+    ----------
+    top_n: int
+        Number of top nodes.
+    bottom_n: int
+        Number of bottom nodes (nodes to project on).
+    edge_n: int
+        Number of edges between the node sets.
+    rng: numpy.random.Generator
+        Source of randomness.
+
+    Returns
+    -------
+    CSRGraph
+        Projection onto the bottom nodes.
+    """
+    edges: npt.NDArray[np.int64] = rng.choice(
+        top_n * bottom_n, min(edge_n, top_n * bottom_n), replace=False
+    )
+    return project_edges(edges // bottom_n, edges % bottom_n, bottom_n)
+
+
 def random_clust(
-    queue: Queue[np.floating],
-    keep_going: Synchronized[c_bool],
+    rng: Generator,
     top_n: int,
     bottom_n: int,
     edge_n: int,
-    _unused: Optional[int],
-) -> None:
-    """Generate average clustering replicates.
+    _unused: Optional[int] = None,
+    clust_error: Optional[float] = None,
+) -> float:
+    """Generate an average clustering replicate.
 
     Parameters
     ----------
-    queue: multiprocessing.queues.Queue[numpy.floating]
-        Queue to push calculated replicates.
-    keep_going: multiprocessing.sharedctypes.Synchronized[ctypes.c_bool]
-        Wrapped c_bool which is synchronized between threads.
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
     top_n: int
         Node counts for the top or left set.
     bottom_n: int
@@ -71,29 +144,39 @@ def random_clust(
         bottom nodes.
     edge_n: int
         Edge counts between top and bottom.
+    clust_error: float, optional
+        Estimate the average clustering from a sample of nodes to within
+        clust_error (95% confidence) instead of calculating it exactly. See
+        clustering.sampled_average_clustering. The random projection is
+        still generated in full, in numpy rather than NetworkX, so only the
+        triangle counting stops growing with the network. The default is
+        None (exact).
+
+    Returns
+    -------
+    float
+        Average clustering of a random projection.
     """
-    while keep_going.value:
-        # print(i)
-        G: Graph = random_graph(top_n, bottom_n, edge_n)
-        queue.put(nx.average_clustering(G, weight="weight"))
+    if clust_error is not None:
+        csr: CSRGraph = random_projection(top_n, bottom_n, edge_n, rng)
+        return sampled_average_clustering(csr, clust_error, rng=rng)[0]
+    G: Graph = random_graph(top_n, bottom_n, edge_n, rng)
+    return average_clustering(G, weight="weight")
 
 
 def random_density(
-    queue: Queue[np.floating],
-    keep_going: Synchronized[c_bool],
+    rng: Generator,
     top_n: int,
     bottom_n: int,
     edge_n: int,
-    _unused: Optional[int],
-) -> None:
-    """Generate density replicates.
+    _unused: Optional[int] = None,
+) -> float:
+    """Generate a density replicate.
 
     Parameters
     ----------
-    queue: multiprocessing.queues.Queue[numpy.floating]
-        Queue to push calculated replicates.
-    keep_going: multiprocessing.sharedctypes.Synchronized[ctypes.c_bool]
-        Wrapped c_bool which is synchronized between threads.
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
     top_n: int
         Node counts for the top or left set.
     bottom_n: int
@@ -101,30 +184,30 @@ def random_density(
         bottom nodes.
     edge_n: int
         Edge counts between top and bottom.
+
+    Returns
+    -------
+    float
+        Density of a random projection.
     """
-    while keep_going.value:
-        G: Graph = random_graph(top_n, bottom_n, edge_n)
-        # Density is the actual edges/possible edges
-        queue.put(nx.density(G))
+    G: Graph = random_graph(top_n, bottom_n, edge_n, rng)
+    # Density is the actual edges/possible edges
+    return nx.density(G)
 
 
 def random_deg_cent(
-    queue: Queue[np.floating],
-    keep_going: Synchronized[c_bool],
+    rng: Generator,
     top_n: int,
     bottom_n: int,
     edge_n: int,
-    _unused: Optional[int],
-) -> None:
-    """Generate random degree centrality replicates.
-
+    _unused: Optional[int] = None,
+) -> float:
+    """Generate a random degree centrality replicate.
 
     Parameters
     ----------
-    queue: multiprocessing.queues.Queue[numpy.floating]
-        Queue to push calculated replicates.
-    keep_going: multiprocessing.sharedctypes.Synchronized[ctypes.c_bool]
-        Wrapped c_bool which is synchronized between threads.
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
     top_n: int
         Node counts for the top or left set.
     bottom_n: int
@@ -132,28 +215,29 @@ def random_deg_cent(
         bottom nodes.
     edge_n: int
         Edge counts between top and bottom.
+
+    Returns
+    -------
+    float
+        Mean degree centrality of a random projection.
     """
-    while keep_going.value:
-        G: Graph = random_graph(top_n, bottom_n, edge_n)
-        queue.put(np.mean(np.fromiter(nx.degree_centrality(G).values(), np.float64)))
+    G: Graph = random_graph(top_n, bottom_n, edge_n, rng)
+    return float(np.mean(np.fromiter(nx.degree_centrality(G).values(), np.float64)))
 
 
 def random_deg_assort(
-    queue: Queue[np.floating],
-    keep_going: Synchronized[c_bool],
+    rng: Generator,
     top_n: int,
     bottom_n: int,
     edge_n: int,
-    _unused: Optional[int],
-) -> None:
-    """Generate degree assortativity replicates.
+    _unused: Optional[int] = None,
+) -> float:
+    """Generate a degree assortativity replicate.
 
     Parameters
     ----------
-    queue: multiprocessing.queues.Queue[numpy.floating]
-        Queue to push calculated replicates.
-    keep_going: multiprocessing.sharedctypes.Synchronized[ctypes.c_bool]
-        Wrapped c_bool which is synchronized between threads.
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
     top_n: int
         Node counts for the top or left set.
     bottom_n: int
@@ -161,28 +245,29 @@ def random_deg_assort(
         bottom nodes.
     edge_n: int
         Edge counts between top and bottom.
+
+    Returns
+    -------
+    float
+        Degree assortativity of a random projection.
     """
-    while keep_going.value:
-        G: Graph = random_graph(top_n, bottom_n, edge_n)
-        queue.put(nx.degree_pearson_correlation_coefficient(G, weight="weight"))
+    G: Graph = random_graph(top_n, bottom_n, edge_n, rng)
+    return degree_assortativity(to_csr(G))
 
 
 def random_assort(
-    queue: Queue[np.floating],
-    keep_going: Synchronized[c_bool],
+    rng: Generator,
     top_n: int,
     bottom_n: int,
     edge_n: int,
-    unique_attr: Optional[int],
-) -> None:
-    """Generate attribute assortativity replicates.
+    unique_attr: Optional[int] = None,
+) -> float:
+    """Generate an attribute assortativity replicate.
 
     Parameters
     ----------
-    queue: multiprocessing.queues.Queue[numpy.floating]
-        Queue to push calculated replicates.
-    keep_going: multiprocessing.sharedctypes.Synchronized[ctypes.c_bool]
-        Wrapped c_bool which is synchronized between threads.
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
     top_n: int
         Node counts for the top or left set.
     bottom_n: int
@@ -192,36 +277,549 @@ def random_assort(
         Edge counts between top and bottom.
     unique_attr: int
         Number of unique values for the assortativity attribute.
+
+    Returns
+    -------
+    float
+        Attribute assortativity of a random projection with random labels.
     """
     # Use unique_attr to generate unique (i.e. 0 to unique_attr) classes
-    # for an attribute, attr_name
-    # attr: npt.NDArray[np.int_] = np.arange(0, unique_attr, 1)
+    # for a random attribute.
     assert unique_attr is not None
-    attr_name: str = "attribute"
-    rng: Generator = np.random.default_rng()
-
-    while keep_going.value:
-        G: Graph = random_graph(top_n, bottom_n, edge_n)
-        # Generate a random attribute value for attr_name
-        nx.set_node_attributes(
-            G,
-            {node: rng.integers(0, unique_attr) for node in G.nodes()},
-            attr_name,
+
+    G: Graph = random_graph(top_n, bottom_n, edge_n, rng)
+    csr: CSRGraph = to_csr(G)
+    # Generate a random attribute value for each node. One call draws the
+    # same values as one call per node in G's node order (CSR order).
+    labels: npt.NDArray[np.int64] = rng.integers(0, unique_attr, csr.n)
+    return label_assortativity(csr, labels, unique_attr)
+
+
+# Chains each worker process keeps. Long lived pools serve many data sets, so
+# only the most recently used ones stay around.
+CACHED_CHAINS: int = 2
+
+# Observed bipartite graphs for the curveball replicates. Each worker process
+# builds a chain once and resets it after every replicate instead of
+# rebuilding the projection.
+_CHAINS: OrderedDict[tuple[int, int, int], CurveballChain] = OrderedDict()
+
+
+def _curveball(
+    rng: Generator,
+    metric: Callable[[CurveballChain], float],
+    tops: Optional[npt.NDArray[np.int64]],
+    bottoms: Optional[npt.NDArray[np.int64]],
+    trades: Optional[int],
+) -> float:
+    """Calculate one degree preserving replicate of metric.
+
+    Parameters
+    ----------
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
+    metric: Callable[[CurveballChain], float]
+        Statistic to read off of the randomized chain.
+    tops: numpy.typing.NDArray[numpy.int64]
+        Top node code of each observed bipartite edge.
+    bottoms: numpy.typing.NDArray[numpy.int64]
+        Bottom node code of each observed bipartite edge.
+    trades: int, optional
+        Curveball trades per replicate. Defaults to CURVEBALL_TRADES_PER_EDGE
+        times the number of edges.
+
+    Returns
+    -------
+    float
+        Replicate of metric.
+    """
+    assert tops is not None and bottoms is not None
+    key: tuple[int, int, int] = (
+        len(tops),
+        hash(tops.tobytes()),
+        hash(bottoms.tobytes()),
+    )
+    if key not in _CHAINS:
+        _CHAINS[key] = CurveballChain(tops, bottoms)
+        while len(_CHAINS) > CACHED_CHAINS:
+            _CHAINS.popitem(last=False)
+    _CHAINS.move_to_end(key)
+    chain: CurveballChain = _CHAINS[key]
+
+    # Every replicate starts from the observed graph so it only depends on
+    # its own rng.
+    chain.trade(
+        rng, trades if trades is not None else CURVEBALL_TRADES_PER_EDGE * len(tops)
+    )
+    try:
+        return metric(chain)
+    finally:
+        chain.reset()
+
+
+def random_curveball_clust(
+    rng: Generator,
+    top_n: int,
+    bottom_n: int,
+    edge_n: int,
+    _unused: Optional[int] = None,
+    tops: Optional[npt.NDArray[np.int64]] = None,
+    bottoms: Optional[npt.NDArray[np.int64]] = None,
+    trades: Optional[int] = None,
+) -> float:
+    """Generate a degree preserving average clustering replicate.
+
+    Parameters
+    ----------
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
+    top_n: int
+        Node counts for the top or left set.
+    bottom_n: int
+        Node counts for the bottom or right set. Top nodes are projected onto
+        bottom nodes.
+    edge_n: int
+        Edge counts between top and bottom.
+    tops: numpy.typing.NDArray[numpy.int64]
+        Top node code of each observed bipartite edge.
+    bottoms: numpy.typing.NDArray[numpy.int64]
+        Bottom node code of each observed bipartite edge.
+    trades: int, optional
+        Curveball trades per replicate. Defaults to CURVEBALL_TRADES_PER_EDGE
+        times edge_n.
+
+    Returns
+    -------
+    float
+        Average clustering of a degree preserving random projection.
+    """
+    return _curveball(rng, CurveballChain.average_clustering, tops, bottoms, trades)
+
+
+def random_curveball_density(
+    rng: Generator,
+    top_n: int,
+    bottom_n: int,
+    edge_n: int,
+    _unused: Optional[int] = None,
+    tops: Optional[npt.NDArray[np.int64]] = None,
+    bottoms: Optional[npt.NDArray[np.int64]] = None,
+    trades: Optional[int] = None,
+) -> float:
+    """Generate a degree preserving density replicate.
+
+    Parameters
+    ----------
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
+    top_n: int
+        Node counts for the top or left set.
+    bottom_n: int
+        Node counts for the bottom or right set. Top nodes are projected onto
+        bottom nodes.
+    edge_n: int
+        Edge counts between top and bottom.
+    tops: numpy.typing.NDArray[numpy.int64]
+        Top node code of each observed bipartite edge.
+    bottoms: numpy.typing.NDArray[numpy.int64]
+        Bottom node code of each observed bipartite edge.
+    trades: int, optional
+        Curveball trades per replicate. Defaults to CURVEBALL_TRADES_PER_EDGE
+        times edge_n.
+
+    Returns
+    -------
+    float
+        Density of a degree preserving random projection.
+    """
+    return _curveball(rng, CurveballChain.density, tops, bottoms, trades)
+
+
+def random_curveball_deg_assort(
+    rng: Generator,
+    top_n: int,
+    bottom_n: int,
+    edge_n: int,
+    _unused: Optional[int] = None,
+    tops: Optional[npt.NDArray[np.int64]] = None,
+    bottoms: Optional[npt.NDArray[np.int64]] = None,
+    trades: Optional[int] = None,
+) -> float:
+    """Generate a degree preserving degree assortativity replicate.
+
+    Parameters
+    ----------
+    rng: numpy.random.Generator
+        Source of randomness for this replicate.
+    top_n: int
+        Node counts for the top or left set.
+    bottom_n: int
+        Node counts for the bottom or right set. Top nodes are projected onto
+        bottom nodes.
+    edge_n: int
+        Edge counts between top and bottom.
+    tops: numpy.typing.NDArray[numpy.int64]
+        Top node code of each observed bipartite edge.
+    bottoms: numpy.typing.NDArray[numpy.int64]
+        Bottom node code of each observed bipartite edge.
+    trades: int, optional
+        Curveball trades per replicate. Defaults to CURVEBALL_TRADES_PER_EDGE
+        times edge_n.
+
+    Returns
+    -------
+    float
+        Degree assortativity of a degree preserving random projection.
+    """
+    return _curveball(rng, CurveballChain.degree_assortativity, tops, bottoms, trades)
+
+
+# Replicate functions that need the observed bipartite edges.
+CURVEBALL_REPLICATES: tuple[Callable[..., float], ...] = (
+    random_curveball_clust,
+    random_curveball_density,
+    random_curveball_deg_assort,
+)
+
+
+def _batch_assortativity(
+    labels: npt.NDArray[np.int64],
+    u: npt.NDArray[np.int64],
+    v: npt.NDArray[np.int64],
+    k: int,
+) -> npt.NDArray[np.floating]:
+    """Attribute assortativity of one edge list under many labelings.
+
+    Parameters
+    ----------
+    labels: numpy.typing.NDArray[numpy.int64]
+        One row of node labels (0 to k - 1) per labeling.
+    u: numpy.typing.NDArray[numpy.int64]
+        First endpoint of each edge.
+    v: numpy.typing.NDArray[numpy.int64]
+        Second endpoint of each edge.
+    k: int
+        Number of distinct labels.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.floating]
+        Assortativity coefficient of each labeling.
+    """
+    batch: int = labels.shape[0]
+    # Nodes as rows so that looking up an edge's labels copies one contiguous
+    # row of batch labels.
+    by_node: npt.NDArray[np.int32] = np.ascontiguousarray(labels.T, dtype=np.int32)
+    # Each labeling gets its own k * k slice of one long bincount.
+    offsets: npt.NDArray[np.int32] = np.arange(0, batch * k * k, k * k, dtype=np.int32)
+    counts: npt.NDArray[np.int64] = np.zeros(batch * k * k, dtype=np.int64)
+    chunk: int = max(1, PERMUTATION_CELLS // batch)
+    for lo in range(0, len(u), chunk):
+        cells: npt.NDArray[np.int32] = (
+            by_node[u[lo : lo + chunk]] * k + by_node[v[lo : lo + chunk]] + offsets
         )
-        queue.put(nx.attribute_assortativity_coefficient(G, attr_name))
+        counts += np.bincount(cells.ravel(), minlength=batch * k * k)
+
+    # NetworkX counts each undirected edge in both directions.
+    mixing: npt.NDArray[np.floating] = counts.reshape(batch, k, k).astype(np.float64)
+    mixing += mixing.transpose(0, 2, 1)
+    mixing /= mixing.sum(axis=(1, 2), keepdims=True)
+    return mixing_coefficient(mixing)
+
+
+@traced(rate="replicates")
+def permutation_assort(
+    projection: Graph,
+    attr: str = "SysGamGen",
+    replicates: int = 100000,
+    seed: Optional[int] = None,
+    batch: int = 256,
+) -> npt.NDArray[np.floating]:
+    """Calculate attribute assortativity replicates by permuting labels.
+
+    This null model keeps the observed projection fixed and shuffles attr
+    among its nodes, which is far cheaper than random_assort's new random
+    graph per replicate. Every replicate's mixing matrix is counted straight
+    from the edge arrays, batch permutations at a time.
+
+    Parameters
+    ----------
+    projection: networkx.Graph
+        Observed projection with attr set on its nodes.
+    attr: str, optional
+        Node attribute to permute. The default is "SysGamGen".
+    replicates: int, optional
+        Amount of replicates to generate. The default is 100000.
+    seed: int, optional
+        Master seed. Batch i is shuffled with replicate_rng(seed, i), so the
+        same seed and batch size always yield the same replicates.
+        The default is None.
+    batch: int, optional
+        Permutations per vectorized batch. The default is 256.
+
+    Returns
+    -------
+    numpy.typing.NDArray[numpy.floating]
+        Assortativity replicates.
+    """
+    csr: CSRGraph = to_csr(projection)
+    u: npt.NDArray[np.int64]
+    v: npt.NDArray[np.int64]
+    u, v, _ = edge_arrays(csr)
+    codes: npt.NDArray[np.int64]
+    uniques: npt.NDArray[Any]
+    codes, uniques = node_codes(projection, csr, attr)
+    entropy: int = SeedSequence(seed).entropy
+
+    reps: npt.NDArray[np.floating] = np.zeros(replicates)
+    for i, start in enumerate(range(0, replicates, batch)):
+        count: int = min(batch, replicates - start)
+        rng: Generator = replicate_rng(entropy, i)
+        # Generator.permuted shuffles each row independently.
+        labels: npt.NDArray[np.int64] = rng.permuted(
+            np.broadcast_to(codes, (count, csr.n)), axis=1
+        )
+        reps[start : start + count] = _batch_assortativity(labels, u, v, len(uniques))
+    return reps
+
+
+def _write_sidecar(path: Path, meta: Mapping[str, Any]) -> None:
+    """Atomically replace the checkpoint's metadata sidecar."""
+    tmp: Path = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp, path)
+
+
+def _open_checkpoint(
+    checkpoint: str | Path, meta: dict[str, Any]
+) -> tuple[np.memmap, dict[str, Any]]:
+    """Open or create a replicate checkpoint.
+
+    The replicates live in a memory mapped .npy file next to a JSON sidecar
+    holding the network parameters, the metric, and the finished blocks.
+
+    Parameters
+    ----------
+    checkpoint: str | Path
+        Checkpoint path without a suffix.
+    meta: dict[str, Any]
+        Metadata describing the run. Must match the sidecar on resume. An
+        unset seed adopts the sidecar's seed.
+
+    Returns
+    -------
+    tuple[numpy.memmap, dict[str, Any]]
+        Replicate buffer and the metadata, including finished blocks.
+    """
+    npy_path: Path = Path(checkpoint).with_suffix(".npy")
+    json_path: Path = Path(checkpoint).with_suffix(".json")
+
+    if json_path.exists() and npy_path.exists():
+        saved: dict[str, Any] = json.loads(json_path.read_text())
+        done: list[int] = saved.pop("done")
+        # An unseeded run resumes with the entropy the checkpoint started with
+        if meta["seed"] is None:
+            meta = {**meta, "seed": saved["seed"]}
+        if saved != meta:
+            raise ValueError(
+                f"Checkpoint {checkpoint} was written for a different run: {saved}"
+            )
+        logging.info(f"Resuming from {checkpoint}; {len(done)} blocks finished.")
+        reps_buff: np.memmap = np.lib.format.open_memmap(npy_path, mode="r+")
+        return reps_buff, {**meta, "done": done}
+
+    npy_path.parent.mkdir(parents=True, exist_ok=True)
+    reps_buff = np.lib.format.open_memmap(
+        npy_path, mode="w+", dtype=np.float64, shape=(meta["replicates"],)
+    )
+    if meta["seed"] is None:
+        meta = {**meta, "seed": SeedSequence().entropy}
+    meta = {**meta, "done": []}
+    _write_sidecar(json_path, meta)
+    return reps_buff, meta
+
+
+def p_value_interval(
+    extreme: int, n: int, confidence: float = 0.95
+) -> tuple[float, float, float]:
+    """Estimate a p-value and its Wilson score interval.
+
+    Parameters
+    ----------
+    extreme: int
+        Replicates at least as extreme as the observed value.
+    n: int
+        Total replicates.
+    confidence: float, optional
+        Confidence level of the interval. The default is 0.95.
+
+    Returns
+    -------
+    tuple[float, float, float]
+        P-value, lower bound, and upper bound.
+    """
+    z: float = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p_value: float = extreme / n
+    denom: float = 1 + z**2 / n
+    center: float = (p_value + z**2 / (2 * n)) / denom
+    half: float = z * math.sqrt(p_value * (1 - p_value) / n + z**2 / (4 * n**2)) / denom
+    return p_value, max(center - half, 0.0), min(center + half, 1.0)
+
+
+def p_value_bounds(
+    certain: int, extreme: int, possible: int, n: int, confidence: float = 0.95
+) -> tuple[float, float, float]:
+    """Estimate a p-value from replicates that are only known within an error.
+
+    A replicate within its error of the observed value may or may not be as
+    extreme as it. The interval runs from the Wilson lower bound of the
+    replicates that are certainly extreme to the upper bound of those that
+    possibly are. Without error all three counts are equal and this is
+    p_value_interval.
+
+    Parameters
+    ----------
+    certain: int
+        Replicates >= observed + error.
+    extreme: int
+        Replicates >= observed.
+    possible: int
+        Replicates >= observed - error.
+    n: int
+        Total replicates.
+    confidence: float, optional
+        Confidence level of the interval. The default is 0.95.
+
+    Returns
+    -------
+    tuple[float, float, float]
+        P-value, lower bound, and upper bound.
+    """
+    return (
+        extreme / n,
+        p_value_interval(certain, n, confidence)[1],
+        p_value_interval(possible, n, confidence)[2],
+    )
 
 
+def replicate_p_value(
+    replicates: npt.NDArray[np.floating],
+    observed: float,
+    confidence: float = 0.95,
+    error: float = 0.0,
+) -> tuple[float, float, float]:
+    """P-value of observed and its interval. See p_value_bounds.
+
+    Parameters
+    ----------
+    replicates: numpy.typing.NDArray[numpy.floating]
+        Null distribution replicates.
+    observed: float
+        Observed value of the metric.
+    confidence: float, optional
+        Confidence level of the interval. The default is 0.95.
+    error: float, optional
+        Error bound of each replicate, e.g. dispatcher's clust_error.
+        The default is 0.0.
+
+    Returns
+    -------
+    tuple[float, float, float]
+        P-value, lower bound, and upper bound.
+    """
+    return p_value_bounds(
+        int(np.sum(replicates >= observed + error)),
+        int(np.sum(replicates >= observed)),
+        int(np.sum(replicates >= observed - error)),
+        len(replicates),
+        confidence,
+    )
+
+
+def _advance_prefix(
+    reps_buff: npt.NDArray[np.floating],
+    filled: npt.NDArray[np.bool_],
+    prefix: int,
+    extreme: npt.NDArray[np.int64],
+    observed: float,
+    precision: float,
+    confidence: float,
+    error: float = 0.0,
+) -> tuple[int, npt.NDArray[np.int64], bool]:
+    """Update the sequential p-value estimate with newly filled replicates.
+
+    Only the contiguous prefix of finished replicates is used so the
+    stopping point doesn't depend on the order the replicates arrived in.
+
+    Parameters
+    ----------
+    reps_buff: numpy.typing.NDArray[numpy.floating]
+        Replicates so far.
+    filled: numpy.typing.NDArray[numpy.bool_]
+        Which replicates in reps_buff are finished.
+    prefix: int
+        Length of the prefix counted so far.
+    extreme: numpy.typing.NDArray[numpy.int64]
+        Replicates in the prefix at least as large as observed + error,
+        observed, and observed - error. See p_value_bounds.
+    observed: float
+        Observed value of the metric.
+    precision: float
+        Target half width of the p-value's interval.
+    confidence: float
+        Confidence level of the interval.
+    error: float, optional
+        Error bound of each replicate. The default is 0.0 (exact).
+
+    Returns
+    -------
+    tuple[int, numpy.typing.NDArray[numpy.int64], bool]
+        New prefix length, extreme counts, and whether the target was
+        reached at exactly that prefix.
+    """
+    thresholds: npt.NDArray[np.floating] = observed + np.array([error, 0.0, -error])
+    while prefix < len(filled) and filled[prefix]:
+        extreme = extreme + (reps_buff[prefix] >= thresholds)
+        prefix += 1
+        if prefix >= MIN_ADAPTIVE_REPLICATES:
+            _, low, high = p_value_bounds(*extreme.tolist(), prefix, confidence)
+            if (high - low) / 2 <= precision:
+                return prefix, extreme, True
+    return prefix, extreme, False
+
+
+def _finish(
+    reps_buff: npt.NDArray[np.floating],
+    meta: Mapping[str, Any],
+    store: Optional[NullStore],
+) -> npt.NDArray[np.floating]:
+    """Copy the replicates into memory and save them to store if set."""
+    reps: npt.NDArray[np.floating] = np.array(reps_buff)
+    if store is not None:
+        store.put(dict(meta), meta["seed"], reps)
+    return reps
+
+
+@traced(rate="replicates")
 def dispatcher(
     gamers_df: pd.DataFrame,
-    func: Callable[
-        [Queue[np.floating], Synchronized[c_bool], int, int, int, Optional[int]], None
-    ],
+    func: Callable[[Generator, int, int, int, Optional[int]], float],
     top: str = "permalink",
     bottom: str = "author",
     replicates: int = 100000,
     processes: int = 6,
     timeout: int = 60,
     assort: Optional[str] = None,
+    checkpoint: Optional[str | Path] = None,
+    seed: Optional[int] = None,
+    store: Optional[NullStore] = None,
+    observed: Optional[float] = None,
+    precision: Optional[float] = None,
+    confidence: float = 0.95,
+    clust_error: Optional[float] = None,
+    trades: Optional[int] = None,
+    pool: Optional[ReplicatePool | ShardCoordinator] = None,
+    monitor: Optional[NullJob] = None,
 ) -> npt.NDArray[np.floating]:
     """Calculate replicates from random graphs.
 
@@ -229,11 +827,12 @@ def dispatcher(
     ----------
     gamers_df: pandas.DataFrame
         A data set with a bipartite structure.
-    func: Callable[Queue[np.floating], Value[c_bool], int, int, int, Optional[int]], None]
-        The function should take in a Queue, thread safe bool, as well as the
-        number of nodes in the two node sets. Calculating attribute assortativity
-        requires an additional integer for the amount of values present in and
-        attribute.
+    func: Callable[[Generator, int, int, int, Optional[int]], float]
+        The function should take in a random number generator, the number of
+        nodes in the two node sets, and the number of edges between them and
+        return a single replicate.
+        Calculating attribute assortativity requires an additional integer for
+        the amount of values present in an attribute.
     top: str, optional
         Top nodes in gamers_df (nodes to project). The default is "permalink".
     bottom: str, optional
@@ -242,7 +841,7 @@ def dispatcher(
         Amount of replicates to generate. The default is 100000.
     processes: int, optional
         Amount of processes to launch. The value isn't checked for
-        reasonableness. The default is 6.
+        reasonableness. Ignored if pool is set. The default is 6.
     timeout: int, optional
         Timeout to wait for each single replicate and joining processes.
         Replicates may take a long time to calculate each in which case
@@ -251,13 +850,54 @@ def dispatcher(
     assort: str, optional
         The top parameter is used to calculate the random attribute for
         random_assort. You may override top using assort.
+    checkpoint: str | Path, optional
+        Save progress to checkpoint.npy and checkpoint.json. Finished blocks
+        are skipped if the checkpoint already exists, so an interrupted run
+        picks up where it left off. The default is None (no checkpoint).
+    seed: int, optional
+        Master seed. Replicate i is always calculated from the i-th spawned
+        child of the seed, so the same seed yields the same replicates no
+        matter how many processes run them. The default is None (fresh
+        entropy, or the checkpoint's entropy when resuming).
+    store: NullStore, optional
+        Look up replicates for the same network parameters and seed in store
+        first and only calculate the missing ones. Any stored seed is reused
+        if seed is None. The finished replicates are saved back to store.
+    observed: float, optional
+        Observed value of the metric. Required for adaptive runs.
+    precision: float, optional
+        Adaptive mode. Stop as soon as the half width of the p-value's
+        interval (see p_value_bounds) is at most precision. The p-value is
+        the share of replicates >= observed, like p_value_plots. Replicates is
+        then an upper bound. The default is None (calculate all replicates).
+    confidence: float, optional
+        Confidence level of the adaptive interval. The default is 0.95.
+    clust_error: float, optional
+        Only for random_clust. Estimate each replicate from a sample of nodes
+        to within clust_error. The random projection is still generated in
+        full (see random_projection), but its triangles are only counted
+        around the sampled nodes. The adaptive interval is widened by the error (see
+        p_value_bounds). The default is None (exact replicates).
+    trades: int, optional
+        Only for the curveball replicates. Trades per replicate. The default
+        is None (CURVEBALL_TRADES_PER_EDGE times the observed edges).
+    pool: ReplicatePool | ShardCoordinator, optional
+        Run the replicates on this long lived pool rather than starting and
+        stopping processes for this call alone. A ShardCoordinator spreads
+        them over workers on other hosts instead. The default is None.
+    monitor: NullJob, optional
+        Handle to report progress to instead of printing it. Set by
+        nulljob.submit_null. The default is None.
 
     Returns
     -------
     reps_buff: npt.NDArray[np.floating]
         Calculated replicates from func. The array is the size of "replicates"
-        with type numpy.float64.
+        with type numpy.float64, or shorter if an adaptive run stopped early.
     """
+    if precision is not None and observed is None:
+        raise ValueError("Adaptive runs need the observed value.")
+
     # Parameters of the random network.
     # We need the size of the two node sets as well as the edges between
     # them.
@@ -270,63 +910,175 @@ def dispatcher(
 
     # The keyword unique_attr is simply the count of unique possible
     # attributes.
-    kwargs: Mapping[str, Any] = (
-        {"unique_attr": gamers_df[assort or top].nunique()}
-        if func is random_assort
-        else {}
-    )
+    kwargs: Mapping[str, Any] = {}
+    # Digest of the observed edges for replicates that randomize them. Two
+    # data sets with the same counts mustn't share their replicates.
+    edge_digest: Optional[str] = None
+    if func is random_assort:
+        kwargs = {"unique_attr": gamers_df[assort or top].nunique()}
+    elif func in CURVEBALL_REPLICATES:
+        # The curveball replicates randomize the observed bipartite edges
+        # instead, so they get the edges as node codes.
+        edges: pd.DataFrame = gamers_df[[top, bottom]].drop_duplicates()
+        kwargs = {
+            "tops": pd.factorize(edges[top])[0],
+            "bottoms": pd.factorize(edges[bottom])[0],
+            "trades": (
+                trades if trades is not None else CURVEBALL_TRADES_PER_EDGE * len(edges)
+            ),
+        }
+        edge_digest = hashlib.sha1(
+            kwargs["tops"].astype(np.int64).tobytes()
+            + kwargs["bottoms"].astype(np.int64).tobytes()
+        ).hexdigest()
+    error: float = 0.0
+    if func is random_clust and clust_error is not None:
+        kwargs = {"clust_error": clust_error}
+        error = clust_error
 
-    # Multiprocessing stuff.
-    # A threadsafe Queue is easier than sharing a memory mapped buffer since
-    # we're simply receiving floats.
-    queue: Queue[np.floating] = multiprocessing.Queue()
-    # Synch value. The processes exit when keep_going is False.
-    keep_going: Synchronized[c_bool] = Value(c_bool)
-    keep_going.value = c_bool(True)
+    # Everything that determines the replicates. A checkpoint may only be
+    # resumed by a run with the same parameters.
+    meta: dict[str, Any] = {
+        "func": func.__name__,
+        "top_n": int(top_n),
+        "bottom_n": int(bottom_n),
+        "edge_n": int(edge_n),
+        "unique_attr": (
+            int(kwargs["unique_attr"]) if "unique_attr" in kwargs else None
+        ),
+        "clust_error": kwargs.get("clust_error"),
+        "edge_digest": edge_digest,
+        "trades": kwargs.get("trades"),
+        "replicates": replicates,
+        "block_size": BLOCK_SIZE,
+        "seed": seed,
+    }
+
+    # Replicates calculated by an earlier run only need topping up.
+    stored: npt.NDArray[np.floating] = np.zeros(0)
+    if store is not None:
+        hit: Optional[tuple[int, npt.NDArray[np.floating]]] = store.get(meta, seed)
+        if hit is not None:
+            meta["seed"], stored = hit
+            if len(stored) >= replicates and precision is None:
+                return stored[:replicates].copy()
+            stored = stored[:replicates]
 
-    # Next, let's make and launch our processes.
-    handles: list[Process] = []
+    # Reps_buff shall hold all of the replicates. Checkpointed runs write
+    # straight to the memory mapped file.
+    reps_buff: npt.NDArray[np.floating]
+    done: set[int] = set()
+    if checkpoint is not None:
+        reps_buff, meta = _open_checkpoint(checkpoint, meta)
+        done = set(meta["done"])
+        sidecar: Path = Path(checkpoint).with_suffix(".json")
+    else:
+        reps_buff = np.zeros(replicates)
+        meta["seed"] = SeedSequence(meta["seed"]).entropy
+    entropy: int = meta["seed"]
+    first: int = len(stored)
+    reps_buff[:first] = stored
+
+    # Blocks of (start, count) that still need calculating. Blocks are keyed
+    # by their BLOCK_SIZE aligned start; the first one may begin partway
+    # through if the store topped it up.
+    pending: list[tuple[int, int]] = [
+        (max(start, first), min(start + BLOCK_SIZE, replicates) - max(start, first))
+        for start in range(first - first % BLOCK_SIZE, replicates, BLOCK_SIZE)
+        if start not in done
+    ]
+    # Replicates left to fill in each pending block.
+    remaining: dict[int, int] = {
+        start - start % BLOCK_SIZE: count for start, count in pending
+    }
+
+    # Sequential p-value estimate for adaptive runs. Replicates from the store
+    # or a checkpoint count towards it right away.
+    filled: npt.NDArray[np.bool_] = np.zeros(replicates, dtype=np.bool_)
+    filled[:first] = True
+    for start in done:
+        filled[start : start + BLOCK_SIZE] = True
+    prefix: int = 0
+    extreme: npt.NDArray[np.int64] = np.zeros(3, dtype=np.int64)
+    if precision is not None:
+        assert observed is not None
+        prefix, extreme, reached = _advance_prefix(
+            reps_buff, filled, prefix, extreme, observed, precision, confidence, error
+        )
+        if reached:
+            return _finish(reps_buff[:prefix], meta, store)
+
+    if not pending:
+        return _finish(reps_buff, meta, store)
+
+    # Blocks go to a pool of worker processes. A temporary pool is started
+    # if the caller didn't pass one in.
+    own_pool: bool = pool is None
+    if pool is None:
+        pool = ReplicatePool(processes, timeout)
+    job: Optional[ReplicateJob] = None
     try:
-        for i in range(processes):
-            proc: Process = Process(
-                target=func,
-                name="randomnet_{}".format(i),
-                args=(queue, keep_going, top_n, bottom_n, edge_n),
-                kwargs=kwargs,
-            )
-            proc.start()
-            handles.append(proc)
+        job = pool.submit(func, (top_n, bottom_n, edge_n), kwargs, entropy, pending)
+        if monitor is not None:
+            monitor._attach(job, reps_buff, filled)
 
         # Now we await our data.
-        # Reps_buff shall hold all of the replicates.
-        reps_buff: npt.NDArray[np.floating] = np.zeros(replicates)
-        for j in range(replicates):
-            if not j % 100:
+        for j in range(sum(remaining.values())):
+            if monitor is None and not j % 100:
                 print(f"{j} replicates calculated.")
 
-            # The Queue may hang if the processes implode in some way without
-            # throwing an exception.
-            # Let's check to make sure the processes are running in case they
-            # imploded.
-
-            if not all(map(lambda proc: proc.is_alive(), handles)):
-                logging.critical(f"All processes are dead. Iter: {j}")
-                raise RuntimeError("All processes are dead. RIP.")
-
             # No single replicate should take more than a minute.
             # A few seconds, really. Timeout is a good failsafe for
-            # replicates taking forever to calculate and/or process crashes.
-            reps_buff[j] = queue.get(block=True, timeout=timeout)
+            # replicates taking forever to calculate. The pool replaces
+            # processes that crash and queues their replicates again.
+            index, replicate = job.get(timeout=timeout)
+            reps_buff[index] = replicate
+            filled[index] = True
+            if monitor is not None:
+                monitor._update()
+
+            # Mark the block as finished once all of its replicates are in.
+            start: int = index - index % BLOCK_SIZE
+            remaining[start] -= 1
+            if checkpoint is not None and not remaining[start]:
+                assert isinstance(reps_buff, np.memmap)
+                reps_buff.flush()
+                meta["done"].append(start)
+                _write_sidecar(sidecar, meta)
+
+            if precision is not None:
+                assert observed is not None
+                prefix, extreme, reached = _advance_prefix(
+                    reps_buff,
+                    filled,
+                    prefix,
+                    extreme,
+                    observed,
+                    precision,
+                    confidence,
+                    error,
+                )
+                if reached:
+                    p_value, low, high = p_value_bounds(
+                        *extreme.tolist(), prefix, confidence
+                    )
+                    logging.info(
+                        f"Stopping after {prefix} replicates: p = {p_value} "
+                        f"({low}, {high})"
+                    )
+                    reps_buff = reps_buff[:prefix]
+                    break
+    except BaseException:
+        if checkpoint is not None:
+            logging.warning(
+                f"Replicates interrupted. Resume from checkpoint {checkpoint}."
+            )
+        raise
     finally:
-        # Stop processes by setting keep_going to False.
-        # Join handles to allow processes to exit gracefully.
-        logging.info("Closing down processes.")
-        keep_going.value = c_bool(False)
-        for proc in handles:
-            # See above. Processes shouldn't take long to exit.
-            proc.join(timeout=timeout)
-            if proc.is_alive():
-                logging.warning(f"{proc.name} is taking too long to stop.")
-                proc.kill()
-
-    return reps_buff
+        # Stop any blocks still running, e.g. after an adaptive run stopped.
+        if job is not None and not job.finished:
+            job.cancel()
+        if own_pool:
+            pool.close()
+
+    return _finish(reps_buff, meta, store)
@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import numpy as np
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import pickle
+import queue
+import threading
+import traceback
+
+from numpy.random import Generator, SeedSequence
+from multiprocessing import Process
+from multiprocessing.queues import Queue
+from concurrent.futures import CancelledError
+from collections import Counter, OrderedDict
+from typing import Any, Optional, TYPE_CHECKING
+from collections.abc import Callable, Hashable, Iterator, Mapping
+
+if TYPE_CHECKING:
+    from netshard import ShardCoordinator
+
+# Parameter sets each worker keeps around. The pool tells the workers to drop
+# the oldest unused one after that.
+CACHED_PARAMS: int = 8
+
+# Workers check for cancelled jobs every this many replicates.
+CANCEL_CHECK: int = 8
+
+# Times a replicate is queued again after its worker died. The job fails with
+# a RuntimeError once the replicate takes down one more worker.
+MAX_RETRIES: int = 2
+
+
+def replicate_rng(entropy: int, index: int) -> Generator:
+    """Return the random number generator for replicate number index.
+
+    Every replicate is seeded by its own child of the master SeedSequence.
+    The child is the same one SeedSequence(entropy).spawn would hand out
+    index-th, so a replicate doesn't depend on which worker or machine
+    calculated it or how the replicates were split into blocks.
+
+    Parameters
+    ----------
+    entropy: int
+        Entropy of the master SeedSequence.
+    index: int
+        Replicate number.
+
+    Returns
+    -------
+    numpy.random.Generator
+        Independent generator for the replicate.
+    """
+    return np.random.default_rng(SeedSequence(entropy, spawn_key=(index,)))
+
+
+def _pool_worker(
+    wid: int,
+    jobs: Queue[Optional[tuple[int, Hashable, int, int, int]]],
+    control: Queue[tuple[str, Any, Any]],
+    results: Queue[tuple[str, int, int, Any, Any]],
+    progress: Any,
+) -> None:
+    """Calculate blocks of replicates for any job until told to stop.
+
+    Parameters
+    ----------
+    wid: int
+        Worker id reported with every message.
+    jobs: multiprocessing.queues.Queue
+        Shared queue of (job id, parameter key, entropy, start, count) blocks.
+        None stops the worker.
+    control: multiprocessing.queues.Queue
+        This worker's own queue of ("params", key, payload) registrations,
+        ("forget", key, None), and ("cancel", job id, None) messages.
+    results: multiprocessing.queues.Queue
+        Queue to push (kind, worker id, job id, a, b) messages.
+    progress: multiprocessing.Array
+        Shared (job id, start, count, index) of the replicate being
+        calculated, with a job id of -1 while idle. Unlike messages still
+        buffered for results, it survives the worker dying.
+    """
+    params: dict[Hashable, tuple[Any, ...]] = {}
+    cancelled: set[int] = set()
+
+    def handle(message: tuple[str, Any, Any]) -> None:
+        kind, key, payload = message
+        if kind == "params":
+            params[key] = payload
+        elif kind == "forget":
+            params.pop(key, None)
+        elif kind == "cancel":
+            cancelled.add(key)
+
+    def drain() -> None:
+        while True:
+            try:
+                handle(control.get_nowait())
+            except queue.Empty:
+                return
+
+    for job_id, key, entropy, start, count in iter(jobs.get, None):
+        # Parameters are registered before their blocks are queued. They're
+        # only forgotten after their jobs finished or were cancelled.
+        drain()
+        while key not in params and job_id not in cancelled:
+            handle(control.get())
+        if job_id in cancelled:
+            continue
+
+        progress[:] = [job_id, start, count, start]
+        func, top_n, bottom_n, edge_n, kwargs = params[key]
+        try:
+            for index in range(start, start + count):
+                if not (index - start) % CANCEL_CHECK:
+                    drain()
+                    if job_id in cancelled:
+                        break
+                progress[3] = index
+                rng: Generator = replicate_rng(entropy, index)
+                results.put(
+                    (
+                        "rep",
+                        wid,
+                        job_id,
+                        index,
+                        func(rng, top_n, bottom_n, edge_n, **kwargs),
+                    )
+                )
+        except Exception:
+            results.put(("error", wid, job_id, start, traceback.format_exc()))
+        progress[0] = -1
+
+
+class ReplicateJob:
+    """Handle for replicates being calculated on a ReplicatePool.
+
+    Results stream back as (index, replicate) pairs in the order they finish.
+
+    Attributes
+    ----------
+    job_id: int
+        Id of the job within its pool.
+    total: int
+        Replicates the job will produce.
+    worker_counts: collections.Counter
+        Replicates received from each worker so far.
+    """
+
+    def __init__(
+        self, pool: ReplicatePool | ShardCoordinator, job_id: int, total: int
+    ) -> None:
+        self.job_id: int = job_id
+        self.total: int = total
+        self.received: int = 0
+        self.cancelled: bool = False
+        self._pool: ReplicatePool | ShardCoordinator = pool
+        # Indices routed to the job. A replicate queued again after a crash
+        # may arrive twice.
+        self._seen: set[int] = set()
+        # Replicates received from each worker.
+        self.worker_counts: Counter[Hashable] = Counter()
+        self._results: queue.Queue[tuple[int, float, Hashable] | BaseException] = (
+            queue.Queue()
+        )
+
+    def get(self, timeout: Optional[float] = None) -> tuple[int, float]:
+        """Wait for the next (index, replicate) pair.
+
+        Raises queue.Empty on timeout, RuntimeError if a replicate failed, and
+        CancelledError if the job was cancelled while waiting.
+        """
+        item: tuple[int, float, Hashable] | BaseException = self._results.get(
+            timeout=timeout
+        )
+        if isinstance(item, BaseException):
+            raise item
+        index, replicate, worker = item
+        self.received += 1
+        self.worker_counts[worker] += 1
+        return index, replicate
+
+    def __iter__(self) -> Iterator[tuple[int, float]]:
+        while self.received < self.total and not self.cancelled:
+            yield self.get()
+
+    @property
+    def finished(self) -> bool:
+        """Whether every replicate has been received."""
+        return self.received >= self.total
+
+    def cancel(self) -> None:
+        """Stop calculating the job's remaining replicates."""
+        if not self.cancelled:
+            self.cancelled = True
+            self._pool._cancel(self)
+            # Wake up anyone waiting in get.
+            self._results.put(CancelledError("Job cancelled."))
+
+
+class ReplicatePool:
+    """Long lived pool of replicate worker processes.
+
+    Workers import NetworkX and numpy once and keep the parameters of recent
+    jobs (and anything the replicate functions cache per process, such as
+    curveball chains) between jobs. A worker that dies is replaced and its
+    unfinished replicates are queued again, up to MAX_RETRIES times each.
+
+    Parameters
+    ----------
+    processes: int, optional
+        Number of worker processes. The default is 6.
+    timeout: float, optional
+        Seconds to wait for each worker when closing. The default is 60.
+    """
+
+    def __init__(self, processes: int = 6, timeout: float = 60) -> None:
+        self.processes: int = processes
+        self.timeout: float = timeout
+        self._jobs: Queue[Optional[tuple[int, Hashable, int, int, int]]] = (
+            multiprocessing.Queue()
+        )
+        self._results: Queue[tuple[str, int, int, Any, Any]] = multiprocessing.Queue()
+        self._controls: list[Queue[tuple[str, Any, Any]]] = []
+        self._workers: list[Process] = []
+        self._params: OrderedDict[Hashable, tuple[Any, ...]] = OrderedDict()
+        self._running: dict[int, ReplicateJob] = {}
+        self._entropy: dict[int, tuple[Hashable, int]] = {}
+        # Finished, failed, or cancelled jobs whose queued blocks are skipped.
+        self._retired: set[int] = set()
+        # Workers each (job id, replicate index) has taken down.
+        self._retries: Counter[tuple[int, int]] = Counter()
+        # Shared (job id, start, count, index) each worker is busy with.
+        self._progress: dict[int, Any] = {}
+        self._ids: Iterator[int] = itertools.count()
+        self._lock: threading.Lock = threading.Lock()
+        self._closing: bool = False
+
+        for wid in range(processes):
+            self._controls.append(multiprocessing.Queue())
+            self._start_worker(wid)
+
+        self._router: threading.Thread = threading.Thread(
+            target=self._route, name="replicatepool_router", daemon=True
+        )
+        self._router.start()
+
+    def _start_worker(self, wid: int) -> None:
+        self._progress[wid] = multiprocessing.Array("q", [-1, 0, 0, 0], lock=False)
+        proc: Process = Process(
+            target=_pool_worker,
+            name="randomnet_{}".format(wid),
+            args=(
+                wid,
+                self._jobs,
+                self._controls[wid],
+                self._results,
+                self._progress[wid],
+            ),
+            daemon=True,
+        )
+        proc.start()
+        if wid < len(self._workers):
+            self._workers[wid] = proc
+        else:
+            self._workers.append(proc)
+
+    def submit(
+        self,
+        func: Callable[..., float],
+        params: tuple[int, int, int],
+        kwargs: Mapping[str, Any],
+        entropy: int,
+        blocks: list[tuple[int, int]],
+    ) -> ReplicateJob:
+        """Queue blocks of replicates.
+
+        Parameters
+        ----------
+        func: Callable[..., float]
+            Replicate function such as random_clust.
+        params: tuple[int, int, int]
+            top_n, bottom_n, and edge_n of the random network.
+        kwargs: Mapping[str, Any]
+            Extra keyword arguments for func.
+        entropy: int
+            Master seed entropy. See replicate_rng.
+        blocks: list[tuple[int, int]]
+            (start, count) blocks of replicate indices to calculate.
+
+        Returns
+        -------
+        ReplicateJob
+            Handle streaming the results.
+        """
+        payload: tuple[Any, ...] = (func, *params, dict(kwargs))
+        key: Hashable = hashlib.sha1(pickle.dumps(payload)).hexdigest()
+        with self._lock:
+            if key not in self._params:
+                self._params[key] = payload
+                for control in self._controls:
+                    control.put(("params", key, payload))
+            self._params.move_to_end(key)
+
+            job: ReplicateJob = ReplicateJob(
+                self, next(self._ids), sum(count for _, count in blocks)
+            )
+            self._running[job.job_id] = job
+            self._entropy[job.job_id] = (key, entropy)
+            self._forget_params()
+        for start, count in blocks:
+            self._jobs.put((job.job_id, key, entropy, start, count))
+        return job
+
+    def _forget_params(self) -> None:
+        """Drop the oldest parameters no running job needs. Hold the lock."""
+        in_use: set[Hashable] = {key for key, _ in self._entropy.values()}
+        for key in list(self._params):
+            if len(self._params) <= CACHED_PARAMS:
+                return
+            if key not in in_use:
+                del self._params[key]
+                for control in self._controls:
+                    control.put(("forget", key, None))
+
+    def _retire(self, job_id: int) -> None:
+        """Forget a job so workers skip its queued blocks. Hold the lock."""
+        self._running.pop(job_id, None)
+        self._entropy.pop(job_id, None)
+        self._retired.add(job_id)
+        for retry in [retry for retry in self._retries if retry[0] == job_id]:
+            del self._retries[retry]
+        for control in self._controls:
+            control.put(("cancel", job_id, None))
+
+    def _cancel(self, job: ReplicateJob) -> None:
+        with self._lock:
+            self._retire(job.job_id)
+
+    def _route(self) -> None:
+        """Hand results to their jobs and replace dead workers."""
+        while not self._closing:
+            try:
+                kind, wid, job_id, a, b = self._results.get(timeout=0.5)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                return
+
+            with self._lock:
+                job: Optional[ReplicateJob] = self._running.get(job_id)
+                if kind == "rep":
+                    if job is not None and a in job._seen:
+                        job = None
+                    elif job is not None:
+                        job._seen.add(a)
+                        if len(job._seen) == job.total:
+                            # Replicates queued again after a crash may still
+                            # be waiting for their parameters.
+                            self._retire(job_id)
+            if job is None:
+                continue
+            if kind == "rep":
+                job._results.put((a, b, wid))
+            elif kind == "error":
+                job._results.put(RuntimeError(f"Replicate failed:\n{b}"))
+            self._check_workers()
+
+    def _check_workers(self) -> None:
+        """Replace dead workers and queue their unfinished replicates again.
+
+        A replicate that has taken down more than MAX_RETRIES workers fails
+        its job instead of being queued again.
+        """
+        with self._lock:
+            # Every live worker was told when a job retired. Once no blocks are
+            # queued, a restarted worker can't pick one up either.
+            if self._retired and self._jobs.empty():
+                self._retired.clear()
+        for wid, proc in enumerate(self._workers):
+            if self._closing or proc.exitcode is None:
+                continue
+            logging.warning(f"{proc.name} died ({proc.exitcode}). Restarting it.")
+            failed: Optional[ReplicateJob] = None
+            with self._lock:
+                job_id, start, count, current = self._progress[wid][:]
+                self._start_worker(wid)
+                for key, payload in self._params.items():
+                    self._controls[wid].put(("params", key, payload))
+                # The new worker mustn't wait for the parameters of a job
+                # that's gone.
+                for retired in self._retired:
+                    self._controls[wid].put(("cancel", retired, None))
+                if job_id not in self._entropy:
+                    continue
+                key, entropy = self._entropy[job_id]
+                # Replicates the worker sent just before dying may be lost,
+                # so everything the job hasn't received is queued again.
+                seen: set[int] = self._running[job_id]._seen
+                missing: list[int] = [
+                    index for index in range(start, start + count) if index not in seen
+                ]
+                self._retries[job_id, current] += 1
+                if self._retries[job_id, current] > MAX_RETRIES:
+                    failed = self._running.get(job_id)
+                    self._retire(job_id)
+            if failed is not None:
+                failed._results.put(
+                    RuntimeError(
+                        f"Replicate {current} killed {MAX_RETRIES + 1} workers."
+                    )
+                )
+                continue
+            for index in missing:
+                self._jobs.put((job_id, key, entropy, index, 1))
+
+    def close(self) -> None:
+        """Stop the workers and wait for them to exit."""
+        if self._closing:
+            return
+        self._closing = True
+        logging.info("Closing down processes.")
+        for proc in self._workers:
+            self._jobs.put(None)
+        for control, proc in zip(self._controls, self._workers):
+            # Cancel everything so busy workers give up their blocks.
+            for job_id in list(self._running):
+                control.put(("cancel", job_id, None))
+        for proc in self._workers:
+            proc.join(timeout=self.timeout)
+            if proc.is_alive():
+                logging.warning(f"{proc.name} is taking too long to stop.")
+                proc.kill()
+        self._router.join(timeout=self.timeout)
+
+    def __enter__(self) -> ReplicatePool:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
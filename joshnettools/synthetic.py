@@ -0,0 +1,202 @@
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import argparse
+import logging
+
+from numpy.random import Generator
+from pathlib import Path
+from typing import Optional
+from collections.abc import Iterator
+
+from gamenetloader import SUBREDDIT_LABELS
+
+# Rows generated and written at a time.
+SYNTHETIC_CHUNK: int = 2**20
+
+# Zipf exponents of subreddit popularity, author activity, and thread size.
+SUBREDDIT_EXPONENT: float = 1.1
+AUTHOR_EXPONENT: float = 1.6
+THREAD_EXPONENT: float = 2.2
+
+# Comments per thread are capped so one thread can't swallow a chunk.
+MAX_THREAD_SIZE: int = 5000
+
+# Chance that a comment comes from an author whose home is the thread's
+# subreddit rather than anyone at all.
+LOCALITY: float = 0.8
+
+# Rows per author on average. Sets the number of authors for a row count.
+ROWS_PER_AUTHOR: float = 8.0
+
+
+def subreddits() -> list[str]:
+    """Every subreddit named in SUBREDDIT_LABELS, once each, sorted."""
+    return sorted(
+        {
+            sub
+            for pairs in SUBREDDIT_LABELS.values()
+            for subs, _ in pairs
+            for sub in subs
+        }
+    )
+
+
+def _zipf_weights(n: int, exponent: float, rng: Generator) -> npt.NDArray[np.float64]:
+    """Normalized rank ** -exponent weights in random order."""
+    weights: npt.NDArray[np.float64] = (
+        np.arange(1, n + 1, dtype=np.float64) ** -exponent
+    )
+    return rng.permutation(weights / weights.sum())
+
+
+def synthetic_chunks(
+    rows: int, seed: Optional[int] = None, chunksize: int = SYNTHETIC_CHUNK
+) -> Iterator[pd.DataFrame]:
+    """Generate a Reddit-like comment data set a chunk at a time.
+
+    Subreddit popularity, author activity, and thread sizes are all heavy
+    tailed. Every author has a home subreddit and most comments in a thread
+    come from authors living there, so the projection has the dense
+    subreddit communities and the few bridging authors of the real data.
+
+    Parameters
+    ----------
+    rows: int
+        Total rows to generate.
+    seed: int, optional
+        Seed of the data set. The default is None.
+    chunksize: int, optional
+        Rows per chunk, give or take the last thread. The default is
+        SYNTHETIC_CHUNK.
+
+    Yields
+    ------
+    pandas.DataFrame
+        Rows with author, subreddit, and permalink columns like the data
+        set load_network reads.
+    """
+    rng: Generator = np.random.default_rng(seed)
+    subs: npt.NDArray[np.str_] = np.array(subreddits())
+    sub_weights: npt.NDArray[np.float64] = _zipf_weights(
+        len(subs), SUBREDDIT_EXPONENT, rng
+    )
+
+    # Authors sorted by home subreddit so each home is one block of the
+    # cumulative activity weights.
+    n_authors: int = max(1, int(rows / ROWS_PER_AUTHOR))
+    home: npt.NDArray[np.int64] = np.sort(
+        rng.choice(len(subs), n_authors, p=sub_weights)
+    )
+    activity: npt.NDArray[np.float64] = np.cumsum(
+        _zipf_weights(n_authors, AUTHOR_EXPONENT, rng)
+    )
+    block_end: npt.NDArray[np.int64] = np.searchsorted(
+        home, np.arange(len(subs)), "right"
+    )
+    block_start: npt.NDArray[np.int64] = np.concatenate(([0], block_end[:-1]))
+    low: npt.NDArray[np.float64] = np.where(
+        block_start > 0, activity[np.maximum(block_start - 1, 0)], 0.0
+    )
+    high: npt.NDArray[np.float64] = np.where(
+        block_end > 0, activity[np.maximum(block_end - 1, 0)], 0.0
+    )
+
+    made: int = 0
+    thread: int = 0
+    while made < rows:
+        want: int = min(chunksize, rows - made)
+        # Draw threads until they cover the chunk, then trim the last one.
+        sizes: npt.NDArray[np.int64] = np.minimum(
+            rng.zipf(THREAD_EXPONENT, max(1, want // 2)), MAX_THREAD_SIZE
+        )
+        sizes = sizes[: int(np.searchsorted(np.cumsum(sizes), want)) + 1]
+        sizes[-1] -= max(0, int(sizes.sum()) - want)
+        sizes = sizes[sizes > 0]
+
+        thread_subs: npt.NDArray[np.int64] = rng.choice(
+            len(subs), len(sizes), p=sub_weights
+        )
+        row_subs: npt.NDArray[np.int64] = np.repeat(thread_subs, sizes)
+        n: int = len(row_subs)
+
+        # Local comments pick an author from the subreddit's block, the rest
+        # from everyone, both in proportion to activity.
+        local: npt.NDArray[np.bool_] = (rng.random(n) < LOCALITY) & (
+            high[row_subs] > low[row_subs]
+        )
+        target: npt.NDArray[np.float64] = rng.random(n)
+        target = np.where(
+            local,
+            low[row_subs] + target * (high[row_subs] - low[row_subs]),
+            target * activity[-1],
+        )
+        authors: npt.NDArray[np.int64] = np.minimum(
+            np.searchsorted(activity, target, "right"), n_authors - 1
+        )
+        threads: npt.NDArray[np.int64] = np.repeat(
+            np.arange(thread, thread + len(sizes)), sizes
+        )
+
+        yield pd.DataFrame(
+            {
+                "author": np.char.add("user_", authors.astype(np.str_)),
+                "subreddit": subs[row_subs],
+                "permalink": np.char.add(
+                    np.char.add("/r/", subs[row_subs]),
+                    np.char.add("/comments/", threads.astype(np.str_)),
+                ),
+            }
+        )
+        made += n
+        thread += len(sizes)
+
+
+def synthetic_network(rows: int, seed: Optional[int] = None) -> pd.DataFrame:
+    """Generate a whole synthetic data set in memory. See synthetic_chunks."""
+    return pd.concat(list(synthetic_chunks(rows, seed)), ignore_index=True)
+
+
+def write_synthetic(
+    path: str | Path,
+    rows: int,
+    seed: Optional[int] = None,
+    chunksize: int = SYNTHETIC_CHUNK,
+) -> Path:
+    """Write a synthetic data set to a CSV file a chunk at a time.
+
+    Memory stays bounded by chunksize, so 10 ** 8 rows are fine.
+
+    Parameters
+    ----------
+    path: str | Path
+        CSV file to write.
+    rows: int
+        Total rows.
+    seed: int, optional
+        Seed of the data set. The default is None.
+    chunksize: int, optional
+        Rows generated at a time. The default is SYNTHETIC_CHUNK.
+
+    Returns
+    -------
+    Path
+        The written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    logging.info(f"Writing {rows} synthetic rows to {path}")
+    for i, chunk in enumerate(synthetic_chunks(rows, seed, chunksize)):
+        chunk.to_csv(path, mode="a" if i else "w", header=not i, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Write a synthetic Reddit-like gamers data set."
+    )
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("rows", type=int, help="rows to generate")
+    parser.add_argument("--seed", type=int, default=None)
+    args: argparse.Namespace = parser.parse_args()
+    write_synthetic(args.path, args.rows, args.seed)
@@ -0,0 +1,7 @@
+# The modules import each other as siblings, like main.py run from
+# joshnettools/.
+import sys
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "joshnettools"))
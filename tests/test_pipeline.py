@@ -0,0 +1,36 @@
+import importlib
+import sys
+
+from pathlib import Path
+
+from pipeline import Pipeline, Stage
+
+
+def _double(value: int) -> int:
+    return 2 * value
+
+
+def _one() -> int:
+    return 1
+
+
+def test_dependency_edit_changes_key(tmp_path: Path) -> None:
+    (tmp_path / "pipedep.py").write_text("def base():\n    return 1\n")
+    (tmp_path / "pipestage.py").write_text(
+        "from pipedep import base\n\ndef stage():\n    return base()\n"
+    )
+    sys.path.insert(0, str(tmp_path))
+    try:
+        stage: Stage = Stage("stage", importlib.import_module("pipestage").stage)
+        before: str = Pipeline([stage], tmp_path / "cache").key("stage")
+        (tmp_path / "pipedep.py").write_text("def base():\n    return 2\n")
+        assert Pipeline([stage], tmp_path / "cache").key("stage") != before
+    finally:
+        sys.path.remove(str(tmp_path))
+
+
+def test_run_defaults_to_leaves(tmp_path: Path) -> None:
+    stages: list[Stage] = [Stage("one", _one), Stage("two", _double, ("one",))]
+    assert Pipeline(stages, tmp_path).run() == {"two": 2}
+    # Nothing is stale the second time, so only the leaf is loaded.
+    assert Pipeline(stages, tmp_path).run() == {"two": 2}
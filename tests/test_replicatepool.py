@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+from numpy.random import Generator
+from pathlib import Path
+
+from replicatepool import ReplicatePool
+
+
+def _uniform(rng: Generator, top_n: int, bottom_n: int, edge_n: int) -> float:
+    return float(rng.random())
+
+
+def _crash_once(
+    rng: Generator, top_n: int, bottom_n: int, edge_n: int, marker: str
+) -> float:
+    # The first worker to get here dies; the replicate is queued again.
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return float(rng.random())
+    os._exit(3)
+
+
+def test_crash_after_finished_job_recovers() -> None:
+    with ReplicatePool(2, 5) as pool, tempfile.TemporaryDirectory() as tmp:
+        first = pool.submit(_uniform, (1, 1, 1), {}, 0, [(0, 10)])
+        assert len([first.get(timeout=30) for _ in range(first.total)]) == 10
+
+        marker: str = str(Path(tmp, "crashed"))
+        second = pool.submit(_crash_once, (1, 1, 1), {"marker": marker}, 1, [(0, 10)])
+        indices: set[int] = {second.get(timeout=30)[0] for _ in range(second.total)}
+        assert indices == set(range(10))
+        assert os.path.exists(marker)